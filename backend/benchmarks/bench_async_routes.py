@@ -0,0 +1,118 @@
+"""
+Async route benchmark.
+
+Drives the FastAPI app in-process (httpx ASGI transport) with a mixed load of
+gallery pages, like toggles, comment posts and comment listings at several
+concurrency levels. Each level runs twice: with database work offloaded to
+the DB thread pool (``ThreadedSession``, the default) and with it executed
+inline on the event loop, as the handlers did before. Reports requests/s and
+the worst event-loop stall seen by a 1 ms ticker.
+
+Client and server share one process (and GIL) here, so the number to watch
+is the loop stall: offloading keeps the loop free to accept and serve other
+requests while queries wait on SQLite locks or a network database.
+
+Usage (from backend/):
+    python -m benchmarks.bench_async_routes [--seconds 3] [--artworks 2000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+def setup(directory, artworks):
+    os.chdir(directory)
+    os.environ.setdefault("HF_TOKEN", "benchmark")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from models.database import Artwork, User, create_tables, engine
+
+    create_tables()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, 51)])
+        conn.execute(insert(Artwork), [
+            {"title": f"artwork {i}", "prompt": "bench", "image_url": "/x", "creator_id": 1 + i % 50,
+             "created_at": datetime(2024, 1, 1) + timedelta(seconds=i)}
+            for i in range(artworks)
+        ])
+
+
+async def measure(app, tokens, artworks, concurrency, seconds):
+    import httpx
+
+    stop = time.monotonic() + seconds
+    done = [0]
+    worst_stall = [0.0]
+
+    async def ticker():
+        last = time.perf_counter()
+        while time.monotonic() < stop:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst_stall[0] = max(worst_stall[0], now - last - 0.001)
+            last = now
+
+    async def client_loop(client):
+        while time.monotonic() < stop:
+            headers = {"Authorization": f"Bearer {random.choice(tokens)}"}
+            artwork_id = random.randint(1, artworks)
+            roll = random.random()
+            if roll < 0.5:
+                await client.get(f"/artworks/gallery?skip={random.randint(0, artworks - 20)}&limit=20")
+            elif roll < 0.75:
+                await client.post(f"/artworks/{artwork_id}/like", headers=headers)
+            elif roll < 0.85:
+                await client.post(f"/artworks/{artwork_id}/comments", json={"content": "nice"}, headers=headers)
+            else:
+                await client.get(f"/artworks/{artwork_id}/comments")
+            done[0] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await asyncio.gather(ticker(), *[client_loop(client) for _ in range(concurrency)])
+    return done[0] / seconds, worst_stall[0] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--artworks", type=int, default=2000)
+    parser.add_argument("--concurrency", default="1,8,32")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        directory = os.path.abspath(directory)
+        cwd = os.getcwd()
+        setup(directory, args.artworks)
+
+        import main as app_module
+        from models.database import ThreadedSession
+        from utils.auth import create_access_token
+        from utils.response_cache import gallery_cache
+
+        gallery_cache.ttl = 0  # measure the database path, not the page cache
+        tokens = [create_access_token({"sub": f"user{i}"}) for i in range(1, 51)]
+        offloaded_run = ThreadedSession.run
+
+        async def inline_run(self, fn, *fn_args, **kwargs):
+            return fn(self.session, *fn_args, **kwargs)
+
+        print(f"{'concurrency':>11} {'mode':>10} {'req/s':>8} {'worst loop stall ms':>20}")
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            for mode, run in (("inline", inline_run), ("offloaded", offloaded_run)):
+                ThreadedSession.run = run
+                rate, stall = asyncio.run(measure(app_module.app, tokens, args.artworks, concurrency, args.seconds))
+                print(f"{concurrency:>11} {mode:>10} {rate:8.0f} {stall:20.1f}")
+        ThreadedSession.run = offloaded_run
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
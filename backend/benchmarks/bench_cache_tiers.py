@@ -0,0 +1,164 @@
+"""
+Cache tier benchmark.
+
+Builds a throwaway SQLite database, renders a gallery page the way
+``/artworks/gallery`` does and times getting it back through ``TieredCache``:
+
+- load: no cache, the page query and serialization,
+- L1 hit: the object from the in-process tier,
+- L2 hit: the local tier cleared before every lookup, so the entry comes
+  from Redis and is deserialized (for each serializer),
+
+reporting median and p99 per lookup. Then it fires ``--stampede`` concurrent
+lookups of one cold key from two simulated workers (two clients on the same
+Redis) and counts how many of them ran the load.
+
+Without ``--redis-url`` the shared tier is fakeredis in this process: its
+command handling in Python stands in for the network round trip, so L2
+numbers are indicative only.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cache_tiers [--redis-url redis://localhost:6379/15] [--lookups 2000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def setup(directory, artworks):
+    os.chdir(directory)
+    os.environ.setdefault("HF_TOKEN", "benchmark")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from models.database import Artwork, User, create_tables, engine
+
+    create_tables()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, 51)])
+        conn.execute(insert(Artwork), [
+            {"title": f"artwork {i}", "prompt": "a lighthouse on a cliff at dusk, oil painting", "image_url": "/x",
+             "creator_id": 1 + i % 50, "created_at": datetime(2024, 1, 1) + timedelta(seconds=i)}
+            for i in range(artworks)
+        ])
+
+
+def redis_clients(url, count):
+    """``count`` clients on one Redis, one per simulated worker"""
+    if url:
+        import redis.asyncio
+
+        return [redis.asyncio.from_url(url) for _ in range(count)]
+    try:
+        import fakeredis
+        from fakeredis.aioredis import FakeRedis
+    except ImportError:
+        sys.exit("Install fakeredis or pass --redis-url")
+    server = fakeredis.FakeServer()
+    return [FakeRedis(server=server) for _ in range(count)]
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return statistics.median(samples) * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+
+async def time_lookups(cache, key, load, lookups, clear_local):
+    samples = []
+    for _ in range(lookups):
+        if clear_local:
+            cache.local.clear()
+        started = time.perf_counter()
+        await cache.get_or_load(key, load)
+        samples.append(time.perf_counter() - started)
+    return summary(samples)
+
+
+async def run(args):
+    from models.database import SessionLocal
+    from routes.artworks import _gallery_page
+    from utils.cache import JsonSerializer, PickleSerializer, RedisTier, TieredCache
+    from utils.response_cache import CachedResponse, ResponseCache
+
+    prefix = f"bench:{os.getpid()}:"
+    tiers = [RedisTier(client, prefix=prefix) for client in redis_clients(args.redis_url, 2)]
+    for tier in tiers:
+        await tier.start()
+
+    def render():
+        db = SessionLocal()
+        try:
+            return _gallery_page(db, False, None, 0, 20)
+        finally:
+            db.close()
+
+    body, tags, headers = render()
+    samples = []
+    for _ in range(max(1, args.lookups // 10)):
+        started = time.perf_counter()
+        render()
+        samples.append(time.perf_counter() - started)
+    median, p99 = summary(samples)
+    print(f"gallery page: {len(body)} bytes, {len(tags)} tags")
+    print(f"{'tier':>24} {'median ms':>10} {'p99 ms':>8}")
+    print(f"{'load (query + render)':>24} {median:10.3f} {p99:8.3f}")
+
+    items = json.loads(body)
+    variants = [
+        ("response", ResponseCache("bench_responses", 60, 100, tiers[0]), CachedResponse(body, headers)),
+        ("json", TieredCache("bench_json", 60, 100, JsonSerializer(), tiers[0]), items),
+        ("pickle", TieredCache("bench_pickle", 60, 100, PickleSerializer(), tiers[0]), items),
+    ]
+    for name, cache, value in variants:
+        async def load(value=value):
+            return value, tags
+
+        await cache.get_or_load("page", load)
+        median, p99 = await time_lookups(cache, "page", load, args.lookups, clear_local=False)
+        print(f"{'L1 hit (' + name + ')':>24} {median:10.3f} {p99:8.3f}")
+        median, p99 = await time_lookups(cache, "page", load, args.lookups, clear_local=True)
+        print(f"{'L2 hit (' + name + ')':>24} {median:10.3f} {p99:8.3f}")
+
+    loads = [0]
+
+    async def slow_load():
+        loads[0] += 1
+        await asyncio.sleep(0.05)  # a slow page query
+        return CachedResponse(body, headers), tags
+
+    workers = [ResponseCache("bench_stampede", 60, 100, tier) for tier in tiers]
+    await asyncio.gather(*[workers[i % 2].get_or_load("cold", slow_load) for i in range(args.stampede)])
+    print(f"stampede: {args.stampede} concurrent misses on 2 workers ran {loads[0]} load(s)")
+
+    keys = [key async for key in tiers[0].client.scan_iter(match=prefix + "*")]
+    if keys:
+        await tiers[0].client.delete(*keys)
+    for tier in tiers:
+        await tier.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="", help="a real Redis (use a scratch database); default fakeredis")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--artworks", type=int, default=5000)
+    parser.add_argument("--stampede", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        directory = os.path.abspath(directory)
+        cwd = os.getcwd()
+        setup(directory, args.artworks)
+        asyncio.run(run(args))
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
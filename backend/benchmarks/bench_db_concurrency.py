@@ -0,0 +1,124 @@
+"""
+Database concurrency benchmark.
+
+Runs gallery-page readers against a SQLite file while a writer keeps
+inserting artworks, once with SQLite's defaults (rollback journal,
+synchronous=FULL: every write transaction blocks all readers) and once with
+the WAL/synchronous=NORMAL/mmap tuning ``models.database.build_engine``
+applies. Reports reader and writer throughput plus reader p95 latency.
+
+Usage (from backend/):
+    python -m benchmarks.bench_db_concurrency [--readers 4] [--seconds 5] [--rows 20000] [--dir .]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import desc, insert, text
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from models.database import Base, Artwork, User, build_engine
+
+
+def populate(engine, rows):
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "username": "bench", "email": "bench@example.com"}])
+        conn.execute(insert(Artwork), [
+            {"title": f"artwork {i}", "prompt": "bench", "image_url": "/x", "creator_id": 1,
+             "created_at": start + timedelta(seconds=i)}
+            for i in range(rows)
+        ])
+
+
+def run(engine, readers, seconds, batch):
+    Session = sessionmaker(bind=engine)
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+    writes = [0]
+    errors = [0]
+
+    def reader(samples):
+        db = Session()
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                (
+                    db.query(Artwork)
+                    .options(joinedload(Artwork.creator))
+                    .filter(Artwork.is_public == True)
+                    .order_by(desc(Artwork.created_at), desc(Artwork.id))
+                    .limit(20)
+                    .all()
+                )
+                db.rollback()  # end the read transaction like a request would
+            except Exception:
+                errors[0] += 1
+                db.rollback()
+                continue
+            samples.append(time.perf_counter() - started)
+        db.close()
+
+    def writer():
+        db = Session()
+        now = datetime(2030, 1, 1)
+        while not stop.is_set():
+            try:
+                db.execute(insert(Artwork), [
+                    {"title": "new", "prompt": "bench " * 50, "image_url": "/x", "creator_id": 1, "created_at": now}
+                    for _ in range(batch)
+                ])
+                db.commit()
+                writes[0] += 1
+            except Exception:
+                errors[0] += 1
+                db.rollback()
+        db.close()
+
+    threads = [threading.Thread(target=reader, args=(samples,)) for samples in latencies]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    samples = sorted(sample for reader_samples in latencies for sample in reader_samples)
+    p95 = samples[int(len(samples) * 0.95)] * 1000 if samples else float("nan")
+    return len(samples) / seconds, writes[0] / seconds, p95, statistics.median(samples) * 1000 if samples else float("nan"), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=20, help="rows inserted per write transaction")
+    parser.add_argument("--dir", default=".", help="where to put the scratch databases (use a real disk, not tmpfs)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for label, tuned in (("rollback journal", False), ("WAL + tuning", True)):
+            url = f"sqlite:///{os.path.join(directory, f'{tuned}.db')}"
+            engine = build_engine(url, tune_sqlite=tuned)
+            if not tuned:
+                with engine.connect() as conn:
+                    conn.execute(text("PRAGMA journal_mode=DELETE"))
+            populate(engine, args.rows)
+            results[label] = run(engine, args.readers, args.seconds, args.batch)
+            engine.dispose()
+
+    print(f"{'mode':>18} {'reads/s':>9} {'writes/s':>9} {'read p50 ms':>12} {'read p95 ms':>12} {'errors':>7}")
+    for label, (reads, writes, p95, p50, errors) in results.items():
+        print(f"{label:>18} {reads:9.0f} {writes:9.0f} {p50:12.2f} {p95:12.2f} {errors:7d}")
+
+
+if __name__ == "__main__":
+    main()
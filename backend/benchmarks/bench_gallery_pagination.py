@@ -0,0 +1,122 @@
+"""
+Gallery pagination benchmark.
+
+Builds a throwaway SQLite database with ``--rows`` public artworks and times
+the gallery query at page 1 and page ``--page`` three ways: OFFSET without
+the gallery indexes (the old behaviour), OFFSET with them, and the keyset
+cursor used by ``GET /artworks/gallery?cursor=...``.
+
+Usage (from backend/):
+    python -m benchmarks.bench_gallery_pagination [--rows 1000000] [--page 5000] [--limit 20]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, desc, insert
+from sqlalchemy.orm import sessionmaker, joinedload
+
+from models.database import Base, Artwork, User
+from utils.pagination import after_cursor, encode_cursor
+
+
+def populate(engine, rows):
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "username": "bench", "email": "bench@example.com"}])
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "title": f"artwork {i}",
+                "prompt": "bench",
+                "image_url": "/static/images/bench.png",
+                "is_public": i % 10 != 0,
+                "is_featured": i % 50 == 0,
+                # Several rows per second so (created_at, id) ties are exercised
+                "created_at": start + timedelta(seconds=i // 3),
+                "creator_id": 1,
+            })
+            if len(batch) == 50000:
+                conn.execute(insert(Artwork), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Artwork), batch)
+
+
+def gallery_query(db):
+    return (
+        db.query(Artwork)
+        .options(joinedload(Artwork.creator))
+        .filter(Artwork.is_public == True)
+        .order_by(desc(Artwork.created_at), desc(Artwork.id))
+    )
+
+
+def cursor_for_page(db, page, limit):
+    """Cursor a client would hold after walking to ``page`` (computed once, outside the timing)"""
+    if page <= 1:
+        return None
+    last = gallery_query(db).offset((page - 1) * limit - 1).limit(1).one()
+    return encode_cursor(last.created_at, last.id)
+
+
+def measure(run, repeat):
+    run()  # warm the page cache
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--page", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        print(f"Populating {args.rows} artworks...")
+        populate(engine, args.rows)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+
+        indexes = list(Artwork.__table__.indexes)
+        gallery_indexes = [index for index in indexes if index.name.startswith("ix_artworks_gallery")]
+        pages = (1, args.page)
+        cursors = {page: cursor_for_page(db, page, args.limit) for page in pages}
+
+        def offset(page):
+            return lambda: gallery_query(db).offset((page - 1) * args.limit).limit(args.limit).all()
+
+        def keyset(page):
+            query = gallery_query(db)
+            if cursors[page]:
+                query = query.filter(after_cursor(Artwork.created_at, Artwork.id, cursors[page]))
+            return lambda: query.limit(args.limit).all()
+
+        results = {}
+        for index in gallery_indexes:
+            index.drop(bind=engine)
+        for page in pages:
+            results[("offset, no index", page)] = measure(offset(page), args.repeat)
+        for index in gallery_indexes:
+            index.create(bind=engine)
+        for page in pages:
+            results[("offset", page)] = measure(offset(page), args.repeat)
+            results[("keyset", page)] = measure(keyset(page), args.repeat)
+        db.close()
+        engine.dispose()
+
+    print(f"{'strategy':>18} {'page 1 ms':>10} {f'page {args.page} ms':>14}")
+    for strategy in ("offset, no index", "offset", "keyset"):
+        print(f"{strategy:>18} {results[(strategy, 1)]:10.2f} {results[(strategy, args.page)]:14.2f}")
+
+
+if __name__ == "__main__":
+    main()
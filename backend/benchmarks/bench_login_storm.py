@@ -0,0 +1,133 @@
+"""
+Login storm benchmark.
+
+Drives the FastAPI app in-process (httpx ASGI transport) with a crowd of
+clients logging in over and over while a few readers page through the
+gallery, and reports logins/s next to the gallery latency percentiles. Each
+run hashes in a different place:
+
+  inline   bcrypt on the event loop
+  thread   bcrypt in the DB thread pool, as login did before
+  process  bcrypt in the password hashing process pool (the default)
+
+bcrypt is pure CPU, so logins/s is bounded by the cores either way; what the
+process pool buys is that gallery requests keep being served while it runs.
+A thread is scheduled against the event loop and the DB threads inside one
+process (and holds the GIL between hashes); worker processes leave it alone
+and are given their share of the CPU by the OS.
+
+Usage (from backend/):
+    python -m benchmarks.bench_login_storm [--seconds 5] [--logins 16] [--rounds 10]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+
+def setup(directory, rounds, users):
+    os.chdir(directory)
+    os.environ.setdefault("HF_TOKEN", "benchmark")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    os.environ["BCRYPT_ROUNDS"] = str(rounds)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert
+    from models.database import Artwork, User, create_tables, engine
+    from utils.passwords import hash_password
+
+    create_tables()
+    hashed = hash_password("benchmark")
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": hashed}
+            for i in range(1, users + 1)
+        ])
+        conn.execute(insert(Artwork), [
+            {"title": f"artwork {i}", "prompt": "bench", "image_url": "/x", "creator_id": 1 + i % users,
+             "created_at": datetime(2024, 1, 1) + timedelta(seconds=i)}
+            for i in range(2000)
+        ])
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000 if samples else 0.0
+
+
+async def measure(app, users, logins, readers, seconds):
+    import httpx
+
+    stop = time.monotonic() + seconds
+    done = [0]
+    latencies = []
+
+    async def login_loop(client, n):
+        while time.monotonic() < stop:
+            form = {"username": f"user{1 + n % users}", "password": "benchmark"}
+            response = await client.post("/auth/login", data=form)
+            assert response.status_code == 200, response.text
+            done[0] += 1
+
+    async def gallery_loop(client):
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            await client.get("/artworks/gallery?limit=20")
+            latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.01)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm the worker processes (spawned on first use) outside the measurement
+        await client.post("/auth/login", data={"username": "user1", "password": "benchmark"})
+        stop = time.monotonic() + seconds
+        await asyncio.gather(
+            *[login_loop(client, n) for n in range(logins)],
+            *[gallery_loop(client) for _ in range(readers)]
+        )
+    return done[0] / seconds, percentile(latencies, 0.5), percentile(latencies, 0.99), len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--readers", type=int, default=4, help="concurrent gallery clients")
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        directory = os.path.abspath(directory)
+        cwd = os.getcwd()
+        setup(directory, args.rounds, users=50)
+
+        import main as app_module
+        from models.database import run_in_db_thread
+        from utils.passwords import PasswordHasher, password_hasher
+        from utils.response_cache import gallery_cache
+
+        gallery_cache.ttl = 0  # every gallery request does real work
+        pooled_run = PasswordHasher._run
+
+        async def inline_run(self, fn, *fn_args):
+            return fn(*fn_args)
+
+        async def thread_run(self, fn, *fn_args):
+            return await run_in_db_thread(fn, *fn_args)
+
+        print(f"bcrypt rounds={args.rounds}, hashing workers={password_hasher.workers}, cpus={os.cpu_count()}")
+        print(f"{'mode':>8} {'logins/s':>9} {'gallery p50 ms':>15} {'gallery p99 ms':>15} {'gallery reqs':>13}")
+        for mode, run in (("inline", inline_run), ("thread", thread_run), ("process", pooled_run)):
+            PasswordHasher._run = run
+            rate, p50, p99, count = asyncio.run(measure(app_module.app, 50, args.logins, args.readers, args.seconds))
+            print(f"{mode:>8} {rate:9.1f} {p50:15.1f} {p99:15.1f} {count:13d}")
+        PasswordHasher._run = pooled_run
+        password_hasher.shutdown()
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
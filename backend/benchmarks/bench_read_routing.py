@@ -0,0 +1,121 @@
+"""
+Read routing benchmark.
+
+Runs gallery-page readers while a burst of like-toggle writers hammers the
+same SQLite file. Readers either share the primary engine's pool with the
+writers (what every endpoint did before ``get_read_db``) or use the separate
+read-only pool ``models.database.build_read_engine`` creates. Writers that
+wait on SQLite's write lock keep their pooled connection checked out, so on
+a shared pool a like burst starves readers of connections.
+
+Usage (from backend/):
+    python -m benchmarks.bench_read_routing [--writers 40] [--readers 4] [--seconds 5] [--dir .]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, desc, insert
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from models.database import Base, Artwork, Like, User, _read_only_sqlite_url, build_engine
+
+USERS = 500
+
+
+def populate(engine, rows):
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, USERS + 1)])
+        conn.execute(insert(Artwork), [
+            {"title": f"artwork {i}", "prompt": "bench", "image_url": "/x", "creator_id": 1 + i % USERS,
+             "created_at": start + timedelta(seconds=i)}
+            for i in range(rows)
+        ])
+
+
+def run(write_engine, read_engine, writers, readers, seconds, rows):
+    WriteSession = sessionmaker(bind=write_engine)
+    ReadSession = sessionmaker(bind=read_engine)
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+    writes = [0]
+
+    def reader(samples):
+        while not stop.is_set():
+            started = time.perf_counter()
+            db = ReadSession()
+            try:
+                (
+                    db.query(Artwork)
+                    .options(joinedload(Artwork.creator))
+                    .filter(Artwork.is_public == True)
+                    .order_by(desc(Artwork.created_at), desc(Artwork.id))
+                    .limit(20)
+                    .all()
+                )
+            finally:
+                db.close()
+            samples.append(time.perf_counter() - started)
+
+    def writer():
+        while not stop.is_set():
+            user_id, artwork_id = random.randint(1, USERS), random.randint(1, rows)
+            db = WriteSession()
+            try:
+                removed = db.execute(delete(Like).where(Like.user_id == user_id, Like.artwork_id == artwork_id)).rowcount
+                if not removed:
+                    db.add(Like(user_id=user_id, artwork_id=artwork_id))
+                db.commit()
+                writes[0] += 1
+            except Exception:
+                db.rollback()
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=reader, args=(samples,)) for samples in latencies]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    samples = sorted(sample for reader_samples in latencies for sample in reader_samples)
+    percentile = lambda q: samples[min(int(len(samples) * q), len(samples) - 1)] * 1000 if samples else float("nan")
+    return len(samples) / seconds, writes[0] / seconds, percentile(0.5), percentile(0.95), percentile(0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=40)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dir", default=".", help="where to put the scratch databases (use a real disk, not tmpfs)")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for label, separate in (("shared pool", False), ("read-only pool", True)):
+            url = f"sqlite:///{os.path.join(directory, f'{separate}.db')}"
+            write_engine = build_engine(url)
+            populate(write_engine, args.rows)
+            read_engine = build_engine(_read_only_sqlite_url(url), read_only=True) if separate else write_engine
+            results[label] = run(write_engine, read_engine, args.writers, args.readers, args.seconds, args.rows)
+            write_engine.dispose()
+            read_engine.dispose()
+
+    print(f"{'readers use':>15} {'reads/s':>9} {'writes/s':>9} {'read p50 ms':>12} {'read p95 ms':>12} {'read p99 ms':>12}")
+    for label, (reads, writes, p50, p95, p99) in results.items():
+        print(f"{label:>15} {reads:9.0f} {writes:9.0f} {p50:12.2f} {p95:12.2f} {p99:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Placeholder rendering benchmark.
+
+Compares the old per-row ``draw.line`` gradient (colour computed in Python
+for every row, font reloaded per call) with the NumPy renderer in
+``utils.rendering`` at 512x512 and 1024x1024.
+
+Usage (from backend/):
+    python -m benchmarks.bench_render [--repeat 50]
+"""
+import argparse
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.rendering import default_font, render_circles, vertical_gradient
+
+TOP = (26, 26, 46)
+BOTTOM = (126, 76, 196)
+PROMPT = "a lighthouse on a cliff at sunset"
+
+
+def legacy_render(size):
+    img = Image.new('RGB', (size, size))
+    draw = ImageDraw.Draw(img)
+    for y in range(size):
+        ratio = y / size
+        color = tuple(int(t * (1 - ratio) + b * ratio) for t, b in zip(TOP, BOTTOM))
+        draw.line([(0, y), (size, y)], fill=color)
+    for i in range(20):
+        x = (i * size // 20) + (size // 40)
+        y = size // 2 + int(50 * (i % 3 - 1))
+        draw.ellipse([x - 10, y - 10, x + 10, y + 10], fill=(255, 255, 255))
+    font = ImageFont.load_default()
+    draw.text((size // 4, size // 2), PROMPT, fill='white', font=font)
+    return img
+
+
+def vectorized_render(size):
+    dots = []
+    for i in range(20):
+        x = (i * size // 20) + (size // 40)
+        y = size // 2 + int(50 * (i % 3 - 1))
+        dots.append((x, y, 10, (255, 255, 255)))
+    img = render_circles(vertical_gradient(size, size, TOP, BOTTOM), dots)
+    ImageDraw.Draw(img).text((size // 4, size // 2), PROMPT, fill='white', font=default_font())
+    return img
+
+
+def measure(render, size, repeat):
+    render(size)  # warm-up (fills caches for the vectorized path)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render(size)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'legacy ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for size in (512, 1024):
+        legacy = measure(legacy_render, size, args.repeat)
+        vectorized = measure(vectorized_render, size, args.repeat)
+        print(f"{size}x{size:<5} {legacy:10.2f} {vectorized:10.2f} {legacy / vectorized:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
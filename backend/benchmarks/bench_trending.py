@@ -0,0 +1,117 @@
+"""
+Trending feed benchmark.
+
+Builds a throwaway SQLite database with ``--rows`` artworks and ``--likes``
+likes spread over the last week, backfills ``trending_scores`` from them and
+times:
+
+- the ``/artworks/trending`` page query (first page and a deep cursor page),
+- the aggregation it replaces: summing likes of the last week per artwork
+  on every request (without even applying the decay),
+- a batched decay pass over every trending row,
+- folding one like-buffer flush of ``--flush`` artworks into the scores.
+
+Usage (from backend/):
+    python -m benchmarks.bench_trending [--rows 1000000] [--likes 2000000] [--users 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--likes", type=int, default=2000000)
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--flush", type=int, default=1000, help="artworks per simulated like-buffer flush")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    from sqlalchemy import desc, func, insert, select
+    from models.database import Artwork, Like, SessionLocal, User, create_tables, engine
+    from routes.artworks import _trending_page
+    from utils.trending import trending_scores
+
+    try:
+        print(f"Populating {args.rows} artworks and {args.likes} likes...")
+        create_tables()
+        rng = random.Random(7)
+        now = datetime.utcnow()
+        with engine.begin() as conn:
+            conn.execute(insert(User), [{"id": i, "username": f"user{i}", "email": f"user{i}@example.com"} for i in range(1, args.users + 1)])
+            conn.execute(insert(Artwork), [
+                {"title": f"artwork {i}", "prompt": "bench", "image_url": "/x", "creator_id": 1 + i % args.users,
+                 "created_at": now - timedelta(seconds=args.rows - i)}
+                for i in range(1, args.rows + 1)
+            ])
+            # Skewed towards newer artworks, like real engagement; duplicates are dropped by the unique index
+            likes = {
+                (rng.randint(1, args.users), args.rows - min(int(rng.expovariate(20 / args.rows)), args.rows - 1))
+                for _ in range(args.likes)
+            }
+            conn.execute(insert(Like), [
+                {"user_id": user_id, "artwork_id": artwork_id, "created_at": now - timedelta(seconds=rng.uniform(0, 7 * 86400))}
+                for user_id, artwork_id in likes
+            ])
+
+        started = time.perf_counter()
+        rows = trending_scores.rebuild(timedelta(days=7), now)
+        print(f"  {len(likes)} likes, backfilled {rows} trending rows in {time.perf_counter() - started:.1f} s")
+
+        db = SessionLocal()
+        first_page = lambda: _trending_page(db, None, 20)
+        cursor = None
+        for _ in range(50):
+            _, cursor = _trending_page(db, cursor, 20)
+        deep_page = lambda: _trending_page(db, cursor, 20)
+        week = now - timedelta(days=7)
+        aggregate = lambda: db.execute(
+            select(Like.artwork_id, func.count().label("score"))
+            .where(Like.created_at >= week)
+            .group_by(Like.artwork_id)
+            .order_by(desc("score"))
+            .limit(20)
+        ).all()
+
+        print(f"{'operation':>34} {'ms':>9}")
+        print(f"{'trending page 1':>34} {timed(first_page, args.repeat):9.2f}")
+        print(f"{'trending page 51 (cursor)':>34} {timed(deep_page, args.repeat):9.2f}")
+        print(f"{'aggregate likes per request':>34} {timed(aggregate, max(1, args.repeat // 5)):9.2f}")
+        db.close()
+
+        flush = {rng.randint(1, args.rows): 1 for _ in range(args.flush)}
+        def bump():
+            with engine.begin() as conn:
+                trending_scores.bump(conn, flush)
+        print(f"{f'bump {len(flush)} artworks':>34} {timed(bump, args.repeat):9.2f}")
+
+        started = time.perf_counter()
+        decayed = trending_scores.decay(now + timedelta(hours=1))
+        print(f"{f'decay pass ({decayed} rows)':>34} {(time.perf_counter() - started) * 1000:9.2f}")
+    finally:
+        engine.dispose()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,39 @@
 from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
-import uuid
 import base64
 import asyncio
 from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
 from dotenv import load_dotenv
-from utils.simple_generator import generate_image_simple
+from utils.simple_generator import generate_image_simple, MODEL_ID
+from models.database import create_tables
+from utils.generation_cache import generation_cache
+from utils.provider_health import provider_health
+from utils.storage import image_store
+from utils.rendering import draw_centered_lines, render_circles, vertical_gradient, wrap_words
 
 load_dotenv()
 
 app = Flask(__name__, static_folder='static')
 CORS(app, origins=["http://localhost:3000"])
 
-# Create images directory
+# Create images directory and the image store's refcount table
 os.makedirs('static/images', exist_ok=True)
+create_tables()
 
 def create_sample_image(prompt, width=512, height=512):
     """Create a sample image with the prompt text"""
-    # Create a colorful gradient background
-    img = Image.new('RGB', (width, height), color='#1a1a2e')
-    draw = ImageDraw.Draw(img)
-    
-    # Create gradient effect
-    for y in range(height):
-        r = int(26 + (y / height) * 100)
-        g = int(26 + (y / height) * 50)
-        b = int(46 + (y / height) * 150)
-        color = (r, g, b)
-        draw.line([(0, y), (width, y)], fill=color)
-    
-    # Add some decorative elements
+    # Colorful gradient background with some decorative elements
+    dots = []
     for i in range(20):
         x = (i * width // 20) + (width // 40)
         y = height // 2 + int(50 * (i % 3 - 1))
-        draw.ellipse([x-10, y-10, x+10, y+10], fill=(255, 255, 255, 100))
+        dots.append((x, y, 10, (255, 255, 255)))
+    img = render_circles(vertical_gradient(width, height, (26, 26, 46), (126, 76, 196)), dots)
     
     # Add prompt text
-    try:
-        font = ImageFont.load_default()
-    except:
-        font = None
-    
-    # Wrap text
-    words = prompt.split()
-    lines = []
-    current_line = []
-    
-    for word in words:
-        current_line.append(word)
-        if len(' '.join(current_line)) > 40:
-            if len(current_line) > 1:
-                current_line.pop()
-                lines.append(' '.join(current_line))
-                current_line = [word]
-            else:
-                lines.append(word)
-                current_line = []
-    
-    if current_line:
-        lines.append(' '.join(current_line))
-    
-    # Draw text
-    y_offset = height // 2 - (len(lines) * 15)
-    for line in lines:
-        bbox = draw.textbbox((0, 0), line, font=font)
-        text_width = bbox[2] - bbox[0]
-        x = (width - text_width) // 2
-        draw.text((x, y_offset), line, fill='white', font=font)
-        y_offset += 30
+    lines = wrap_words(prompt, 40)
+    draw_centered_lines(img, lines, height // 2 - (len(lines) * 15), 30)
     
     return img
 
@@ -85,6 +49,11 @@ def health():
 def test():
     return jsonify({"test": "success", "python_version": "3.14", "message": "Backend is working!"})
 
+@app.route('/providers')
+def providers():
+    """Circuit breaker state and live latency/error stats per image provider"""
+    return jsonify(provider_health.snapshot())
+
 @app.route('/generate', methods=['POST'])
 def generate_art():
     try:
@@ -94,8 +63,10 @@ def generate_art():
         height = data.get('height', 512)
         negative_prompt = data.get('negative_prompt', None)
         
-        # Generate image
-        filepath, filename = generate_image_simple(
+        # Generate image (identical earlier prompts are served from cache)
+        filepath, filename = generation_cache.get_or_generate_sync(
+            MODEL_ID,
+            generate_image_simple,
             prompt=prompt,
             width=width,
             height=height
@@ -116,23 +87,25 @@ def generate_art():
             gallery_data = []
         
         # Add new image
+        image_url = image_store.url_for(filename)
         new_image = {
             'filename': filename,
             'prompt': prompt,
-            'url': f"/static/images/{filename}",
-            'full_url': f"http://localhost:8001/static/images/{filename}",
+            'url': image_url,
+            'full_url': f"http://localhost:8001{image_url}",
             'created_at': datetime.now().isoformat()
         }
         gallery_data.append(new_image)
         
-        # Save gallery
+        # Save gallery; the entry keeps its image blob alive
         with open(gallery_file, 'w') as f:
             json.dump(gallery_data, f)
+        image_store.acquire(filepath)
         
         return jsonify({
             "success": True,
-            "image_url": f"/static/images/{filename}",
-            "full_url": f"http://localhost:8001/static/images/{filename}",
+            "image_url": image_url,
+            "full_url": f"http://localhost:8001{image_url}",
             "prompt": prompt,
             "message": "Artwork generated successfully!"
         })
@@ -143,7 +116,7 @@ def generate_art():
             "error": str(e)
         }), 500
 
-@app.route('/static/images/<filename>')
+@app.route('/static/images/<path:filename>')
 def serve_image(filename):
     return send_from_directory(os.path.join(app.root_path, 'static/images'), filename)
 
@@ -168,7 +141,7 @@ def get_gallery():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/download/<filename>')
+@app.route('/download/<path:filename>')
 def download_image(filename):
     try:
         return send_from_directory('static/images', filename, as_attachment=True)
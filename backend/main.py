@@ -4,6 +4,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from models.database import create_tables
 from routes import auth, artworks
+from utils.jobs import generation_queue
+from utils.http_client import http_client
+from utils.like_buffer import like_buffer
+from utils.trending import trending_scores
+from utils.passwords import password_hasher
+from utils.rate_limit import rate_limiter
+from utils.cache import redis_tier
+from utils.generation_cache import generation_cache
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -27,6 +36,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Static files - ensure directory exists first
@@ -43,6 +53,27 @@ async def startup_event():
     # Create static directories
     os.makedirs("static/images", exist_ok=True)
     os.makedirs("static/uploads", exist_ok=True)
+    # Forget cached generations whose files are gone and trim to the budget
+    await asyncio.to_thread(generation_cache.reconcile)
+    # Start generation workers
+    await generation_queue.start()
+    # Start the like counter flusher and the trending score decay
+    await like_buffer.start()
+    await trending_scores.start()
+    # Listen for cache invalidations from other workers
+    if redis_tier is not None:
+        await redis_tier.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await generation_queue.stop()
+    await like_buffer.stop()
+    await trending_scores.stop()
+    password_hasher.shutdown()
+    await rate_limiter.close()
+    if redis_tier is not None:
+        await redis_tier.stop()
+    await http_client.aclose()
 
 @app.get("/")
 async def root():
@@ -54,9 +85,16 @@ async def health_check():
 
 @app.get("/test-image")
 async def test_image():
-    """Test endpoint to create and return a sample image"""
+    """
+    Test endpoint to create and return a sample image.
+
+    The image is temporary: nothing holds a reference to it, so
+    ``manage.py gc-images`` deletes it once the store's put grace period
+    (IMAGE_STORE_PUT_GRACE_SECONDS) has passed.
+    """
     from PIL import Image, ImageDraw
-    import uuid
+    from utils.image_io import save_pil_image
+    from utils.storage import image_store
     
     # Create test image
     img = Image.new('RGB', (512, 512), color='#2196F3')
@@ -64,14 +102,12 @@ async def test_image():
     draw.text((50, 250), "Backend Image Test - SUCCESS!", fill='white')
     
     # Save image
-    filename = f"test_{uuid.uuid4().hex[:8]}.png"
-    filepath = os.path.join("static", "images", filename)
-    img.save(filepath)
+    filepath, filename = await save_pil_image(img)
     
     return {
         "success": True,
-        "image_url": f"/static/images/{filename}",
-        "full_url": f"http://localhost:8000/static/images/{filename}",
+        "image_url": image_store.url_for(filename),
+        "full_url": f"http://localhost:8000{image_store.url_for(filename)}",
         "message": "Test image created successfully"
     }
 
@@ -0,0 +1,288 @@
+"""
+ArtBuddy maintenance commands.
+
+Usage (from backend/):
+    python manage.py backfill-derivatives [--batch-size 100] [--force]
+    python manage.py migrate-images [--batch-size 100] [--gallery gallery.json] [--keep-originals]
+    python manage.py gc-images [--min-age-minutes 60]
+    python manage.py backfill-counters
+    python manage.py repair-counters [--dry-run]
+    python manage.py check-schema [--ddl postgresql]
+    python manage.py rebuild-search-index
+    python manage.py backfill-trending [--days 7]
+    python manage.py prune-refresh-tokens
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, or_, select, update
+
+from models.database import (
+    Base, SessionLocal, Artwork, backfill_counters, create_tables, engine,
+    has_search_index, real_counts, rebuild_search_index, search_ddl
+)
+
+
+def backfill_derivatives(args):
+    """Generate thumbnail/WebP derivatives for artworks that have none yet"""
+    from utils.derivatives import create_derivatives
+
+    db = SessionLocal()
+    try:
+        query = db.query(Artwork).order_by(Artwork.id)
+        if not args.force:
+            query = query.filter(Artwork.derivatives.is_(None))
+
+        done = failed = 0
+        last_id = 0
+        while True:
+            batch = query.filter(Artwork.id > last_id).limit(args.batch_size).all()
+            if not batch:
+                break
+            for artwork in batch:
+                last_id = artwork.id
+                try:
+                    artwork.derivatives = json.dumps(create_derivatives(artwork.image_path))
+                    done += 1
+                except Exception as e:
+                    print(f"  artwork {artwork.id}: {e}")
+                    failed += 1
+            db.commit()
+            print(f"  processed up to artwork {last_id}")
+
+        print(f"Derivatives created for {done} artworks ({failed} failed)")
+    finally:
+        db.close()
+
+
+def migrate_images(args):
+    """Move flat static/images files into the sharded, content-addressed image store"""
+    from utils.derivatives import create_derivatives
+    from utils.storage import image_store
+
+    # Old path -> (new path, filename); shared files (cache hits) are stored once
+    relocated = {}
+    obsolete = set()
+
+    def relocate(path):
+        if path not in relocated:
+            with open(path, "rb") as f:
+                data = f.read()
+            placeholder = os.path.basename(path).startswith(("art_", "sample_"))
+            relocated[path] = image_store.put(data, os.path.splitext(path)[1], placeholder=placeholder)
+            obsolete.add(path)
+        return relocated[path]
+
+    db = SessionLocal()
+    try:
+        moved = skipped = missing = 0
+        last_id = 0
+        while True:
+            batch = db.query(Artwork).filter(Artwork.id > last_id).order_by(Artwork.id).limit(args.batch_size).all()
+            if not batch:
+                break
+            for artwork in batch:
+                last_id = artwork.id
+                if not artwork.image_path or image_store.refcount(artwork.image_path) is not None:
+                    skipped += 1
+                    continue
+                if not os.path.exists(artwork.image_path):
+                    print(f"  artwork {artwork.id}: missing {artwork.image_path}")
+                    missing += 1
+                    continue
+
+                image_path, filename = relocate(artwork.image_path)
+                old_derivatives = json.loads(artwork.derivatives) if artwork.derivatives else {}
+                obsolete.update(url.lstrip("/") for url in old_derivatives.values())
+
+                artwork.image_path = image_path
+                artwork.image_url = image_store.url_for(filename)
+                if artwork.derivatives is not None:
+                    artwork.derivatives = json.dumps(create_derivatives(image_path))
+                image_store.acquire(image_path, db)
+                moved += 1
+            db.commit()
+            print(f"  processed up to artwork {last_id}")
+    finally:
+        db.close()
+    print(f"Artworks: {moved} migrated, {skipped} already in the store, {missing} missing files")
+
+    if args.gallery and os.path.exists(args.gallery):
+        with open(args.gallery) as f:
+            gallery = json.load(f)
+        entries = 0
+        for item in gallery:
+            path = image_store.path_for(item.get("filename", ""))
+            if not item.get("filename") or image_store.refcount(path) is not None or not os.path.exists(path):
+                continue
+            image_path, filename = relocate(path)
+            url = image_store.url_for(filename)
+            item["full_url"] = item.get("full_url", "").replace(item.get("url", ""), url)
+            item["filename"], item["url"] = filename, url
+            image_store.acquire(image_path)
+            entries += 1
+        with open(args.gallery, "w") as f:
+            json.dump(gallery, f)
+        print(f"Gallery: {entries} entries migrated")
+
+    if not args.keep_originals:
+        for path in obsolete:
+            if os.path.exists(path) and image_store.refcount(path) is None:
+                os.remove(path)
+        print(f"Removed {len(obsolete)} superseded files")
+
+
+def gc_images(args):
+    """Delete stored images that no artwork, cache entry or gallery entry references"""
+    from utils.storage import image_store
+
+    cutoff = datetime.utcnow() - timedelta(minutes=args.min_age_minutes)
+    print(f"Deleted {image_store.collect_garbage(cutoff)} unreferenced images")
+
+
+def backfill_counters_command(args):
+    """Set likes_count/comments_count on every artwork from the likes and comments tables"""
+    print(f"Counters set for {backfill_counters()} artworks")
+
+
+def repair_counters(args):
+    """Find artworks whose stored counters drifted from the real counts and fix them"""
+    likes, comments = real_counts()
+    drifted = or_(
+        Artwork.likes_count.is_(None),
+        Artwork.comments_count.is_(None),
+        Artwork.likes_count != likes,
+        Artwork.comments_count != comments
+    )
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Artwork.id, Artwork.likes_count, likes, Artwork.comments_count, comments).where(drifted)
+        ).all()
+        for artwork_id, stored_likes, real_likes, stored_comments, real_comments in rows:
+            print(f"  artwork {artwork_id}: likes {stored_likes} -> {real_likes}, comments {stored_comments} -> {real_comments}")
+
+        if rows and not args.dry_run:
+            db.execute(
+                update(Artwork)
+                .where(Artwork.id.in_([row[0] for row in rows]))
+                .values(likes_count=likes, comments_count=comments)
+            )
+            db.commit()
+        print(f"{len(rows)} artworks with drifted counters" + (" (dry run)" if args.dry_run else " repaired"))
+    finally:
+        db.close()
+
+
+def check_schema(args):
+    """Verify the configured database has every table, column and index the models declare"""
+    if args.ddl:
+        # Offline: print the schema as the given dialect would create it
+        from sqlalchemy.dialects import registry
+        from sqlalchemy.schema import CreateIndex, CreateTable
+
+        dialect = registry.load(args.ddl)()
+        for table in Base.metadata.sorted_tables:
+            print(f"{str(CreateTable(table).compile(dialect=dialect)).strip()};")
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                print(f"{CreateIndex(index).compile(dialect=dialect)};")
+        for statement in search_ddl(dialect.name):
+            print(f"{statement};")
+        return 0
+
+    inspector = inspect(engine)
+    problems = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            problems.append(f"missing table {table.name}")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        problems += [f"missing column {table.name}.{column.name}" for column in table.columns if column.name not in columns]
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        problems += [f"missing index {index.name} on {table.name}" for index in table.indexes if index.name not in indexes]
+    if search_ddl(engine.dialect.name) and not has_search_index():
+        problems.append("missing full-text search index")
+
+    print(f"Database: {engine.url.render_as_string(hide_password=True)} ({engine.dialect.name})")
+    for problem in problems:
+        print(f"  {problem}")
+    print("Schema OK" if not problems else f"{len(problems)} problems")
+    return 1 if problems else 0
+
+
+def rebuild_search_index_command(args):
+    """Re-index every artwork title and prompt for /artworks/search"""
+    rebuild_search_index()
+    print("Search index rebuilt")
+
+
+def backfill_trending(args):
+    """Recompute trending scores from recent likes and comments"""
+    from utils.trending import trending_scores
+
+    rows = trending_scores.rebuild(timedelta(days=args.days))
+    print(f"Trending scores set for {rows} artworks")
+
+
+def prune_refresh_tokens_command(args):
+    """Delete expired refresh tokens"""
+    from utils.refresh_tokens import prune_refresh_tokens
+
+    db = SessionLocal()
+    try:
+        print(f"{prune_refresh_tokens(db)} expired refresh tokens deleted")
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ArtBuddy maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    derivatives = commands.add_parser("backfill-derivatives", help=backfill_derivatives.__doc__)
+    derivatives.add_argument("--batch-size", type=int, default=100)
+    derivatives.add_argument("--force", action="store_true", help="regenerate for every artwork")
+    derivatives.set_defaults(func=backfill_derivatives)
+
+    migrate = commands.add_parser("migrate-images", help=migrate_images.__doc__)
+    migrate.add_argument("--batch-size", type=int, default=100)
+    migrate.add_argument("--gallery", default="gallery.json", help="Flask gallery file to migrate as well")
+    migrate.add_argument("--keep-originals", action="store_true", help="leave the old flat files in place")
+    migrate.set_defaults(func=migrate_images)
+
+    gc = commands.add_parser("gc-images", help=gc_images.__doc__)
+    gc.add_argument("--min-age-minutes", type=int, default=60)
+    gc.set_defaults(func=gc_images)
+
+    backfill = commands.add_parser("backfill-counters", help=backfill_counters_command.__doc__)
+    backfill.set_defaults(func=backfill_counters_command)
+
+    repair = commands.add_parser("repair-counters", help=repair_counters.__doc__)
+    repair.add_argument("--dry-run", action="store_true", help="only report drifted artworks")
+    repair.set_defaults(func=repair_counters)
+
+    schema = commands.add_parser("check-schema", help=check_schema.__doc__)
+    schema.add_argument("--ddl", metavar="DIALECT", help="print CREATE statements for DIALECT (e.g. postgresql) instead")
+    schema.set_defaults(func=check_schema, skip_migrations=True)
+
+    search = commands.add_parser("rebuild-search-index", help=rebuild_search_index_command.__doc__)
+    search.set_defaults(func=rebuild_search_index_command)
+
+    trending = commands.add_parser("backfill-trending", help=backfill_trending.__doc__)
+    trending.add_argument("--days", type=float, default=7, help="how far back likes and comments count")
+    trending.set_defaults(func=backfill_trending)
+
+    prune = commands.add_parser("prune-refresh-tokens", help=prune_refresh_tokens_command.__doc__)
+    prune.set_defaults(func=prune_refresh_tokens_command)
+
+    args = parser.parse_args(argv)
+    if not getattr(args, "skip_migrations", False):
+        create_tables()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
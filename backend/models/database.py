@@ -1,11 +1,99 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Float
+import asyncio
+import functools
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+from sqlalchemy import create_engine, event, func, inspect, select, text, update, Column, Index, Integer, String, DateTime, Text, Boolean, ForeignKey, Float
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 
-DATABASE_URL = "sqlite:///./artbuddy.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./artbuddy.db")
+# Replica for read-only endpoints; unset means a read-only pool on the primary (SQLite) or the primary itself
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", "")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Threads that run blocking database work for async handlers; by default as
+# many as the pool can hand out connections, so no thread waits on the pool
+DB_THREADS = int(os.getenv("DB_THREADS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+def _tune_sqlite(dbapi_connection, connection_record):
+    """WAL lets readers proceed while a write is in progress; NORMAL sync is safe under WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def _tune_sqlite_reader(dbapi_connection, connection_record):
+    """Read-only connections can't change the journal mode; they just read the WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def build_engine(url: str = DATABASE_URL, tune_sqlite: bool = True, read_only: bool = False, **options) -> Engine:
+    """
+    Pooled engine for ``url``. File-backed SQLite gets the WAL/busy-timeout
+    pragmas on every new connection; PostgreSQL (psycopg2) uses the same pool
+    settings. ``read_only`` makes the connections refuse writes. ``options``
+    override any create_engine argument.
+    """
+    settings = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    backend = make_url(url).get_backend_name()
+    sqlite = backend == "sqlite"
+    in_memory = sqlite and make_url(url).database in (None, "", ":memory:")
+    if in_memory:
+        # One connection per thread (SingletonThreadPool) takes no queue-pool settings
+        settings = {}
+    if sqlite:
+        settings["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    elif backend == "postgresql" and read_only:
+        settings["connect_args"] = {"options": "-c default_transaction_read_only=on"}
+    settings.update(options)
+    
+    new_engine = create_engine(url, **settings)
+    if sqlite and tune_sqlite and not in_memory:
+        event.listen(new_engine, "connect", _tune_sqlite_reader if read_only else _tune_sqlite)
+    return new_engine
+
+def _read_only_sqlite_url(url: str) -> Optional[str]:
+    """The same SQLite file opened read-only (mode=ro), or None if ``url`` isn't a SQLite file"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return None
+    return f"sqlite:///file:{os.path.abspath(parsed.database)}?mode=ro&uri=true"
+
+def build_read_engine() -> Engine:
+    """
+    Engine for read-only endpoints: READ_DATABASE_URL if set, else a separate
+    read-only pool on a SQLite file so readers never queue behind writers for
+    a connection, else the primary engine itself.
+    """
+    if READ_DATABASE_URL:
+        return build_engine(READ_DATABASE_URL, read_only=True)
+    read_only_url = _read_only_sqlite_url(DATABASE_URL)
+    if read_only_url:
+        return build_engine(read_only_url, read_only=True)
+    return engine
+
+engine = build_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+read_engine = build_read_engine()
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
 class User(Base):
@@ -31,17 +119,28 @@ class Artwork(Base):
     negative_prompt = Column(Text)
     image_path = Column(String)
     image_url = Column(String)
+    derivatives = Column(Text)  # JSON srcset map: {"256w": "/static/images/ab/cd/<sha256>_256.webp"}
     guidance_scale = Column(Float, default=7.5)
     width = Column(Integer, default=512)
     height = Column(Integer, default=512)
     is_public = Column(Boolean, default=True)
     is_featured = Column(Boolean, default=False)
+    # Denormalized counters, kept in step by the like/comment endpoints
+    likes_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comments_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     creator_id = Column(Integer, ForeignKey("users.id"))
     
     creator = relationship("User", back_populates="artworks")
     likes = relationship("Like", back_populates="artwork")
     comments = relationship("Comment", back_populates="artwork")
+    
+    __table_args__ = (
+        # Gallery keyset pagination: filter prefix, then the (created_at, id) sort key
+        Index("ix_artworks_gallery_featured", "is_public", "is_featured", "created_at", "id"),
+        Index("ix_artworks_gallery", "is_public", "created_at", "id"),
+        Index("ix_artworks_creator", "creator_id", "created_at", "id"),
+    )
 
 class Like(Base):
     __tablename__ = "likes"
@@ -53,6 +152,13 @@ class Like(Base):
     
     user = relationship("User", back_populates="likes")
     artwork = relationship("Artwork", back_populates="likes")
+    
+    __table_args__ = (
+        # One like per user per artwork; the toggle relies on it to be race-free
+        Index("uq_likes_user_artwork", "user_id", "artwork_id", unique=True),
+        # Counter flushes and repairs count likes per artwork
+        Index("ix_likes_artwork", "artwork_id"),
+    )
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -66,12 +172,226 @@ class Comment(Base):
     user = relationship("User", back_populates="comments")
     artwork = relationship("Artwork", back_populates="comments")
 
+class ImageBlob(Base):
+    __tablename__ = "image_blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, unique=True, index=True)  # relative to static/images, e.g. "ab/cd/<sha256>.png"
+    digest = Column(String(64), index=True)
+    size = Column(Integer)
+    refcount = Column(Integer, default=0)
+    is_placeholder = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    stored_at = Column(DateTime, default=datetime.utcnow)  # last put() of these bytes; see utils/storage.py
+
+class GenerationCacheEntry(Base):
+    __tablename__ = "generation_cache"
+
+    # Each row holds one image store reference on its blob; see utils/generation_cache.py
+    key = Column(String(64), primary_key=True)  # generation_key() of the request parameters
+    blob = Column(String, index=True)  # image_blobs.path
+    last_used_at = Column(DateTime, nullable=False, index=True)
+
+class TrendingScore(Base):
+    __tablename__ = "trending_scores"
+    
+    # Only artworks with recent likes/comments have a row; see utils/trending.py
+    artwork_id = Column(Integer, ForeignKey("artworks.id"), primary_key=True)
+    score = Column(Float, nullable=False, default=0.0)
+    decayed_at = Column(DateTime, nullable=False)  # score is the decayed value as of this tick
+    
+    __table_args__ = (
+        Index("ix_trending_scores_score", "score", "artwork_id"),
+        Index("ix_trending_scores_decayed_at", "decayed_at"),
+    )
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    # Revoked rows are kept until they expire: presenting one again means it leaked (see utils/refresh_tokens.py)
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    family = Column(String(32), index=True)  # shared by every rotation of one login
+    token_hash = Column(String(64), unique=True, index=True)  # SHA-256 of the token; the token itself is never stored
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+
+# Full-text search over artwork titles and prompts. Neither form fits the ORM
+# metadata: SQLite gets an external-content FTS5 table kept in sync by
+# triggers, PostgreSQL a GIN index over a weighted tsvector expression (which
+# the planner keeps in sync by itself). Titles outrank prompts in both.
+SEARCH_TABLE = "artworks_fts"
+SEARCH_INDEX = "ix_artworks_search"
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(prompt, '')), 'B')"
+)
+
+def search_ddl(dialect_name: str) -> List[str]:
+    """Statements that create the full-text index on ``dialect_name`` (idempotent)"""
+    if dialect_name == "sqlite":
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            f"title, prompt, content='artworks', content_rowid='id', tokenize='porter unicode61')",
+            f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON artworks BEGIN "
+            f"INSERT INTO {SEARCH_TABLE}(rowid, title, prompt) VALUES (new.id, new.title, new.prompt); END",
+            f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON artworks BEGIN "
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, prompt) VALUES ('delete', old.id, old.title, old.prompt); END",
+            # Only text edits touch the index; counter updates don't fire this
+            f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title, prompt ON artworks BEGIN "
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, prompt) VALUES ('delete', old.id, old.title, old.prompt); "
+            f"INSERT INTO {SEARCH_TABLE}(rowid, title, prompt) VALUES (new.id, new.title, new.prompt); END",
+        ]
+    if dialect_name == "postgresql":
+        return [f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON artworks USING GIN (({SEARCH_DOCUMENT}))"]
+    return []
+
+def has_search_index(bind=None) -> bool:
+    bind = bind or engine
+    if bind.dialect.name == "sqlite":
+        return inspect(bind).has_table(SEARCH_TABLE)
+    if bind.dialect.name == "postgresql":
+        with bind.connect() as conn:
+            return conn.execute(
+                text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {"name": SEARCH_INDEX}
+            ).first() is not None
+    return False
+
+def rebuild_search_index(bind=None):
+    """Re-derive the full-text index from the artworks table"""
+    bind = bind or engine
+    with bind.begin() as conn:
+        if bind.dialect.name == "sqlite":
+            conn.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+        elif bind.dialect.name == "postgresql":
+            conn.execute(text(f"REINDEX INDEX {SEARCH_INDEX}"))
+
+def real_counts():
+    """Correlated subqueries giving the true like/comment counts per artwork"""
+    likes = select(func.count(Like.id)).where(Like.artwork_id == Artwork.id).scalar_subquery()
+    comments = select(func.count(Comment.id)).where(Comment.artwork_id == Artwork.id).scalar_subquery()
+    return likes, comments
+
+def backfill_counters(bind=None) -> int:
+    """Set likes_count/comments_count on every artwork from the likes and comments tables"""
+    bind = bind or engine
+    likes, comments = real_counts()
+    with bind.begin() as conn:
+        return conn.execute(update(Artwork).values(likes_count=likes, comments_count=comments)).rowcount
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    added = _add_missing_columns()
+    _add_missing_indexes()
+    _create_search_index()
+    if added & {"artworks.likes_count", "artworks.comments_count"}:
+        # Added columns start at 0; count what the artworks already have
+        print(f"Counters set for {backfill_counters()} artworks")
+
+def _add_missing_columns() -> set:
+    """create_all() never alters existing tables; add columns introduced since. Returns "table.column" names added"""
+    inspector = inspect(engine)
+    added = set()
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    default = f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}{default}"))
+                    added.add(f"{table.name}.{column.name}")
+    return added
+
+def _add_missing_indexes():
+    """Likewise for indexes declared after a table was first created"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                if index.unique:
+                    _remove_duplicates(table, [column.name for column in index.columns])
+                index.create(bind=engine)
+
+def _create_search_index():
+    statements = search_ddl(engine.dialect.name)
+    if not statements:
+        return
+    backfill = engine.dialect.name == "sqlite" and not has_search_index()
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+    if backfill:
+        # A new FTS5 table starts empty; index the artworks that already exist
+        rebuild_search_index()
+
+def _remove_duplicates(table, columns):
+    """Keep the oldest row of each duplicate group so a new unique index can be built"""
+    key = ", ".join(columns)
+    with engine.begin() as conn:
+        result = conn.execute(text(
+            f"DELETE FROM {table.name} WHERE id NOT IN "
+            f"(SELECT MIN(id) FROM {table.name} GROUP BY {key})"
+        ))
+    if result.rowcount:
+        print(f"Removed {result.rowcount} duplicate rows from {table.name} ({key}); "
+              f"run 'python manage.py repair-counters' to resync counters")
+
+def upsert_insert(model):
+    """INSERT for the configured database that supports ``.on_conflict_do_*()``"""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+def insert_ignore(model):
+    """INSERT ... ON CONFLICT DO NOTHING for the configured database"""
+    return upsert_insert(model).on_conflict_do_nothing()
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
+async def run_in_db_thread(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run blocking database code on the DB thread pool instead of the event loop"""
+    return await asyncio.wrap_future(db_executor.submit(functools.partial(fn, *args, **kwargs)))
+
+class ThreadedSession:
+    """
+    A Session for ``async def`` handlers. All work on it goes through
+    ``run(fn, *args)``, which calls ``fn(session, *args)`` on the DB thread
+    pool, so queries never block the event loop. Calls are sequential (one
+    request, one session), and ORM objects should be read inside ``fn``.
+    """
+    
+    def __init__(self, session_factory=SessionLocal, pinned: bool = False):
+        self.session = session_factory()
+        # A read session routed to the primary for read-your-writes
+        self.pinned = pinned
+        self._pending: Optional[Future] = None
+    
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        self._pending = db_executor.submit(functools.partial(fn, self.session, *args, **kwargs))
+        return await asyncio.wrap_future(self._pending)
+    
+    async def close(self):
+        pending = self._pending
+        if pending is not None and not pending.done():
+            # The request was cancelled mid-query; let the thread finish with the session first
+            await asyncio.wait([asyncio.wrap_future(pending)])
+        await asyncio.wrap_future(db_executor.submit(self.session.close))
+
+async def get_threaded_db():
+    db = ThreadedSession()
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -1,14 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import delete, desc, exists, literal, select, update
 from pydantic import BaseModel
-from typing import List, Optional
-from models.database import get_db, User, Artwork, Like, Comment
-from utils.auth import verify_token
+from typing import Dict, Iterator, List, Optional
+from models.database import (
+    get_threaded_db, insert_ignore, run_in_db_thread,
+    ReadSessionLocal, SessionLocal, ThreadedSession, User, Artwork, Like, Comment, TrendingScore
+)
+from utils.auth import decode_token, security
+from utils.read_routing import get_read_db, pin_to_primary, pinned_to_primary
 from utils.ai_generator import ai_generator
+from utils.jobs import generation_queue, DONE, Job, QueueFullError
+from utils.generation_cache import generation_cache, generation_key
+from utils.provider_health import provider_health
+from utils.derivatives import create_derivatives_async
+from utils.storage import image_store
+from utils.pagination import after_cursor, after_score_cursor, encode_cursor, encode_score_cursor
+from utils.response_cache import CachedResponse, gallery_cache
+from utils.like_buffer import like_buffer
+from utils.search import search_artworks
+from utils.trending import trending_scores, TRENDING_COMMENT_WEIGHT
+from utils.user_cache import user_cache, UserSnapshot
+from utils.passwords import password_hasher
+from utils.rate_limit import Bucket, daily_quota, generation_buckets, rate_limiter
+from utils.cache import redis_tier
 
 router = APIRouter(prefix="/artworks", tags=["artworks"])
 
+# Rows fetched per round trip when streaming an export
+EXPORT_BATCH_SIZE = 500
+
 class ArtworkCreate(BaseModel):
     title: str
     prompt: str
@@ -28,6 +54,24 @@ class ArtworkResponse(BaseModel):
     comments_count: int
     is_featured: bool
     created_at: str
+    srcset: Dict[str, str] = {}
+
+class ArtworkExport(ArtworkResponse):
+    negative_prompt: Optional[str] = None
+    guidance_scale: float
+    width: int
+    height: int
+    is_public: bool
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    status_url: str
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    artwork: Optional[ArtworkResponse] = None
 
 class CommentCreate(BaseModel):
     content: str
@@ -38,179 +82,528 @@ class CommentResponse(BaseModel):
     username: str
     created_at: str
 
-def get_current_user(username: str = Depends(verify_token), db: Session = Depends(get_db)):
+def _load_user(db: Session, username: str) -> UserSnapshot:
     user = db.query(User).filter(User.username == username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return UserSnapshot.of(user)
 
-@router.post("/generate", response_model=ArtworkResponse)
-async def generate_artwork(
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserSnapshot:
+    token = credentials.credentials
+    cached = user_cache.get_local(token)
+    if cached is not None:
+        return cached
+    
+    payload = decode_token(token)
+    
+    async def load():
+        # No session unless needed: a cache hit costs no database work at all
+        db = ThreadedSession()
+        try:
+            return await db.run(_load_user, payload["sub"])
+        finally:
+            await db.close()
+    
+    return await user_cache.get_or_load_user(token, load, payload.get("exp"))
+
+async def generation_rate_limit(
+    request: Request,
+    response: Response,
+    current_user: UserSnapshot = Depends(get_current_user)
+) -> UserSnapshot:
+    """The current user, once the request fits their generation rate and daily quota"""
+    client_ip = request.client.host if request.client else None
+    buckets = generation_buckets(current_user.id, client_ip)
+    decision = await rate_limiter.hit(buckets)
+    if not decision.allowed:
+        detail = "Daily generation quota reached" if decision.bucket.name == "daily_quota" else "Too many generation requests"
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers=decision.headers()
+        )
+    response.headers.update(decision.headers())
+    # Handed back by the route if the request ends up doing no generation
+    request.state.generation_buckets = buckets
+    return current_user
+
+def _artwork_response(artwork: Artwork, creator_username: str) -> ArtworkResponse:
+    return ArtworkResponse(
+        id=artwork.id,
+        title=artwork.title,
+        prompt=artwork.prompt,
+        image_url=artwork.image_url,
+        creator_username=creator_username,
+        likes_count=(artwork.likes_count or 0) + like_buffer.pending(artwork.id),
+        comments_count=artwork.comments_count or 0,
+        is_featured=artwork.is_featured,
+        created_at=artwork.created_at.isoformat(),
+        srcset=json.loads(artwork.derivatives) if artwork.derivatives else {}
+    )
+
+def _save_artwork(
     artwork: ArtworkCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
+    image_path: str,
+    filename: str,
+    derivatives: Dict[str, str],
+    user_id: int,
+    username: str
+) -> ArtworkResponse:
+    db = SessionLocal()
     try:
-        # Generate AI artwork
-        image_path, filename = await ai_generator.generate_image(
-            prompt=artwork.prompt,
-            negative_prompt=artwork.negative_prompt,
-            guidance_scale=artwork.guidance_scale,
-            width=artwork.width,
-            height=artwork.height
-        )
-        
-        # Save to database
         db_artwork = Artwork(
             title=artwork.title,
             prompt=artwork.prompt,
             negative_prompt=artwork.negative_prompt,
             image_path=image_path,
-            image_url=f"/static/images/{filename}",
+            image_url=image_store.url_for(filename),
+            derivatives=json.dumps(derivatives),
             guidance_scale=artwork.guidance_scale,
             width=artwork.width,
             height=artwork.height,
             is_public=artwork.is_public,
-            creator_id=current_user.id
+            creator_id=user_id
         )
         
         db.add(db_artwork)
+        # The artwork keeps its image blob alive; same transaction as the row
+        image_store.acquire(image_path, db)
         db.commit()
         db.refresh(db_artwork)
+        if db_artwork.is_public:
+            gallery_cache.invalidate("gallery:offset")
         
-        return ArtworkResponse(
-            id=db_artwork.id,
-            title=db_artwork.title,
-            prompt=db_artwork.prompt,
-            image_url=db_artwork.image_url,
-            creator_username=current_user.username,
-            likes_count=0,
-            comments_count=0,
-            is_featured=db_artwork.is_featured,
-            created_at=db_artwork.created_at.isoformat()
+        return _artwork_response(db_artwork, username)
+    finally:
+        db.close()
+
+async def _run_generation(
+    artwork: ArtworkCreate,
+    user_id: int,
+    username: str,
+    quota: List[Bucket] = ()
+) -> ArtworkResponse:
+    try:
+        return await _generate_and_save(artwork, user_id, username)
+    except Exception:
+        # A failed job doesn't count against the daily quota
+        await rate_limiter.refund(quota)
+        raise
+
+async def _generate_and_save(artwork: ArtworkCreate, user_id: int, username: str) -> ArtworkResponse:
+    # Generate AI artwork (re-checking the cache, an identical job may have finished meanwhile)
+    image_path, filename = await generation_cache.get_or_generate(
+        ai_generator.model_id,
+        ai_generator.generate_image,
+        prompt=artwork.prompt,
+        negative_prompt=artwork.negative_prompt,
+        guidance_scale=artwork.guidance_scale,
+        width=artwork.width,
+        height=artwork.height,
+        record=False
+    )
+    
+    # Thumbnails/WebP for gallery cards, then save to database without holding the event loop
+    derivatives = await create_derivatives_async(image_path)
+    return await run_in_db_thread(_save_artwork, artwork, image_path, filename, derivatives, user_id, username)
+
+def _json_body(content) -> bytes:
+    """Serialize exactly as FastAPI's default JSONResponse would"""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":")
+    ).encode("utf-8")
+
+def _job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        id=job.id,
+        status=job.status,
+        status_url=f"/artworks/jobs/{job.id}",
+        created_at=_timestamp(job.created_at),
+        started_at=_timestamp(job.started_at),
+        finished_at=_timestamp(job.finished_at),
+        error=job.error,
+        artwork=job.result
+    )
+
+def _timestamp(value: Optional[float]) -> Optional[str]:
+    return datetime.utcfromtimestamp(value).isoformat() if value is not None else None
+
+@router.post("/generate", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def generate_artwork(
+    artwork: ArtworkCreate,
+    request: Request,
+    response: Response,
+    current_user: UserSnapshot = Depends(generation_rate_limit)
+):
+    user_id, username = current_user.id, current_user.username
+    # The new artwork should show up in this client's next my-gallery read
+    pin_to_primary(response)
+    
+    # Identical request already generated: reuse the stored image, no provider call
+    cached = await generation_cache.fetch(generation_key(
+        ai_generator.model_id,
+        artwork.prompt,
+        artwork.negative_prompt,
+        artwork.guidance_scale,
+        artwork.width,
+        artwork.height
+    ))
+    buckets = request.state.generation_buckets
+    if cached:
+        # No provider call, so no quota used; the per-minute limits still apply
+        await rate_limiter.refund(daily_quota(buckets))
+        image_path, filename = cached
+        derivatives = await create_derivatives_async(image_path)
+        result = await run_in_db_thread(_save_artwork, artwork, image_path, filename, derivatives, user_id, username)
+        return _job_response(generation_queue.record(user_id, result))
+    
+    try:
+        job = generation_queue.submit(
+            user_id,
+            lambda: _run_generation(artwork, user_id, username, daily_quota(buckets))
         )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    except QueueFullError as e:
+        # Turned away before any work: give back everything the request took
+        await rate_limiter.refund(buckets)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(generation_queue.retry_after())}
+        )
+    
+    return _job_response(job)
+
+@router.get("/jobs", response_model=List[JobResponse])
+async def list_jobs(current_user: UserSnapshot = Depends(get_current_user)):
+    return [_job_response(job) for job in generation_queue.jobs_for(current_user.id)]
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, response: Response, current_user: UserSnapshot = Depends(get_current_user)):
+    job = generation_queue.get(job_id)
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == DONE:
+        # Jobs can outlast the pin set by /generate; the artwork was just written
+        pin_to_primary(response)
+    return _job_response(job)
+
+@router.get("/stats")
+async def get_stats():
+    return {
+        "jobs": generation_queue.stats(),
+        "cache": generation_cache.stats(),
+        "coalescing": generation_cache.flights.stats(),
+        "gallery_cache": gallery_cache.stats(),
+        "like_buffer": like_buffer.stats(),
+        "user_cache": user_cache.stats(),
+        "trending": trending_scores.stats(),
+        "password_hasher": password_hasher.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "shared_cache": redis_tier.stats() if redis_tier is not None else None,
+        "providers": provider_health.snapshot()
+    }
+
+def _after_cursor(cursor: str):
+    try:
+        return after_cursor(Artwork.created_at, Artwork.id, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _conditional_response(entry: CachedResponse, if_none_match: Optional[str]):
+    if entry.matches(if_none_match):
+        gallery_cache.record_not_modified()
+    return entry.respond(if_none_match)
+
+def _gallery_tags(artworks: List[Artwork], positional: bool) -> List[str]:
+    """What a cached gallery page depends on, for targeted invalidation"""
+    tags = [f"artwork:{artwork.id}" for artwork in artworks]
+    if positional:
+        # Offset pages shift whenever a new public artwork lands at the top;
+        # cursor pages start below an existing row, so new artworks never reach them
+        tags.append("gallery:offset")
+    return tags
+
+def _gallery_page(db: Session, featured_only: bool, cursor: Optional[str], skip: int, limit: int):
+    """Serialized page body, its cache tags and headers"""
+    # Counters live on the row and creators are joined in: one query per page
+    query = db.query(Artwork).options(joinedload(Artwork.creator)).filter(Artwork.is_public == True)
+    
+    if featured_only:
+        query = query.filter(Artwork.is_featured == True)
+    
+    query = query.order_by(desc(Artwork.created_at), desc(Artwork.id))
+    if cursor:
+        # Keyset pagination: seek past the last row seen instead of skipping rows
+        query = query.filter(_after_cursor(cursor))
+    else:
+        query = query.offset(skip)
+    
+    artworks = query.limit(limit).all()
+    headers = {}
+    if len(artworks) == limit:
+        last = artworks[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+    
+    items = [_artwork_response(artwork, artwork.creator.username) for artwork in artworks]
+    return _json_body(items), _gallery_tags(artworks, positional=cursor is None), headers
 
 @router.get("/gallery", response_model=List[ArtworkResponse])
 async def get_gallery(
     skip: int = Query(0, ge=0),
-    limit: int = Query(20, le=100),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     featured_only: bool = False,
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    db: ThreadedSession = Depends(get_read_db)
 ):
-    query = db.query(Artwork).filter(Artwork.is_public == True)
+    key = (featured_only, cursor, 0 if cursor else skip, limit)
     
-    if featured_only:
-        query = query.filter(Artwork.is_featured == True)
+    async def build():
+        body, tags, headers = await db.run(_gallery_page, featured_only, cursor, skip, limit)
+        return CachedResponse(body, headers), tags
     
-    artworks = query.order_by(desc(Artwork.created_at)).offset(skip).limit(limit).all()
+    # A client that just wrote reads the primary, not a page another client built from a lagging replica
+    entry = await gallery_cache.get_or_load(key, build, refresh=db.pinned)
+    return _conditional_response(entry, if_none_match)
+
+def _my_artworks(db: Session, user_id: int):
+    return (
+        db.query(Artwork)
+        .filter(Artwork.creator_id == user_id)
+        .order_by(desc(Artwork.created_at), desc(Artwork.id))
+    )
+
+def _my_gallery_page(db: Session, user_id: int, username: str, cursor: Optional[str], limit: int):
+    query = _my_artworks(db, user_id)
+    if cursor:
+        query = query.filter(_after_cursor(cursor))
     
-    result = []
-    for artwork in artworks:
-        likes_count = db.query(Like).filter(Like.artwork_id == artwork.id).count()
-        comments_count = db.query(Comment).filter(Comment.artwork_id == artwork.id).count()
-        
-        result.append(ArtworkResponse(
-            id=artwork.id,
-            title=artwork.title,
-            prompt=artwork.prompt,
-            image_url=artwork.image_url,
-            creator_username=artwork.creator.username,
-            likes_count=likes_count,
-            comments_count=comments_count,
-            is_featured=artwork.is_featured,
-            created_at=artwork.created_at.isoformat()
-        ))
+    artworks = query.limit(limit).all()
+    next_cursor = None
+    if len(artworks) == limit:
+        next_cursor = encode_cursor(artworks[-1].created_at, artworks[-1].id)
     
-    return result
+    return [_artwork_response(artwork, username) for artwork in artworks], next_cursor
 
 @router.get("/my-gallery", response_model=List[ArtworkResponse])
 async def get_my_gallery(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: ThreadedSession = Depends(get_read_db)
 ):
-    artworks = db.query(Artwork).filter(Artwork.creator_id == current_user.id).order_by(desc(Artwork.created_at)).all()
+    items, next_cursor = await db.run(_my_gallery_page, current_user.id, current_user.username, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+def _search_page(db: Session, q: str, cursor: Optional[str], limit: int):
+    try:
+        query = search_artworks(db, q, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if query is None:
+        return [], None
     
-    result = []
-    for artwork in artworks:
-        likes_count = db.query(Like).filter(Like.artwork_id == artwork.id).count()
-        comments_count = db.query(Comment).filter(Comment.artwork_id == artwork.id).count()
-        
-        result.append(ArtworkResponse(
-            id=artwork.id,
-            title=artwork.title,
-            prompt=artwork.prompt,
-            image_url=artwork.image_url,
-            creator_username=current_user.username,
-            likes_count=likes_count,
-            comments_count=comments_count,
-            is_featured=artwork.is_featured,
-            created_at=artwork.created_at.isoformat()
-        ))
+    rows = query.limit(limit).all()
+    next_cursor = None
+    if len(rows) == limit:
+        last, score = rows[-1]
+        next_cursor = encode_score_cursor(score, last.id)
     
-    return result
+    return [_artwork_response(artwork, artwork.creator.username) for artwork, _ in rows], next_cursor
 
-@router.post("/{artwork_id}/like")
-async def toggle_like(
-    artwork_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+@router.get("/search", response_model=List[ArtworkResponse])
+async def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in titles and prompts"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    db: ThreadedSession = Depends(get_read_db)
 ):
-    artwork = db.query(Artwork).filter(Artwork.id == artwork_id).first()
-    if not artwork:
-        raise HTTPException(status_code=404, detail="Artwork not found")
+    """
+    Public artworks whose title or prompt contains every word of ``q``, best
+    matches first. Only the newest SEARCH_CANDIDATES matches are ranked, so
+    for very common words older artworks are not returned on any page.
+    """
+    items, next_cursor = await db.run(_search_page, q, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+def _trending_page(db: Session, cursor: Optional[str], limit: int):
+    # Pick the page from trending_scores alone, walking its score index;
+    # only then load those artworks (joining first lets the planner sort all of them)
+    page = (
+        select(TrendingScore.artwork_id, TrendingScore.score)
+        .where(exists().where(Artwork.id == TrendingScore.artwork_id, Artwork.is_public == True))
+        .order_by(desc(TrendingScore.score), desc(TrendingScore.artwork_id))
+        .limit(limit)
+    )
+    if cursor:
+        try:
+            page = page.where(after_score_cursor(TrendingScore.score, TrendingScore.artwork_id, cursor, descending=True))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    page = page.subquery("page")
     
-    existing_like = db.query(Like).filter(
-        Like.user_id == current_user.id,
-        Like.artwork_id == artwork_id
-    ).first()
+    rows = (
+        db.query(Artwork, page.c.score)
+        .join(page, Artwork.id == page.c.artwork_id)
+        .options(joinedload(Artwork.creator))
+        .order_by(desc(page.c.score), desc(page.c.artwork_id))
+        .all()
+    )
+    next_cursor = None
+    if len(rows) == limit:
+        last, score = rows[-1]
+        next_cursor = encode_score_cursor(score, last.id)
     
-    if existing_like:
-        db.delete(existing_like)
-        liked = False
-    else:
-        new_like = Like(user_id=current_user.id, artwork_id=artwork_id)
-        db.add(new_like)
-        liked = True
+    return [_artwork_response(artwork, artwork.creator.username) for artwork, _ in rows], next_cursor
+
+@router.get("/trending", response_model=List[ArtworkResponse])
+async def get_trending(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    db: ThreadedSession = Depends(get_read_db)
+):
+    """Public artworks ordered by recent likes and comments, decayed over time"""
+    items, next_cursor = await db.run(_trending_page, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+def _export_lines(user_id: int, username: str, session_factory=ReadSessionLocal) -> Iterator[bytes]:
+    """
+    One JSON document per artwork, read in fixed-size batches. Runs in the
+    threadpool with its own session, since it outlives the request's.
+    """
+    db = session_factory()
+    try:
+        for artwork in _my_artworks(db, user_id).yield_per(EXPORT_BATCH_SIZE):
+            item = ArtworkExport(
+                **_artwork_response(artwork, username).model_dump(),
+                negative_prompt=artwork.negative_prompt,
+                guidance_scale=artwork.guidance_scale,
+                width=artwork.width,
+                height=artwork.height,
+                is_public=artwork.is_public
+            )
+            yield item.model_dump_json().encode() + b"\n"
+    finally:
+        db.close()
+
+@router.get("/my-gallery/export")
+async def export_my_gallery(request: Request, current_user: UserSnapshot = Depends(get_current_user)):
+    """Every artwork of the current user as streamed NDJSON (newest first)"""
+    session_factory = SessionLocal if pinned_to_primary(request) else ReadSessionLocal
+    return StreamingResponse(
+        _export_lines(current_user.id, current_user.username, session_factory),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{current_user.username}-artworks.ndjson"'}
+    )
+
+def _toggle_like(db: Session, user_id: int, artwork_id: int):
+    """Returns (liked, changed)"""
+    # Unlike if a like exists, otherwise like; each step is a single atomic
+    # statement and the unique (user_id, artwork_id) index settles races
+    removed = db.execute(
+        delete(Like).where(Like.user_id == user_id, Like.artwork_id == artwork_id)
+    ).rowcount
+    if removed:
+        db.commit()
+        return False, True
     
+    added = db.execute(
+        insert_ignore(Like).from_select(
+            ["user_id", "artwork_id", "created_at"],
+            select(
+                literal(user_id),
+                literal(artwork_id),
+                literal(datetime.utcnow())
+            ).where(exists().where(Artwork.id == artwork_id))
+        )
+    ).rowcount
+    if not added and db.query(Artwork.id).filter(Artwork.id == artwork_id).first() is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Artwork not found")
     db.commit()
-    likes_count = db.query(Like).filter(Like.artwork_id == artwork_id).count()
-    
-    return {"liked": liked, "likes_count": likes_count}
+    # Nothing inserted for an existing artwork: a concurrent click already liked it
+    return True, bool(added)
 
-@router.post("/{artwork_id}/comments", response_model=CommentResponse)
-async def add_comment(
+def _stored_likes(db: Session, artwork_id: int) -> int:
+    return db.query(Artwork.likes_count).filter(Artwork.id == artwork_id).scalar() or 0
+
+@router.post("/{artwork_id}/like")
+async def toggle_like(
     artwork_id: int,
-    comment: CommentCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: ThreadedSession = Depends(get_threaded_db)
 ):
-    artwork = db.query(Artwork).filter(Artwork.id == artwork_id).first()
+    liked, changed = await db.run(_toggle_like, current_user.id, artwork_id)
+    
+    # Counter updates are buffered and written in batches
+    if changed:
+        like_buffer.add(artwork_id, 1 if liked else -1)
+        gallery_cache.invalidate(f"artwork:{artwork_id}")
+    
+    stored = await db.run(_stored_likes, artwork_id)
+    return {"liked": liked, "likes_count": stored + like_buffer.pending(artwork_id)}
+
+def _add_comment(db: Session, user_id: int, username: str, artwork_id: int, content: str) -> CommentResponse:
+    artwork = db.query(Artwork.id).filter(Artwork.id == artwork_id).first()
     if not artwork:
         raise HTTPException(status_code=404, detail="Artwork not found")
     
     db_comment = Comment(
-        content=comment.content,
-        user_id=current_user.id,
+        content=content,
+        user_id=user_id,
         artwork_id=artwork_id
     )
     
     db.add(db_comment)
+    db.execute(
+        update(Artwork)
+        .where(Artwork.id == artwork_id)
+        .values(comments_count=Artwork.comments_count + 1)
+    )
+    trending_scores.bump(db.connection(), {artwork_id: TRENDING_COMMENT_WEIGHT})
     db.commit()
     db.refresh(db_comment)
     
     return CommentResponse(
         id=db_comment.id,
         content=db_comment.content,
-        username=current_user.username,
+        username=username,
         created_at=db_comment.created_at.isoformat()
     )
 
-@router.get("/{artwork_id}/comments", response_model=List[CommentResponse])
-async def get_comments(artwork_id: int, db: Session = Depends(get_db)):
-    comments = db.query(Comment).filter(Comment.artwork_id == artwork_id).order_by(desc(Comment.created_at)).all()
+@router.post("/{artwork_id}/comments", response_model=CommentResponse)
+async def add_comment(
+    artwork_id: int,
+    comment: CommentCreate,
+    response: Response,
+    current_user: UserSnapshot = Depends(get_current_user),
+    db: ThreadedSession = Depends(get_threaded_db)
+):
+    result = await db.run(_add_comment, current_user.id, current_user.username, artwork_id, comment.content)
+    gallery_cache.invalidate(f"artwork:{artwork_id}")
+    pin_to_primary(response)
+    return result
+
+def _comments(db: Session, artwork_id: int) -> List[CommentResponse]:
+    comments = (
+        db.query(Comment)
+        .options(joinedload(Comment.user))
+        .filter(Comment.artwork_id == artwork_id)
+        .order_by(desc(Comment.created_at))
+        .all()
+    )
     
     return [
         CommentResponse(
@@ -220,4 +613,8 @@ async def get_comments(artwork_id: int, db: Session = Depends(get_db)):
             created_at=comment.created_at.isoformat()
         )
         for comment in comments
-    ]
\ No newline at end of file
+    ]
+
+@router.get("/{artwork_id}/comments", response_model=List[CommentResponse])
+async def get_comments(artwork_id: int, db: ThreadedSession = Depends(get_read_db)):
+    return await db.run(_comments, artwork_id)
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from typing import Optional
+from typing import Optional, Tuple
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import timedelta
-from models.database import get_db, User
-from utils.auth import verify_password, get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from models.database import get_threaded_db, ThreadedSession, User
+from utils.auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from utils.passwords import password_hasher
+from utils.refresh_tokens import issue_refresh_token, revoke_refresh_token, rotate_refresh_token
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -22,12 +25,32 @@ class UserResponse(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str
     user: UserResponse
 
-@router.post("/register", response_model=Token)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
-    # Check if user exists
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+def _token_response(user: User, refresh_token: str) -> dict:
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user.username}, expires_delta=access_token_expires
+    )
+    
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "user": UserResponse(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_admin=user.is_admin
+        )
+    }
+
+def _check_available(db: Session, user: UserCreate):
     db_user = db.query(User).filter(
         (User.email == user.email) | (User.username == user.username)
     ).first()
@@ -36,57 +59,76 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
             status_code=400,
             detail="Username or email already registered"
         )
-    
-    # Create new user
-    hashed_password = get_password_hash(user.password)
+
+def _create_user(db: Session, user: UserCreate, hashed_password: str) -> Tuple[User, str]:
     db_user = User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
+    try:
+        db.flush()
+        refresh_token = issue_refresh_token(db, db_user.id)
+        db.commit()
+    except IntegrityError:
+        # Taken by a concurrent registration while the password was hashing
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail="Username or email already registered"
+        )
     db.refresh(db_user)
+    return db_user, refresh_token
+
+@router.post("/register", response_model=Token)
+async def register(user: UserCreate, db: ThreadedSession = Depends(get_threaded_db)):
+    # Check if user exists before paying for the hash
+    await db.run(_check_available, user)
     
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": db_user.username}, expires_delta=access_token_expires
-    )
+    # Create new user
+    hashed_password = await password_hasher.hash(user.password)
+    db_user, refresh_token = await db.run(_create_user, user, hashed_password)
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": UserResponse(
-            id=db_user.id,
-            username=db_user.username,
-            email=db_user.email,
-            is_admin=db_user.is_admin
-        )
-    }
+    return _token_response(db_user, refresh_token)
+
+def _find_user(db: Session, username: str) -> Optional[User]:
+    return db.query(User).filter(User.username == username).first()
+
+def _start_session(db: Session, user: User, new_hash: Optional[str]) -> str:
+    # Stored with an outdated bcrypt cost: upgrade it now that we know the password
+    if new_hash:
+        user.hashed_password = new_hash
+    refresh_token = issue_refresh_token(db, user.id)
+    db.commit()
+    db.refresh(user)
+    return refresh_token
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: ThreadedSession = Depends(get_threaded_db)):
+    user = await db.run(_find_user, form_data.username)
+    matches, new_hash = await password_hasher.verify_and_update(
+        form_data.password, user.hashed_password if user else None
+    )
+    if not matches:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    refresh_token = await db.run(_start_session, user, new_hash)
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": UserResponse(
-            id=user.id,
-            username=user.username,
-            email=user.email,
-            is_admin=user.is_admin
-        )
-    }
\ No newline at end of file
+    return _token_response(user, refresh_token)
+
+@router.post("/refresh", response_model=Token)
+async def refresh(body: RefreshRequest, db: ThreadedSession = Depends(get_threaded_db)):
+    """New access token (and rotated refresh token) without the password"""
+    user, refresh_token = await db.run(rotate_refresh_token, body.refresh_token)
+    return _token_response(user, refresh_token)
+
+@router.post("/logout")
+async def logout(body: RefreshRequest, db: ThreadedSession = Depends(get_threaded_db)):
+    # Access tokens already issued stay valid until they expire
+    await db.run(revoke_refresh_token, body.refresh_token)
+    return {"message": "Logged out"}
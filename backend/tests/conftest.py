@@ -0,0 +1,114 @@
+"""
+Shared fixtures.
+
+The environment is set up before any application module is imported: a
+throwaway SQLite database and image store, in-process caches only (no
+Redis), cheap bcrypt and no background flushing, so tests decide when
+buffered work is written.
+"""
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="artbuddy-tests-")
+os.environ.update({
+    "HF_TOKEN": "test",
+    "DATABASE_URL": f"sqlite:///{os.path.join(_TMP, 'test.db')}",
+    "IMAGE_STORE_ROOT": os.path.join(_TMP, "images"),
+    "BCRYPT_ROUNDS": "4",
+    "PASSWORD_HASH_WORKERS": "1",
+    "LIKE_FLUSH_INTERVAL_SECONDS": "3600",
+    "TRENDING_DECAY_INTERVAL_SECONDS": "3600",
+})
+os.environ.pop("REDIS_URL", None)
+os.environ.pop("READ_DATABASE_URL", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import Base, SessionLocal, Artwork, User, create_tables, engine  # noqa: E402
+
+create_tables()
+
+_creators = itertools.count(1)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    engine.dispose()
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Every test starts from empty tables and cold caches"""
+    yield
+    from utils.like_buffer import like_buffer
+    from utils.response_cache import gallery_cache
+    from utils.user_cache import user_cache
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    with like_buffer._lock:
+        like_buffer._deltas.clear()
+    gallery_cache.local.clear()
+    user_cache.local.clear()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The FastAPI app with its startup/shutdown hooks run once for the session"""
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def register(client):
+    """``register(name)`` -> the /auth/register response body for a new user"""
+    def register_user(username: str, password: str = "secret-password"):
+        response = client.post("/auth/register", json={
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": password,
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    return register_user
+
+
+@pytest.fixture
+def make_artworks():
+    """``make_artworks(count, creator_id)`` inserts public artworks and returns their ids, oldest first"""
+    def insert(count: int, creator_id: int = None, created_at: datetime = None, **fields):
+        db = SessionLocal()
+        try:
+            if creator_id is None:
+                number = next(_creators)
+                creator = User(username=f"creator{number}", email=f"creator{number}@example.com")
+                db.add(creator)
+                db.flush()
+                creator_id = creator.id
+            start = created_at or datetime(2024, 1, 1)
+            artworks = [
+                Artwork(**{
+                    "title": f"artwork {i}",
+                    "prompt": "a lighthouse at dusk",
+                    "image_url": "/static/images/x.png",
+                    "creator_id": creator_id,
+                    "created_at": start + timedelta(seconds=i) if created_at is None else created_at,
+                    **fields
+                })
+                for i in range(count)
+            ]
+            db.add_all(artworks)
+            db.commit()
+            return [artwork.id for artwork in artworks]
+        finally:
+            db.close()
+    return insert
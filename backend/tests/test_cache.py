@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.cache import JsonSerializer, LocalTier, RedisTier, TieredCache
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+def workers(count=2):
+    """``count`` caches named alike, each on its own client of one fake Redis, like separate processes"""
+    server = fakeredis.FakeServer()
+    tiers = [RedisTier(fakeredis.aioredis.FakeRedis(server=server), prefix="test:cache:") for _ in range(count)]
+    caches = [TieredCache("pages", 60, 100, JsonSerializer(), tier) for tier in tiers]
+    return tiers, caches
+
+
+async def eventually(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+def test_local_tier_drops_puts_older_than_an_invalidation():
+    tier = LocalTier(10)
+    version = tier.version
+    tier.invalidate(["artwork:1"])
+
+    assert not tier.put("page", "stale", ["artwork:1"], 60, version)
+    assert tier.put("page", "fresh", ["artwork:1"], 60, tier.version)
+    assert tier.get("page") == "fresh"
+
+
+def test_entry_filled_by_one_worker_is_served_to_another():
+    async def scenario():
+        tiers, (a, b) = workers()
+        for tier in tiers:
+            await tier.start()
+        try:
+            await a.set("page", {"items": [1, 2]}, tags=["artwork:1"])
+            value = await b.get("page")
+            return value, b.stats()
+        finally:
+            for tier in tiers:
+                await tier.stop()
+
+    value, stats = asyncio.run(scenario())
+    assert value == {"items": [1, 2]}
+    assert stats["l2_hits"] == 1
+
+
+def test_invalidation_reaches_every_worker():
+    async def scenario():
+        tiers, (a, b) = workers()
+        for tier in tiers:
+            await tier.start()
+        try:
+            await asyncio.sleep(0.05)  # both subscribed
+            await a.set("tagged", "v1", tags=["artwork:1"])
+            await a.set("other", "v1", tags=["artwork:2"])
+            await b.get("tagged")
+            await b.get("other")
+            assert b.get_local("tagged") == "v1"
+
+            a.invalidate("artwork:1")
+            dropped = await eventually(lambda: b.get_local("tagged") is None)
+            return dropped, b.get_local("other"), await b.get("tagged"), tiers[1].stats()
+        finally:
+            for tier in tiers:
+                await tier.stop()
+
+    dropped, other, from_redis, stats = asyncio.run(scenario())
+    assert dropped
+    assert other == "v1"
+    # Gone from the shared tier too, not just from the other worker's memory
+    assert from_redis is None
+    assert stats["invalidations_received"] >= 1
+
+
+def test_stampede_across_workers_runs_one_load():
+    loads = []
+
+    async def scenario():
+        tiers, caches = workers()
+        for tier in tiers:
+            await tier.start()
+
+        async def slow_load():
+            loads.append(1)
+            await asyncio.sleep(0.1)
+            return {"page": 1}, ["artwork:1"]
+
+        try:
+            results = await asyncio.gather(*[caches[i % 2].get_or_load("cold", slow_load) for i in range(20)])
+            return results, [cache.stats() for cache in caches]
+        finally:
+            for tier in tiers:
+                await tier.stop()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [{"page": 1}] * 20
+    assert len(loads) == 1
+    # The worker that lost the lock waited for the other's value instead of loading
+    assert sum(s["lock_waits"] for s in stats) == 1
+    assert sum(s["coalesced"] for s in stats) == 18
+
+
+def test_load_during_invalidation_is_not_cached():
+    async def scenario():
+        tiers, (a,) = workers(count=1)
+        await tiers[0].start()
+
+        async def load():
+            a.invalidate("artwork:1")  # a write lands while the page is being built
+            return "stale", ["artwork:1"]
+
+        try:
+            served = await a.get_or_load("page", load)
+            await asyncio.sleep(0.05)
+            return served, a.get_local("page"), await a.get("page")
+        finally:
+            await tiers[0].stop()
+
+    served, local, shared = asyncio.run(scenario())
+    assert served == "stale"
+    assert local is None and shared is None
+
+
+def test_redis_outage_degrades_to_local_only():
+    class Down:
+        def register_script(self, script):
+            async def run(**kwargs):
+                raise ConnectionError("redis is down")
+            return run
+
+        async def mget(self, *keys):
+            raise ConnectionError("redis is down")
+
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("redis is down")
+
+    tier = RedisTier(Down())
+    cache = TieredCache("pages", 60, 100, JsonSerializer(), tier)
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return "value", []
+
+    async def scenario():
+        return [await cache.get_or_load("page", load) for _ in range(2)]
+
+    assert asyncio.run(scenario()) == ["value", "value"]
+    assert len(loads) == 1
+    assert not tier.healthy and tier.errors >= 1
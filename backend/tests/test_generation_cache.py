@@ -0,0 +1,104 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from utils.generation_cache import GenerationCache, generation_key
+from utils.storage import ImageStore
+
+
+def png(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(root=str(tmp_path), url_prefix="/media", put_grace=0)
+
+
+def cached(cache, store, key, color):
+    path, filename = store.put(png(color), ".png")
+    cache.store(key, path, filename)
+    return path
+
+
+def test_hits_and_misses_are_counted(store):
+    cache = GenerationCache(max_bytes=10 ** 6, store=store)
+    path = cached(cache, store, "a", (1, 0, 0))
+
+    assert cache.lookup("a") == (path, store.filename_of(path))
+    assert cache.lookup("missing") is None
+    assert cache.lookup("a", record=False) is not None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+    assert stats["entries"] == 1 and stats["total_bytes"] == os.path.getsize(path)
+
+
+def test_least_recently_used_blob_is_evicted_first(store):
+    sizes = [len(png((i, 0, 0))) for i in range(3)]
+    cache = GenerationCache(max_bytes=sum(sizes) - 1, store=store)
+    first = cached(cache, store, "first", (0, 0, 0))
+    second = cached(cache, store, "second", (1, 0, 0))
+    cache.lookup("first")  # now more recent than "second"
+
+    third = cached(cache, store, "third", (2, 0, 0))
+
+    assert cache.lookup("second") is None and not os.path.exists(second)
+    assert cache.lookup("first") and os.path.exists(first)
+    assert cache.lookup("third") and os.path.exists(third)
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["total_bytes"] <= cache.max_bytes
+
+
+def test_budget_only_counts_blobs_nothing_else_holds(store):
+    cache = GenerationCache(max_bytes=len(png((0, 0, 0))) + 10, store=store)
+    kept = cached(cache, store, "kept", (0, 0, 0))
+    store.acquire(kept)  # an artwork uses this result
+
+    other = cached(cache, store, "other", (1, 0, 0))
+
+    # The artwork's blob costs the cache no disk, so nothing had to go
+    assert cache.stats()["evictions"] == 0
+    assert cache.stats()["total_bytes"] == os.path.getsize(other)
+
+    # Once the artwork lets go, the cache alone keeps it on disk and it counts
+    store.release(kept)
+    cached(cache, store, "newest", (2, 0, 0))
+    assert cache.lookup("kept") is None and not os.path.exists(kept)
+
+
+def test_entries_and_their_references_survive_a_restart(store):
+    path = cached(GenerationCache(max_bytes=10 ** 6, store=store), store, "a", (1, 0, 0))
+    gone = cached(GenerationCache(max_bytes=10 ** 6, store=store), store, "b", (2, 0, 0))
+    assert store.refcount(path) == 1
+
+    restarted = GenerationCache(max_bytes=10 ** 6, store=store)
+    os.remove(gone)
+
+    assert restarted.reconcile() == 1
+    assert restarted.lookup("a") == (path, store.filename_of(path))
+    assert restarted.lookup("b") is None
+    assert store.refcount(gone) is None
+
+
+def test_restoring_a_key_moves_its_reference(store):
+    cache = GenerationCache(max_bytes=10 ** 6, store=store)
+    old = cached(cache, store, "a", (1, 0, 0))
+    new = cached(cache, store, "a", (2, 0, 0))
+
+    assert store.refcount(new) == 1
+    assert store.refcount(old) is None and not os.path.exists(old)
+
+
+def test_placeholders_are_not_cached(store):
+    cache = GenerationCache(max_bytes=10 ** 6, store=store)
+    path, filename = store.put(png((1, 0, 0)), ".png", placeholder=True)
+
+    cache.store(generation_key("m", "a prompt"), path, filename)
+
+    assert cache.stats()["entries"] == 0
+    assert store.refcount(path) == 0
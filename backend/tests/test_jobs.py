@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from routes import artworks
+from utils.jobs import DONE, GenerationJobQueue, QueueFullError
+
+
+def test_full_queue_rejects_new_jobs():
+    async def scenario():
+        queue = GenerationJobQueue(workers=1, max_queue_size=1)
+        await queue.start()
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+            return "done"
+
+        running = queue.submit(1, blocked)
+        await asyncio.sleep(0)  # the worker takes the first job off the queue
+        queue.submit(1, blocked)
+        with pytest.raises(QueueFullError):
+            queue.submit(1, blocked)
+        stats = queue.stats()
+
+        release.set()
+        while not running.finished:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return stats, running
+
+    stats, running = asyncio.run(scenario())
+    assert stats["rejected"] == 1
+    assert stats["queued"] == 1
+    assert running.status == DONE
+    assert running.result == "done"
+
+
+def test_generate_returns_503_with_retry_after_when_queue_is_full(client, register, monkeypatch):
+    token = register("queued")["access_token"]
+
+    def full(owner_id, func):
+        raise QueueFullError("Generation queue is full, please retry later")
+
+    monkeypatch.setattr(artworks.generation_queue, "submit", full)
+    response = client.post(
+        "/artworks/generate",
+        json={"title": "t", "prompt": "a fox in the snow"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Generation queue is full, please retry later"
+    assert int(response.headers["Retry-After"]) == artworks.generation_queue.retry_after()
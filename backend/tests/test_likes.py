@@ -0,0 +1,111 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from models.database import SessionLocal, Artwork, Like, backfill_counters, insert_ignore
+from utils.like_buffer import LikeCounterBuffer, like_buffer
+
+
+def stored_likes(artwork_id):
+    db = SessionLocal()
+    try:
+        return db.get(Artwork, artwork_id).likes_count, db.query(Like).filter(Like.artwork_id == artwork_id).count()
+    finally:
+        db.close()
+
+
+def test_unique_index_allows_one_like_per_user(register, make_artworks):
+    user_id = register("unique")["user"]["id"]
+    artwork_id = make_artworks(1)[0]
+    db = SessionLocal()
+    try:
+        db.add(Like(user_id=user_id, artwork_id=artwork_id))
+        db.commit()
+
+        # The toggle's insert path: a second like of the same pair is a no-op
+        skipped = db.execute(insert_ignore(Like).values(user_id=user_id, artwork_id=artwork_id)).rowcount
+        db.commit()
+        assert skipped == 0
+
+        db.add(Like(user_id=user_id, artwork_id=artwork_id))
+        with pytest.raises(IntegrityError):
+            db.commit()
+        db.rollback()
+        assert db.query(Like).count() == 1
+    finally:
+        db.close()
+
+
+def test_like_toggle_is_idempotent_per_state(client, register, make_artworks):
+    token = register("toggler")["access_token"]
+    artwork_id = make_artworks(1)[0]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    states = [client.post(f"/artworks/{artwork_id}/like", headers=headers).json() for _ in range(3)]
+
+    assert states == [
+        {"liked": True, "likes_count": 1},
+        {"liked": False, "likes_count": 0},
+        {"liked": True, "likes_count": 1},
+    ]
+    assert like_buffer.pending(artwork_id) == 1
+    assert stored_likes(artwork_id) == (0, 1)
+
+
+def test_like_on_a_missing_artwork_is_404(client, register):
+    token = register("nowhere")["access_token"]
+
+    response = client.post("/artworks/999999/like", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 404
+    assert like_buffer.pending(999999) == 0
+
+
+def test_flush_writes_buffered_likes_in_one_batch(client, register, make_artworks):
+    tokens = [register(f"fan{i}")["access_token"] for i in range(3)]
+    first, second = make_artworks(2)
+    for token in tokens:
+        client.post(f"/artworks/{first}/like", headers={"Authorization": f"Bearer {token}"})
+    client.post(f"/artworks/{second}/like", headers={"Authorization": f"Bearer {tokens[0]}"})
+
+    assert stored_likes(first) == (0, 3)
+    assert like_buffer.flush() == 2
+    assert stored_likes(first) == (3, 3)
+    assert stored_likes(second) == (1, 1)
+    assert like_buffer.pending(first) == 0
+    assert like_buffer.flush() == 0
+
+
+def test_flush_after_a_counter_repair_does_not_double_count(register, make_artworks):
+    buffer = LikeCounterBuffer()
+    user_id = register("repaired")["user"]["id"]
+    artwork_id = make_artworks(1)[0]
+    db = SessionLocal()
+    db.add(Like(user_id=user_id, artwork_id=artwork_id))
+    db.commit()
+    db.close()
+    buffer.add(artwork_id, 1)
+
+    # repair-counters/backfill-counters run while the delta is still buffered
+    backfill_counters()
+    assert stored_likes(artwork_id) == (1, 1)
+
+    buffer.flush()
+    assert stored_likes(artwork_id) == (1, 1)
+
+
+def test_failed_flush_keeps_the_deltas(make_artworks, monkeypatch):
+    buffer = LikeCounterBuffer()
+    artwork_id = make_artworks(1)[0]
+    buffer.add(artwork_id, 1)
+
+    def broken(connection, bumps):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr("utils.like_buffer.trending_scores.bump", broken)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.pending(artwork_id) == 1
+
+    monkeypatch.undo()
+    assert buffer.flush() == 1
+    assert buffer.pending(artwork_id) == 0
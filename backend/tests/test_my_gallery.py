@@ -0,0 +1,23 @@
+import json
+
+
+def test_my_gallery_pages_and_export_cover_only_own_artworks(client, register, make_artworks):
+    account = register("owner")
+    headers = {"Authorization": f"Bearer {account['access_token']}"}
+    mine = make_artworks(5, creator_id=account["user"]["id"])
+    make_artworks(3)
+
+    first = client.get("/artworks/my-gallery", params={"limit": 3}, headers=headers)
+    second = client.get(
+        "/artworks/my-gallery",
+        params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]},
+        headers=headers
+    )
+    assert [item["id"] for item in first.json() + second.json()] == sorted(mine, reverse=True)
+    assert "X-Next-Cursor" not in second.headers
+
+    export = client.get("/artworks/my-gallery/export", headers=headers)
+    assert export.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in export.text.splitlines()]
+    assert [line["id"] for line in lines] == sorted(mine, reverse=True)
+    assert all(line["creator_username"] == "owner" and "guidance_scale" in line for line in lines)
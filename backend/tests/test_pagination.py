@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+
+from utils.pagination import decode_cursor, decode_score_cursor, encode_cursor, encode_score_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 13, 45, 12, 123456)
+    cursor = encode_cursor(created_at, 42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+def test_score_cursor_round_trips_floats_exactly():
+    score = 0.1 + 0.2
+    assert decode_score_cursor(encode_score_cursor(score, 7)) == (score, 7)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "bnVsbA", encode_score_cursor(1.5, 3)[:-2], "WzFd"])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_gallery_rejects_a_bad_cursor(client):
+    response = client.get("/artworks/gallery", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_gallery_cursor_walks_every_artwork_once(client, make_artworks):
+    # Five share a timestamp, so the id tie-break decides their order
+    ids = make_artworks(7) + make_artworks(5, created_at=datetime(2024, 6, 1))
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 4}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/artworks/gallery", params=params)
+        assert response.status_code == 200
+        seen += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert seen == sorted(ids[7:], reverse=True) + sorted(ids[:7], reverse=True)
+
+
+@pytest.mark.parametrize("limit", [0, -1, 101])
+def test_gallery_rejects_an_out_of_range_limit(client, limit):
+    response = client.get("/artworks/gallery", params={"limit": limit})
+
+    assert response.status_code == 422
@@ -0,0 +1,78 @@
+import asyncio
+
+from passlib.hash import bcrypt
+
+from models.database import SessionLocal, User
+from utils.passwords import BCRYPT_ROUNDS, PasswordHasher, password_hasher
+
+
+def stored_hash(username):
+    db = SessionLocal()
+    try:
+        return db.query(User.hashed_password).filter(User.username == username).scalar()
+    finally:
+        db.close()
+
+
+def rounds_of(hashed):
+    return int(hashed.split("$")[2])
+
+
+def test_verify_flags_hashes_with_another_cost():
+    hasher = PasswordHasher(workers=1)
+
+    async def scenario():
+        current = await hasher.hash("pw")
+        outdated = bcrypt.using(rounds=BCRYPT_ROUNDS + 1).hash("pw")
+        return (
+            current,
+            await hasher.verify_and_update("pw", current),
+            await hasher.verify_and_update("pw", outdated),
+            await hasher.verify_and_update("wrong", outdated),
+            await hasher.verify_and_update("pw", None),
+        )
+
+    try:
+        current, same_cost, other_cost, wrong, unknown = asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
+
+    assert rounds_of(current) == BCRYPT_ROUNDS
+    assert same_cost == (True, None)
+    assert other_cost[0] and rounds_of(other_cost[1]) == BCRYPT_ROUNDS
+    assert wrong == (False, None)
+    assert unknown == (False, None)
+    assert hasher.stats()["rehashes"] == 1
+
+
+def test_login_rehashes_an_outdated_hash(client, register):
+    register("upgraded", password="pw")
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.username == "upgraded").update(
+            {"hashed_password": bcrypt.using(rounds=BCRYPT_ROUNDS + 1).hash("pw")}
+        )
+        db.commit()
+    finally:
+        db.close()
+    rehashes = password_hasher.rehashes
+
+    response = client.post("/auth/login", data={"username": "upgraded", "password": "pw"})
+
+    assert response.status_code == 200
+    assert password_hasher.rehashes == rehashes + 1
+    assert rounds_of(stored_hash("upgraded")) == BCRYPT_ROUNDS
+    # The new hash still accepts the password, and is not upgraded again
+    again = client.post("/auth/login", data={"username": "upgraded", "password": "pw"})
+    assert again.status_code == 200
+    assert password_hasher.rehashes == rehashes + 1
+
+
+def test_wrong_password_does_not_touch_the_hash(client, register):
+    register("careful", password="pw")
+    before = stored_hash("careful")
+
+    response = client.post("/auth/login", data={"username": "careful", "password": "nope"})
+
+    assert response.status_code == 401
+    assert stored_hash("careful") == before
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+from utils.provider_health import CLOSED, HALF_OPEN, OPEN, ProviderHealth, ProviderHealthRegistry
+from utils.simple_generator import race_providers
+
+
+def test_circuit_opens_probes_and_closes():
+    health = ProviderHealth("p", failure_threshold=2, open_seconds=0.05)
+
+    health.record_failure(1.0)
+    assert health.state == CLOSED
+    health.record_failure(1.0)
+    assert health.state == OPEN
+    assert not health.available() and not health.allow()
+
+    time.sleep(0.06)
+    assert health.available()
+    assert health.allow() and health.state == HALF_OPEN
+    # Only one probe at a time
+    assert not health.allow() and not health.available()
+
+    health.record_success(0.2)
+    assert health.state == CLOSED and health.consecutive_failures == 0
+
+
+def test_failed_probe_reopens_the_circuit():
+    health = ProviderHealth("p", failure_threshold=1, open_seconds=0.05)
+    health.record_failure(1.0)
+    time.sleep(0.06)
+    assert health.allow()
+
+    health.record_failure(1.0)
+
+    assert health.state == OPEN and not health.available()
+
+
+def test_abandoned_call_past_the_hedge_delay_is_a_timeout():
+    health = ProviderHealth("p", failure_threshold=2)
+
+    health.record_abandoned(0.5, slow_after=0.1)
+    health.record_abandoned(0.5, slow_after=0.1)
+
+    assert health.state == OPEN
+    assert health.timeouts == 2 and health.latency_ewma == 0.5
+
+
+def test_abandoned_call_in_time_only_raises_the_latency():
+    health = ProviderHealth("p")
+
+    health.record_abandoned(0.2)
+    assert health.latency_ewma == 0.2
+    # A shorter wait says nothing new: the call already took longer than that
+    health.record_abandoned(0.1)
+    assert health.latency_ewma == 0.2
+    assert health.failures == 0 and health.error_rate == 0.0
+
+
+def test_unmeasured_providers_rank_after_measured_ones():
+    registry = ProviderHealthRegistry()
+    registry.get("measured").record_success(2.0)
+
+    order = [name for name, _ in registry.arrange([("new", None), ("measured", None)])]
+
+    assert order == ["measured", "new"]
+
+
+def test_open_circuit_is_dropped_from_the_chain():
+    registry = ProviderHealthRegistry()
+    for _ in range(registry.get("down").failure_threshold):
+        registry.get("down").record_failure(1.0)
+
+    assert [name for name, _ in registry.arrange([("down", None), ("up", None)])] == ["up"]
+
+
+def test_hedged_races_move_a_hanging_provider_down():
+    registry = ProviderHealthRegistry()
+
+    def provider(name, delay):
+        async def call():
+            await asyncio.sleep(delay)
+            return name
+        return name, call
+
+    providers = [provider("slow", 0.5), provider("fast", 0.05)]
+
+    async def scenario():
+        orders, winners = [], []
+        for _ in range(5):
+            arranged = registry.arrange(providers, slow_after=0.1)
+            orders.append([name for name, _ in arranged])
+            winners.append(await race_providers(arranged, hedge_delay=0.1))
+            await asyncio.sleep(0.01)  # let the loser's cancellation be recorded
+        return orders, winners
+
+    orders, winners = asyncio.run(scenario())
+
+    assert winners == ["fast"] * 5
+    assert orders[0] == ["slow", "fast"]
+    assert all(order == ["fast", "slow"] for order in orders[1:])
+    slow = registry.snapshot()["slow"]
+    assert slow["latency_ewma"] is not None and slow["timeouts"] == 1
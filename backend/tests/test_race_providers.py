@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from utils.simple_generator import race_providers
+
+
+class Stub:
+    """A provider that answers ``result`` (or raises it) after ``delay`` seconds, noting what happened"""
+
+    def __init__(self, name, delay, result):
+        self.name = name
+        self.delay = delay
+        self.result = result
+        self.started_at = None
+        self.cancelled = False
+
+    def provider(self, origin):
+        async def call():
+            self.started_at = time.monotonic() - origin
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+            if isinstance(self.result, Exception):
+                raise self.result
+            return self.result
+        return self.name, call
+
+
+def race(stubs, hedge_delay):
+    async def scenario():
+        origin = time.monotonic()
+        result = await race_providers([stub.provider(origin) for stub in stubs], hedge_delay)
+        await asyncio.sleep(0.01)  # let cancellations land
+        return result
+    return asyncio.run(scenario())
+
+
+def test_first_valid_result_wins_and_losers_are_cancelled():
+    slow, fast = Stub("slow", 1.0, "slow"), Stub("fast", 0.01, "fast")
+
+    assert race([slow, fast], hedge_delay=0) == "fast"
+    assert slow.cancelled and not fast.cancelled
+
+
+def test_hedge_starts_the_next_provider_after_the_delay():
+    slow, backup = Stub("slow", 1.0, "slow"), Stub("backup", 0.01, "backup")
+
+    assert race([slow, backup], hedge_delay=0.1) == "backup"
+    assert slow.started_at < 0.05
+    assert 0.1 <= backup.started_at < 0.3
+    assert slow.cancelled
+
+
+def test_no_hedge_when_the_first_provider_answers_in_time():
+    quick, backup = Stub("quick", 0.01, "quick"), Stub("backup", 0.01, "backup")
+
+    assert race([quick, backup], hedge_delay=0.2) == "quick"
+    assert backup.started_at is None
+
+
+def test_failure_starts_the_next_provider_without_waiting_for_the_hedge():
+    broken, backup = Stub("broken", 0.01, RuntimeError("500")), Stub("backup", 0.01, "backup")
+
+    assert race([broken, backup], hedge_delay=5) == "backup"
+    assert backup.started_at < 0.2
+
+
+def test_zero_hedge_delay_starts_every_provider_at_once():
+    stubs = [Stub(str(i), 0.05 * (3 - i), None if i < 2 else "last") for i in range(3)]
+
+    assert race(stubs, hedge_delay=0) == "last"
+    assert all(stub.started_at < 0.02 for stub in stubs)
+
+
+def test_none_tries_providers_strictly_in_order():
+    empty, slow = Stub("empty", 0.05, None), Stub("slow", 0.15, "slow")
+    unused = Stub("unused", 0.01, "unused")
+
+    assert race([empty, slow, unused], hedge_delay=None) == "slow"
+    assert slow.started_at >= 0.05
+    assert unused.started_at is None
+
+
+def test_returns_none_when_every_provider_fails():
+    stubs = [Stub("error", 0.01, RuntimeError("down")), Stub("empty", 0.01, None)]
+
+    assert race(stubs, hedge_delay=0.05) is None
+    assert race(stubs, hedge_delay=None) is None
+    assert race([], hedge_delay=0) is None
@@ -0,0 +1,207 @@
+import asyncio
+import io
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+from routes import artworks
+from utils.jobs import QueueFullError
+from utils.rate_limit import Bucket, MemoryBackend, RateLimiter, RedisBackend
+from utils.storage import image_store
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend_factory(request):
+    """A fresh backend per call; the Redis one runs against fakeredis"""
+    if request.param == "memory":
+        return MemoryBackend
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+
+    def redis_backend():
+        return RedisBackend(fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer()), prefix="test:rl:")
+    return redis_backend
+
+
+def hits(backend_factory, buckets, count, pause=0.0):
+    async def scenario():
+        limiter = RateLimiter(backend_factory())
+        decisions = []
+        for _ in range(count):
+            decisions.append(await limiter.hit(buckets))
+        if pause:
+            await asyncio.sleep(pause)
+            decisions.append(await limiter.hit(buckets))
+        await limiter.close()
+        return limiter, decisions
+    return asyncio.run(scenario())
+
+
+def test_bucket_allows_a_burst_then_denies(backend_factory):
+    # Three at once, then one every 10 seconds
+    bucket = Bucket.per_minute("user", "user:1", 6, 3)
+
+    limiter, decisions = hits(backend_factory, [bucket], 4)
+
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions[:3]] == [2, 1, 0]
+    denied = decisions[3]
+    assert 9 < denied.retry_after <= 10
+    assert denied.headers()["Retry-After"] == "10"
+    assert denied.headers()["RateLimit-Limit"] == "3"
+    assert limiter.stats()["denied"] == {"user": 1}
+
+
+def test_tokens_refill_over_time(backend_factory):
+    bucket = Bucket.per_minute("user", "user:1", 600, 1)  # 10 per second
+
+    _, decisions = hits(backend_factory, [bucket], 2, pause=0.15)
+
+    assert [d.allowed for d in decisions] == [True, False, True]
+
+
+def test_denied_request_consumes_from_no_bucket(backend_factory):
+    roomy = Bucket.per_minute("ip", "ip:1", 60, 10)
+    tight = Bucket.per_minute("user", "user:1", 1, 1)
+
+    async def scenario():
+        limiter = RateLimiter(backend_factory())
+        results = [await limiter.hit([roomy, tight]) for _ in range(5)]
+        alone = await limiter.hit([roomy])
+        await limiter.close()
+        return results, alone
+
+    results, alone = asyncio.run(scenario())
+    assert [d.allowed for d in results] == [True] + [False] * 4
+    assert results[1].bucket.name == "user"
+    # Only the one allowed request came out of the roomy bucket
+    assert alone.allowed and alone.remaining == 8
+
+
+def test_daily_quota_resets_at_utc_midnight(backend_factory):
+    now = datetime(2024, 3, 9, 23, 0, 0)
+    quota = Bucket.daily("daily_quota", "quota:1", 2, now=now)
+
+    assert quota.key == "quota:1:2024-03-09"
+    assert quota.ttl == 3600
+    _, decisions = hits(backend_factory, [quota], 3)
+
+    assert [d.allowed for d in decisions] == [True, True, False]
+    assert 3599 <= decisions[2].retry_after <= 3600
+    assert decisions[2].headers()["RateLimit-Reset"] == "3600"
+
+
+def test_backend_failure_lets_requests_through():
+    class Down:
+        name = "down"
+
+        async def take(self, buckets, cost=1):
+            raise ConnectionError("redis is down")
+
+    limiter = RateLimiter(Down())
+    decision = asyncio.run(limiter.hit([Bucket.per_minute("user", "user:1", 1, 1)]))
+
+    assert decision.allowed and decision.headers() == {}
+    assert limiter.stats()["errors"] == 1
+
+
+def test_generate_answers_429_with_retry_after(client, register, monkeypatch):
+    token = register("greedy")["access_token"]
+    monkeypatch.setattr(artworks, "rate_limiter", RateLimiter(MemoryBackend()))
+    monkeypatch.setattr(artworks, "generation_buckets", lambda user_id, ip=None: [
+        Bucket.per_minute("user", f"user:{user_id}", 1, 1)
+    ])
+    monkeypatch.setattr(artworks.generation_queue, "submit", lambda owner_id, func: artworks.generation_queue.record(owner_id, None))
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {"title": "t", "prompt": "a heron at dawn"}
+
+    allowed = client.post("/artworks/generate", json=body, headers=headers)
+    denied = client.post("/artworks/generate", json=body, headers=headers)
+
+    assert allowed.status_code == 202
+    assert allowed.headers["RateLimit-Remaining"] == "0"
+    assert denied.status_code == 429
+    assert denied.json()["detail"] == "Too many generation requests"
+    assert 59 <= int(denied.headers["Retry-After"]) <= 60
+
+
+def test_refund_gives_tokens_back_up_to_capacity(backend_factory):
+    bucket = Bucket.per_minute("user", "user:1", 1, 3)
+
+    async def scenario():
+        limiter = RateLimiter(backend_factory())
+        await limiter.refund([bucket])  # nothing taken yet: still just full
+        first = await limiter.hit([bucket])
+        await limiter.refund([bucket])
+        second = await limiter.hit([bucket])
+        await limiter.close()
+        return first, second, limiter.stats()
+
+    first, second, stats = asyncio.run(scenario())
+    assert first.remaining == second.remaining == 2
+    assert stats["refunds"] == 2
+
+
+def quota_only(monkeypatch, quota):
+    monkeypatch.setattr(artworks, "rate_limiter", RateLimiter(MemoryBackend()))
+    monkeypatch.setattr(artworks, "generation_buckets", lambda user_id, ip=None: [
+        Bucket.per_minute("user", f"user:{user_id}", 60, 100),
+        Bucket.daily("daily_quota", f"quota:{user_id}", quota),
+    ])
+
+
+def test_rejected_request_leaves_the_quota_alone(client, register, monkeypatch):
+    token = register("turned-away")["access_token"]
+    quota_only(monkeypatch, 2)
+    accepted = lambda owner_id, func: artworks.generation_queue.record(owner_id, None)
+
+    def full(owner_id, func):
+        raise QueueFullError("Generation queue is full, please retry later")
+
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {"title": "t", "prompt": "a heron at dawn"}
+    responses = []
+    for submit in (accepted, full, full, accepted):
+        monkeypatch.setattr(artworks.generation_queue, "submit", submit)
+        responses.append(client.post("/artworks/generate", json=body, headers=headers))
+
+    assert [r.status_code for r in responses] == [202, 503, 503, 202]
+    assert responses[0].headers["RateLimit-Remaining"] == "1"
+    assert responses[3].headers["RateLimit-Remaining"] == "0"
+
+
+def test_cache_hits_use_no_quota(client, register, monkeypatch):
+    token = register("reuser")["access_token"]
+    quota_only(monkeypatch, 1)
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (1, 2, 3)).save(buffer, "PNG")
+    stored = image_store.put(buffer.getvalue(), ".png")
+
+    async def fetch(key, record=True):
+        return stored
+
+    monkeypatch.setattr(artworks.generation_cache, "fetch", fetch)
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {"title": "t", "prompt": "a heron at dawn"}
+
+    assert [client.post("/artworks/generate", json=body, headers=headers).status_code for _ in range(3)] == [202] * 3
+
+
+def test_failed_job_gives_back_its_quota(monkeypatch):
+    async def broken(**kwargs):
+        raise RuntimeError("every provider is down")
+
+    monkeypatch.setattr(artworks.ai_generator, "generate_image", broken)
+    limiter = RateLimiter(MemoryBackend())
+    monkeypatch.setattr(artworks, "rate_limiter", limiter)
+    quota = [Bucket.daily("daily_quota", "quota:1", 1)]
+    request = artworks.ArtworkCreate(title="t", prompt="an unlucky prompt")
+
+    async def scenario():
+        await limiter.hit(quota)
+        with pytest.raises(RuntimeError):
+            await artworks._run_generation(request, 1, "unlucky", quota)
+        return await limiter.hit(quota)
+
+    assert asyncio.run(scenario()).allowed
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import Response
+from sqlalchemy.exc import OperationalError
+from starlette.requests import Request
+
+from models.database import SessionLocal, ReadSessionLocal, User, engine, read_engine
+from utils.read_routing import PRIMARY_PIN_COOKIE, get_read_db, pin_to_primary, pinned_to_primary
+
+
+def request_with(cookie=None) -> Request:
+    headers = [(b"cookie", f"{PRIMARY_PIN_COOKIE}={cookie}".encode())] if cookie is not None else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def read_session_for(request: Request):
+    async def scenario():
+        dependency = get_read_db(request)
+        db = await dependency.__anext__()
+        try:
+            return db.pinned, db.session.get_bind()
+        finally:
+            await dependency.aclose()
+    return asyncio.run(scenario())
+
+
+def test_sqlite_reads_use_a_separate_read_only_pool():
+    assert read_engine is not engine
+
+    db = ReadSessionLocal()
+    try:
+        db.add(User(username="nope", email="nope@example.com"))
+        with pytest.raises(OperationalError):
+            db.commit()
+    finally:
+        db.close()
+
+
+def test_pin_sets_a_short_lived_cookie():
+    response = Response()
+    pin_to_primary(response, seconds=5)
+
+    cookie = response.headers["set-cookie"]
+    assert cookie.startswith(f"{PRIMARY_PIN_COOKIE}=")
+    assert "Max-Age=5" in cookie and "HttpOnly" in cookie
+    until = float(cookie.split(";")[0].split("=")[1])
+    assert time.time() < until <= time.time() + 5.001
+
+
+@pytest.mark.parametrize("cookie, pinned", [
+    (None, False),
+    ("garbage", False),
+    (f"{time.time() - 1:.3f}", False),
+    (f"{time.time() + 60:.3f}", True),
+])
+def test_get_read_db_routes_pinned_clients_to_the_primary(cookie, pinned):
+    request = request_with(cookie)
+
+    assert pinned_to_primary(request) is pinned
+    assert read_session_for(request) == (pinned, engine if pinned else read_engine)
+
+
+def test_writer_reads_its_own_comment_from_the_primary(client, register, make_artworks):
+    token = register("commenter")["access_token"]
+    artwork_id = make_artworks(1)[0]
+    client.cookies.clear()
+
+    response = client.post(
+        f"/artworks/{artwork_id}/comments",
+        json={"content": "lovely"},
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    assert PRIMARY_PIN_COOKIE in response.cookies
+    assert read_session_for(request_with(response.cookies[PRIMARY_PIN_COOKIE]))[0]
+
+    comments = client.get(f"/artworks/{artwork_id}/comments")
+    assert [comment["content"] for comment in comments.json()] == ["lovely"]
+    client.cookies.clear()
+
+
+def test_primary_session_factory_is_the_writer():
+    db = SessionLocal()
+    try:
+        assert db.get_bind() is engine
+    finally:
+        db.close()
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from models.database import SessionLocal, RefreshToken, User
+from utils.refresh_tokens import (
+    issue_refresh_token, prune_refresh_tokens, revoke_refresh_token, rotate_refresh_token
+)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def user_id(db):
+    user = User(username="rotator", email="rotator@example.com")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def rejected(db, token):
+    with pytest.raises(HTTPException) as error:
+        rotate_refresh_token(db, token)
+    return error.value.status_code == 401
+
+
+def test_rotation_hands_out_a_new_single_use_token(db, user_id):
+    token = issue_refresh_token(db, user_id)
+    db.commit()
+
+    user, rotated = rotate_refresh_token(db, token)
+
+    assert user.id == user_id
+    assert rotated != token
+    rows = db.query(RefreshToken).all()
+    assert len(rows) == 2 and len({row.family for row in rows}) == 1
+    # Only digests are stored
+    assert token not in {row.token_hash for row in rows}
+
+
+def test_reusing_a_rotated_token_revokes_the_family(db, user_id):
+    stolen = issue_refresh_token(db, user_id)
+    db.commit()
+    _, current = rotate_refresh_token(db, stolen)
+    other_login = issue_refresh_token(db, user_id)
+    db.commit()
+
+    assert rejected(db, stolen)
+    # The legitimate holder's newer token went with it; other logins did not
+    assert rejected(db, current)
+    user, _ = rotate_refresh_token(db, other_login)
+    assert user.id == user_id
+
+
+def test_expired_and_unknown_tokens_are_rejected(db, user_id):
+    token = issue_refresh_token(db, user_id)
+    db.commit()
+    db.query(RefreshToken).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+    assert rejected(db, token)
+    assert rejected(db, "never-issued")
+    assert prune_refresh_tokens(db) == 1
+
+
+def test_revoke_ends_the_login(db, user_id):
+    token = issue_refresh_token(db, user_id)
+    db.commit()
+    _, rotated = rotate_refresh_token(db, token)
+
+    assert revoke_refresh_token(db, token)
+    assert rejected(db, rotated)
+    assert not revoke_refresh_token(db, "never-issued")
+
+
+def test_refresh_endpoint_rotates_and_detects_reuse(client, register):
+    first = register("refresher")["refresh_token"]
+
+    refreshed = client.post("/auth/refresh", json={"refresh_token": first})
+    assert refreshed.status_code == 200
+    body = refreshed.json()
+    assert body["access_token"] and body["refresh_token"] != first
+    assert body["user"]["username"] == "refresher"
+
+    reused = client.post("/auth/refresh", json={"refresh_token": first})
+    assert reused.status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": body["refresh_token"]}).status_code == 401
+
+
+def test_logout_revokes_the_refresh_token(client, register):
+    token = register("leaver")["refresh_token"]
+
+    assert client.post("/auth/logout", json={"refresh_token": token}).status_code == 200
+    assert client.post("/auth/refresh", json={"refresh_token": token}).status_code == 401
@@ -0,0 +1,60 @@
+import asyncio
+
+from utils.response_cache import CachedResponse, ResponseCache, gallery_cache
+
+
+def test_etag_is_strong_and_tracks_the_body():
+    entry = CachedResponse(b'[{"id":1}]', {})
+
+    assert entry.etag.startswith('"') and entry.etag.endswith('"')
+    assert entry.etag == CachedResponse(b'[{"id":1}]', {}).etag
+    assert entry.etag != CachedResponse(b'[{"id":2}]', {}).etag
+    assert entry.matches(f'"other", {entry.etag}')
+    assert entry.matches("*")
+    assert not entry.matches(None)
+
+
+def test_invalidation_drops_only_tagged_entries():
+    cache = ResponseCache("test_responses", ttl=60, max_entries=10, shared=None)
+
+    async def scenario():
+        async def page(body, tags):
+            return CachedResponse(body, {}), tags
+
+        await cache.get_or_load("a", lambda: page(b"a", ["artwork:1", "gallery:offset"]))
+        await cache.get_or_load("b", lambda: page(b"b", ["artwork:2"]))
+        dropped = cache.invalidate("artwork:1")
+        return dropped, await cache.get("a"), await cache.get("b")
+
+    dropped, a, b = asyncio.run(scenario())
+    assert dropped == 1
+    assert a is None
+    assert b.body == b"b"
+
+
+def test_gallery_etag_304_round_trip(client, make_artworks):
+    make_artworks(3)
+
+    first = client.get("/artworks/gallery")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and len(first.json()) == 3
+
+    again = client.get("/artworks/gallery", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+    assert gallery_cache.stats()["not_modified"] >= 1
+
+
+def test_like_invalidates_the_cached_gallery_page(client, register, make_artworks):
+    artwork_id = make_artworks(1)[0]
+    token = register("liker")["access_token"]
+
+    before = client.get("/artworks/gallery")
+    liked = client.post(f"/artworks/{artwork_id}/like", headers={"Authorization": f"Bearer {token}"})
+    assert liked.json() == {"liked": True, "likes_count": 1}
+
+    after = client.get("/artworks/gallery", headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert after.json()[0]["likes_count"] == 1
@@ -0,0 +1,106 @@
+import pytest
+
+from models.database import SessionLocal, Artwork
+from utils.search import search_artworks, search_terms
+
+
+def found(q):
+    db = SessionLocal()
+    try:
+        query = search_artworks(db, q)
+        return [] if query is None else [artwork.id for artwork, _ in query.all()]
+    finally:
+        db.close()
+
+
+def edit(artwork_id, **fields):
+    db = SessionLocal()
+    try:
+        artwork = db.get(Artwork, artwork_id)
+        if fields:
+            for name, value in fields.items():
+                setattr(artwork, name, value)
+        else:
+            db.delete(artwork)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_index_follows_inserts_updates_and_deletes(make_artworks):
+    artwork_id = make_artworks(1, title="Harbour lights")[0]
+    assert found("harbour") == [artwork_id]
+    assert found("lighthouse") == [artwork_id]  # from the prompt
+
+    edit(artwork_id, title="Mountain lake", prompt="pines in fog")
+    assert found("harbour") == [] and found("lighthouse") == []
+    assert found("mountain") == [artwork_id] and found("fog") == [artwork_id]
+
+    edit(artwork_id)
+    assert found("mountain") == []
+
+
+def test_counter_updates_leave_the_index_alone(make_artworks):
+    artwork_id = make_artworks(1, title="Harbour lights")[0]
+
+    edit(artwork_id, likes_count=5)
+
+    assert found("harbour") == [artwork_id]
+
+
+@pytest.mark.parametrize("q, terms", [
+    ("The cat and THE dog", ["cat", "dog"]),
+    ('"cat" AND dog* OR -bird NEAR(fish)', ["cat", "dog", "bird", "near", "fish"]),
+    ("title:cat ^dog", ["title", "cat", "dog"]),
+    ("the of and", []),
+])
+def test_search_terms_drop_stopwords_and_operators(q, terms):
+    assert search_terms(q) == terms
+
+
+@pytest.mark.parametrize("q", ['"unbalanced', "NEAR(", "dog*", "title:x", "a AND"])
+def test_query_syntax_never_reaches_the_engine(client, q):
+    assert client.get("/artworks/search", params={"q": q}).status_code == 200
+
+
+def test_titles_outrank_prompts(make_artworks):
+    in_prompt = make_artworks(1, title="Untitled", prompt="a heron by the river")[0]
+    in_title = make_artworks(1, title="Heron", prompt="birds")[0]
+
+    assert found("heron") == [in_title, in_prompt]
+
+
+def test_private_artworks_take_no_candidate_slots(make_artworks, monkeypatch):
+    monkeypatch.setattr("utils.search.SEARCH_CANDIDATES", 3)
+    public = make_artworks(1, title="Heron")[0]
+    make_artworks(5, title="Heron", is_public=False)  # newer, so first in line
+
+    assert found("heron") == [public]
+
+
+def test_score_cursor_pages_through_every_match_once(client, make_artworks):
+    make_artworks(3, title="Heron", prompt="a heron")
+    make_artworks(4, title="Untitled", prompt="heron at dawn")
+    make_artworks(2, title="Heron heron", prompt="herons")
+
+    everything = [item["id"] for item in client.get("/artworks/search", params={"q": "heron", "limit": 100}).json()]
+    seen, cursor = [], None
+    while True:
+        params = {"q": "heron", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/artworks/search", params=params)
+        assert response.status_code == 200
+        seen += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert len(everything) == 9
+    assert seen == everything
+
+
+def test_search_rejects_a_bad_cursor(client, make_artworks):
+    make_artworks(1, title="Heron")
+
+    assert client.get("/artworks/search", params={"q": "heron", "cursor": "garbage"}).status_code == 400
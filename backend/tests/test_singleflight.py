@@ -0,0 +1,150 @@
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from models.database import SessionLocal, Artwork, User
+from routes import artworks
+from utils.singleflight import SingleFlight, SyncSingleFlight
+from utils.storage import image_store
+
+
+def test_identical_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*[flights.do("key", work) for _ in range(5)])
+
+    assert asyncio.run(scenario()) == ["result"] * 5
+    assert len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+
+def test_cancelling_a_waiter_leaves_the_shared_call_running():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do("key", work))
+        follower = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(scenario()) == ("result", True)
+    assert len(calls) == 1
+    assert flights.leaders == 1 and flights.coalesced == 1
+
+
+def test_failure_reaches_every_waiter_and_frees_the_key():
+    flights = SingleFlight()
+
+    async def broken():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    async def scenario():
+        return await asyncio.gather(flights.do("key", broken), flights.do("key", broken), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 1}
+
+
+def test_sync_flight_coalesces_threads():
+    flights = SyncSingleFlight()
+    started = threading.Event()
+    finish = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        finish.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("key", work)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("key", work))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flights.coalesced < 3:
+        time.sleep(0.001)
+    finish.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 3}
+
+
+def test_sync_flight_shares_failures():
+    flights = SyncSingleFlight()
+
+    def broken():
+        raise RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError):
+        flights.do("key", broken)
+    # The key is free again, so the next caller retries instead of seeing a stale failure
+    with pytest.raises(RuntimeError):
+        flights.do("key", broken)
+    assert flights.leaders == 2
+
+
+def test_coalesced_generations_give_each_user_their_own_artwork(monkeypatch):
+    calls = []
+
+    async def generate_image(prompt, negative_prompt, guidance_scale, width, height):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 64), (5, 6, 7)).save(buffer, "PNG")
+        return image_store.put(buffer.getvalue(), ".png")
+
+    monkeypatch.setattr(artworks.ai_generator, "generate_image", generate_image)
+    db = SessionLocal()
+    try:
+        users = [User(username=f"twin{i}", email=f"twin{i}@example.com") for i in range(2)]
+        db.add_all(users)
+        db.commit()
+        owners = [(user.id, user.username) for user in users]
+    finally:
+        db.close()
+    request = artworks.ArtworkCreate(title="same", prompt="Two  identical   PROMPTS")
+
+    async def scenario():
+        return await asyncio.gather(*[
+            artworks._run_generation(request, user_id, username) for user_id, username in owners
+        ])
+
+    results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert {result.creator_username for result in results} == {"twin0", "twin1"}
+    db = SessionLocal()
+    try:
+        rows = db.query(Artwork).all()
+    finally:
+        db.close()
+    assert len(rows) == 2
+    assert len({row.image_path for row in rows}) == 1
+    # Two artworks plus the cache entry hold the shared image
+    assert image_store.refcount(rows[0].image_path) == 3
@@ -0,0 +1,121 @@
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from PIL import Image
+
+from models.database import SessionLocal, ImageBlob
+from utils.storage import ImageStore
+
+
+def png(color=(10, 20, 30), size=(64, 64)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def blob_rows():
+    db = SessionLocal()
+    try:
+        return db.query(ImageBlob).count()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(root=str(tmp_path), url_prefix="/media", put_grace=0)
+
+
+def test_identical_bytes_are_stored_once(store, tmp_path):
+    first_path, first_name = store.put(png(), ".png")
+    second_path, second_name = store.put(png(), ".png")
+
+    assert (first_path, first_name) == (second_path, second_name)
+    assert blob_rows() == 1
+    # Sharded by hash prefix: ab/cd/<sha256>.png
+    shards = first_name.split("/")
+    assert len(shards) == 3 and shards[2].startswith(shards[0] + shards[1])
+    assert os.path.exists(first_path)
+    assert store.url_for(first_name) == f"/media/{first_name}"
+
+    other_path, _ = store.put(png(color=(200, 0, 0)), ".png")
+    assert other_path != first_path
+    assert blob_rows() == 2
+
+
+def test_blob_is_deleted_with_its_last_reference(store):
+    path, _ = store.put(png(), ".png")
+    derivative = os.path.splitext(path)[0] + "_256.webp"
+    open(derivative, "wb").close()
+    assert store.refcount(path) == 0
+
+    store.acquire(path)
+    store.acquire(path)
+    assert store.refcount(path) == 2
+
+    assert not store.release(path)
+    assert store.refcount(path) == 1 and os.path.exists(path)
+
+    assert store.release(path)
+    assert store.refcount(path) is None
+    assert not os.path.exists(path)
+    assert not os.path.exists(derivative)
+
+
+def test_recently_stored_blob_is_left_for_gc(tmp_path):
+    store = ImageStore(root=str(tmp_path), put_grace=600)
+    path, _ = store.put(png(), ".png")
+    store.acquire(path)
+
+    # Its put() caller may not have acquired it yet, so release leaves it
+    assert not store.release(path)
+    assert os.path.exists(path)
+
+    assert store.collect_garbage(datetime.utcnow() - timedelta(hours=1)) == 0
+    assert store.collect_garbage(datetime.utcnow() + timedelta(seconds=1)) == 1
+    assert not os.path.exists(path)
+
+
+def test_put_rewrites_a_file_removed_under_an_existing_row(store):
+    path, _ = store.put(png(), ".png")
+    os.remove(path)
+
+    store.put(png(), ".png")
+    assert os.path.exists(path)
+
+
+def test_acquire_adds_the_row_for_a_file_stored_before_the_table(store):
+    path, _ = store.put(png(), ".png")
+    db = SessionLocal()
+    db.query(ImageBlob).delete()
+    db.commit()
+    db.close()
+
+    store.acquire(path)
+    assert store.refcount(path) == 1
+    store.acquire(path)
+    assert store.refcount(path) == 2
+
+
+def test_acquire_fails_loudly_for_a_missing_file(store):
+    path, _ = store.put(png(), ".png")
+    os.remove(path)
+
+    with pytest.raises(FileNotFoundError):
+        store.acquire(path)
+    assert store.refcount(path) == 0
+
+
+def test_derivative_urls_come_from_the_store_not_the_filesystem_path():
+    from utils.derivatives import create_derivatives
+    from utils.storage import image_store
+
+    path, filename = image_store.put(png(size=(600, 600)), ".png")
+    srcset = create_derivatives(path)
+
+    stem = os.path.splitext(filename)[0]
+    assert set(srcset) == {"256w", "512w"}
+    assert srcset["256w"] == f"{image_store.url_prefix}/{stem}_256{os.path.splitext(srcset['256w'])[1]}"
+    assert image_store.root not in srcset["512w"]
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+from models.database import ThreadedSession, User, get_threaded_db, run_in_db_thread
+
+
+def test_session_work_runs_on_the_db_thread_pool():
+    async def scenario():
+        db = ThreadedSession()
+        try:
+            def add(session, name):
+                session.add(User(username=name, email=f"{name}@example.com"))
+                session.commit()
+                return threading.current_thread().name
+
+            def count(session):
+                return session.query(User).count(), threading.current_thread().name
+
+            thread = await db.run(add, "threaded")
+            total, other_thread = await db.run(count)
+        finally:
+            await db.close()
+        return threading.current_thread().name, thread, other_thread, total
+
+    loop_thread, thread, other_thread, total = asyncio.run(scenario())
+    assert thread.startswith("db") and other_thread.startswith("db")
+    assert thread != loop_thread
+    assert total == 1
+
+
+def test_run_in_db_thread_passes_arguments_through():
+    result = asyncio.run(run_in_db_thread(lambda a, b=0: (a + b, threading.current_thread().name), 2, b=3))
+
+    assert result[0] == 5
+    assert result[1].startswith("db")
+
+
+def test_close_waits_for_a_cancelled_query():
+    async def scenario():
+        started = threading.Event()
+        finish = threading.Event()
+        db = ThreadedSession()
+
+        def slow(session):
+            started.set()
+            finish.wait(5)
+
+        task = asyncio.ensure_future(db.run(slow))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        closer = asyncio.ensure_future(db.close())
+        await asyncio.sleep(0.05)
+        # The thread is still using the session, so close must not have run it yet
+        assert not closer.done()
+        finish.set()
+        await closer
+        return task.cancelled()
+
+    assert asyncio.run(scenario())
+
+
+def test_get_threaded_db_closes_its_session():
+    async def scenario():
+        dependency = get_threaded_db()
+        db = await dependency.__anext__()
+        await db.run(lambda session: session.query(User).count())
+        await dependency.aclose()
+        return db
+
+    db = asyncio.run(scenario())
+    assert not db.session.in_transaction()
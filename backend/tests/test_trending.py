@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models.database import SessionLocal, Artwork, Like, TrendingScore, engine
+from utils.trending import TrendingScores
+
+T0 = datetime(2024, 5, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def scores():
+    return TrendingScores(half_life_hours=1, interval=60, min_score=0.05)
+
+
+def bump(scores, deltas, now=T0):
+    with engine.begin() as connection:
+        scores.bump(connection, deltas, now=now)
+
+
+def stored():
+    db = SessionLocal()
+    try:
+        return {row.artwork_id: row.score for row in db.query(TrendingScore)}
+    finally:
+        db.close()
+
+
+def test_decay_halves_per_half_life_and_is_idempotent_within_a_tick(scores, make_artworks):
+    artwork_id = make_artworks(1)[0]
+    bump(scores, {artwork_id: 2.0})
+
+    assert scores.decay(now=T0 + timedelta(hours=1)) == 1
+    assert stored()[artwork_id] == pytest.approx(1.0)
+
+    # Same tick again, even a little later: nothing left to decay
+    assert scores.decay(now=T0 + timedelta(hours=1, seconds=30)) == 0
+    assert stored()[artwork_id] == pytest.approx(1.0)
+
+
+def test_bumps_between_decays_add_at_the_current_tick(scores, make_artworks):
+    artwork_id = make_artworks(1)[0]
+    bump(scores, {artwork_id: 2.0})
+    scores.decay(now=T0 + timedelta(hours=1))
+
+    bump(scores, {artwork_id: 1.0}, now=T0 + timedelta(hours=1))
+
+    assert stored()[artwork_id] == pytest.approx(2.0)
+
+
+def test_rows_decayed_below_the_minimum_are_pruned(scores, make_artworks):
+    faded, active = make_artworks(2)
+    bump(scores, {faded: 0.08, active: 1.0})
+
+    scores.decay(now=T0 + timedelta(hours=1))
+
+    assert set(stored()) == {active}
+    assert scores.stats()["rows_pruned"] == 1
+
+
+def test_unlike_floors_the_score_at_zero(scores, make_artworks):
+    liked, untouched = make_artworks(2)
+    bump(scores, {liked: 1.0})
+
+    bump(scores, {liked: -3.0, untouched: -1.0})
+
+    assert stored() == {liked: 0.0}
+
+
+def test_rebuild_recomputes_from_recent_events(scores, make_artworks):
+    recent, old = make_artworks(2)
+    db = SessionLocal()
+    try:
+        creator_id = db.get(Artwork, recent).creator_id
+        db.add_all([
+            Like(user_id=creator_id, artwork_id=recent, created_at=T0 - timedelta(hours=1)),
+            Like(user_id=creator_id, artwork_id=old, created_at=T0 - timedelta(days=30)),
+        ])
+        db.commit()
+    finally:
+        db.close()
+    bump(scores, {old: 50.0})
+
+    assert scores.rebuild(timedelta(days=7), now=T0) == 1
+    assert stored() == {recent: pytest.approx(0.5)}
+
+
+def test_trending_cursor_pages_have_no_repeats_or_gaps(client, make_artworks):
+    ids = make_artworks(7)
+    hidden = make_artworks(1, is_public=False)[0]
+    db = SessionLocal()
+    try:
+        # Ties on score are broken by artwork id
+        db.add_all([TrendingScore(artwork_id=artwork_id, score=float(i // 2), decayed_at=T0) for i, artwork_id in enumerate(ids)])
+        db.add(TrendingScore(artwork_id=hidden, score=100.0, decayed_at=T0))
+        db.commit()
+    finally:
+        db.close()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/artworks/trending", params=params)
+        assert response.status_code == 200
+        seen += [item["id"] for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    expected = sorted(ids, key=lambda artwork_id: (ids.index(artwork_id) // 2, artwork_id), reverse=True)
+    assert seen == expected
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from models.database import SessionLocal, User
+from utils.user_cache import UserCache, UserSnapshot, user_cache
+
+ALICE = UserSnapshot(id=1, username="alice", email="alice@example.com", is_admin=False)
+
+
+def counting_loader():
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return ALICE
+    return load, calls
+
+
+def test_ttl_is_capped_at_token_expiry():
+    cache = UserCache(ttl=60, shared=None)
+
+    assert cache.ttl_for(None) == 60
+    assert cache.ttl_for(time.time() + 3600) == 60
+    assert 9 < cache.ttl_for(time.time() + 10) <= 10
+    assert cache.ttl_for(time.time() - 5) < 0
+
+
+def test_entry_expires_with_the_token():
+    cache = UserCache(ttl=60, shared=None)
+    load, calls = counting_loader()
+
+    async def scenario():
+        expires_at = time.time() + 0.2
+        first = await cache.get_or_load_user("token", load, expires_at)
+        cached = await cache.get_or_load_user("token", load, expires_at)
+        await asyncio.sleep(0.3)
+        return first, cached, cache.get_local("token")
+
+    first, cached, after_expiry = asyncio.run(scenario())
+    assert first == cached == ALICE
+    assert len(calls) == 1
+    assert after_expiry is None
+
+
+def test_expired_token_is_never_cached():
+    cache = UserCache(ttl=60, shared=None)
+    load, calls = counting_loader()
+
+    async def scenario():
+        for _ in range(2):
+            await cache.get_or_load_user("token", load, time.time() - 1)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert len(cache.local) == 0
+
+
+def test_keys_are_token_digests():
+    cache = UserCache(ttl=60, shared=None)
+
+    assert cache.key("secret-token") != "secret-token"
+    assert len(cache.key("secret-token")) == 64
+
+
+def test_committed_user_change_invalidates_its_tokens(client, register):
+    account = register("renamed")
+    headers = {"Authorization": f"Bearer {account['access_token']}"}
+    assert client.get("/artworks/my-gallery", headers=headers).status_code == 200
+    assert user_cache.get_local(account["access_token"]) is not None
+
+    db = SessionLocal()
+    try:
+        db.get(User, account["user"]["id"]).email = "new@example.com"
+        db.commit()
+    finally:
+        db.close()
+
+    assert user_cache.get_local(account["access_token"]) is None
@@ -1,10 +1,12 @@
+import asyncio
 import os
 from huggingface_hub import InferenceClient
-from PIL import Image
-import uuid
 from typing import Optional
+from utils.image_io import save_pil_image
 
 class AIArtGenerator:
+    model_id = "black-forest-labs/FLUX.1-schnell"
+
     def __init__(self):
         self.client = InferenceClient(
             api_key=os.environ.get("HF_TOKEN")
@@ -22,29 +24,18 @@ class AIArtGenerator:
         Generate AI artwork and return image path and filename
         """
         try:
-            # Generate image using HuggingFace
-            image = self.client.text_to_image(
+            # Generate image using HuggingFace (blocking client, run off the event loop)
+            image = await asyncio.to_thread(
+                self.client.text_to_image,
                 prompt,
-                model="black-forest-labs/FLUX.1-schnell",
+                model=self.model_id,
                 negative_prompt=negative_prompt,
                 width=width,
                 height=height
             )
             
-            # Generate unique filename
-            image_id = str(uuid.uuid4())
-            filename = f"{image_id}.png"
-            
-            # Ensure directory exists
-            os.makedirs("static/images", exist_ok=True)
-            
-            # Full path for saving
-            full_path = os.path.join("static", "images", filename)
-            
-            # Save image
-            image.save(full_path)
-            
-            return full_path, filename
+            # Save image (the client returns a decoded image, so encode it off the event loop)
+            return await save_pil_image(image)
             
         except Exception as e:
             raise Exception(f"Failed to generate image: {str(e)}")
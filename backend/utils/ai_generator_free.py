@@ -1,13 +1,13 @@
 import os
-import requests
-import uuid
-from PIL import Image
-from io import BytesIO
 from typing import Optional
+from utils.http_client import http_client
+from utils.image_io import save_image_bytes
 
 class FreeAIArtGenerator:
     """Alternative AI generator using free APIs"""
     
+    model_id = "runwayml/stable-diffusion-v1-5"
+    
     def __init__(self):
         self.hf_token = os.environ.get("HF_TOKEN")
     
@@ -23,7 +23,7 @@ class FreeAIArtGenerator:
         
         try:
             # Use free Stable Diffusion model
-            api_url = "https://api-inference.huggingface.co/models/runwayml/stable-diffusion-v1-5"
+            api_url = f"https://api-inference.huggingface.co/models/{self.model_id}"
             
             headers = {"Authorization": f"Bearer {self.hf_token}"}
             
@@ -37,26 +37,13 @@ class FreeAIArtGenerator:
                 }
             }
             
-            response = requests.post(api_url, headers=headers, json=payload)
+            response = await http_client.post(api_url, headers=headers, json=payload)
             
             if response.status_code != 200:
                 raise Exception(f"API request failed: {response.status_code} - {response.text}")
             
-            # Convert response to image
-            image = Image.open(BytesIO(response.content))
-            
-            # Generate unique filename
-            image_id = str(uuid.uuid4())
-            filename = f"{image_id}.png"
-            image_path = f"static/images/{filename}"
-            
-            # Ensure directory exists
-            os.makedirs("static/images", exist_ok=True)
-            
-            # Save image
-            image.save(image_path)
-            
-            return image_path, filename
+            # Save image bytes (transcoded only if not already RGB PNG/JPEG/WebP)
+            return await save_image_bytes(response.content)
             
         except Exception as e:
             raise Exception(f"Failed to generate image: {str(e)}")
@@ -0,0 +1,549 @@
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Iterable, Optional, Set, Tuple
+
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Unset means every cache is in-process only (per worker, cold after a restart)
+REDIS_URL = os.getenv("REDIS_URL", "")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "artbuddy:cache:")
+# How long other workers wait for one worker to fill a missing key before loading it themselves
+CACHE_LOCK_TIMEOUT_SECONDS = float(os.getenv("CACHE_LOCK_TIMEOUT_SECONDS", "5"))
+CACHE_LOCK_POLL_SECONDS = 0.02
+
+
+class JsonSerializer:
+    """JSON; with ``factory`` (e.g. a dataclass) objects are rebuilt as ``factory(**data)``"""
+
+    name = "json"
+
+    def __init__(self, factory: Optional[Callable[..., Any]] = None):
+        self.factory = factory
+
+    def dumps(self, value: Any) -> bytes:
+        if dataclasses.is_dataclass(value):
+            value = dataclasses.asdict(value)
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def loads(self, data: bytes) -> Any:
+        value = json.loads(data)
+        return self.factory(**value) if self.factory else value
+
+
+class PickleSerializer:
+    """Any picklable object. Only for a Redis nobody else can write to: unpickling runs code"""
+
+    name = "pickle"
+
+    def dumps(self, value: Any) -> bytes:
+        return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+class StringSerializer:
+    name = "string"
+
+    def dumps(self, value: str) -> bytes:
+        return value.encode()
+
+    def loads(self, data: bytes) -> str:
+        return data.decode()
+
+
+class LocalTier:
+    """
+    The in-process tier: an LRU dict of live objects (nothing is serialized)
+    with per-entry expiry and tags. ``version`` moves on every invalidation;
+    a ``put`` carrying an older version is dropped, so a value read while an
+    invalidation happened is never stored over it.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, FrozenSet[str], float]]" = OrderedDict()
+        self._tagged: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                self._remove(key)
+                self.expired += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, value: Any, tags: Iterable[str], ttl: float, version: Optional[int] = None) -> bool:
+        if self.max_entries <= 0 or ttl <= 0:
+            return False
+        with self._lock:
+            if version is not None and version != self.version:
+                return False
+            if key in self._entries:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._entries[key] = (value, tags, time.monotonic() + ttl)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Drop every entry carrying any of ``tags``; returns how many went"""
+        with self._lock:
+            self.version += 1
+            keys = set()
+            for tag in tags:
+                keys |= self._tagged.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._tagged.clear()
+
+    def _remove(self, key: str):
+        _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+
+# KEYS: entry, version, tag sets...; ARGV: data, ttl_ms, expected version ('' = any)
+_SET_SCRIPT = """
+if ARGV[3] ~= '' and (redis.call('GET', KEYS[2]) or '0') ~= ARGV[3] then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+for i = 3, #KEYS do
+  redis.call('SADD', KEYS[i], KEYS[1])
+  if redis.call('PTTL', KEYS[i]) < tonumber(ARGV[2]) then
+    redis.call('PEXPIRE', KEYS[i], ARGV[2])
+  end
+end
+return 1
+"""
+
+# KEYS: version, tag sets...; ARGV: channel, message
+_INVALIDATE_SCRIPT = """
+redis.call('INCR', KEYS[1])
+local dropped = 0
+for i = 2, #KEYS do
+  for _, key in ipairs(redis.call('SMEMBERS', KEYS[i])) do
+    dropped = dropped + redis.call('DEL', key)
+  end
+  redis.call('DEL', KEYS[i])
+end
+redis.call('PUBLISH', ARGV[1], ARGV[2])
+return dropped
+"""
+
+# KEYS: lock; ARGV: owner token
+_UNLOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisTier:
+    """
+    The shared tier, one per process for every cache. Entries are the
+    serialized value behind a JSON line of its tags and expiry; each cache
+    has a version counter and a set per tag in Redis, so invalidation and
+    version-guarded writes work across workers as ``LocalTier``'s do within
+    one.
+    Invalidations are also published, and every worker drops the matching
+    entries from its local tier when they arrive.
+
+    Redis errors are logged and counted, and the cache carries on as if the
+    tier were empty: an outage costs hit rate, not availability. Keys fetched
+    from tag sets are not declared to the scripts, so this needs a single
+    Redis node (not Cluster). Takes any ``redis.asyncio``-compatible client;
+    ``fakeredis.aioredis.FakeRedis`` works as a local stand-in.
+    """
+
+    def __init__(self, client, prefix: str = CACHE_KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+        self.channel = f"{prefix}invalidate"
+        self._set = client.register_script(_SET_SCRIPT)
+        self._invalidate = client.register_script(_INVALIDATE_SCRIPT)
+        self._unlock = client.register_script(_UNLOCK_SCRIPT)
+        self._caches: Dict[str, "TieredCache"] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.healthy = True
+        self.errors = 0
+        self.published = 0
+        self.received = 0
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisTier":
+        import redis.asyncio
+
+        return cls(redis.asyncio.from_url(url))
+
+    def register(self, cache: "TieredCache"):
+        self._caches[cache.name] = cache
+
+    def _entry_key(self, name: str, key: str) -> str:
+        return f"{self.prefix}{name}:e:{key}"
+
+    def _version_key(self, name: str) -> str:
+        return f"{self.prefix}{name}:v"
+
+    def _tag_key(self, name: str, tag: str) -> str:
+        return f"{self.prefix}{name}:t:{tag}"
+
+    def _lock_key(self, name: str, key: str) -> str:
+        return f"{self.prefix}{name}:l:{key}"
+
+    def _failed(self, action: str, e: Exception):
+        self.errors += 1
+        # One warning per outage, not one per request
+        if self.healthy:
+            logger.warning("Shared cache %s failed, continuing without it: %s", action, e)
+        self.healthy = False
+
+    async def get(self, name: str, key: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """(entry, cache version) in one round trip; version None means Redis is unavailable"""
+        try:
+            data, version = await self.client.mget(self._entry_key(name, key), self._version_key(name))
+        except Exception as e:
+            self._failed("read", e)
+            return None, None
+        self.healthy = True
+        return data, (version.decode() if version else "0")
+
+    async def set(
+        self,
+        name: str,
+        key: str,
+        data: bytes,
+        tags: Iterable[str],
+        ttl: float,
+        version: Optional[str] = None
+    ) -> bool:
+        """Store unless the cache was invalidated since ``version`` was read"""
+        keys = [self._entry_key(name, key), self._version_key(name)] + [self._tag_key(name, tag) for tag in tags]
+        try:
+            return bool(await self._set(keys=keys, args=[data, max(1, int(ttl * 1000)), version or ""]))
+        except Exception as e:
+            self._failed("write", e)
+            return False
+
+    async def invalidate(self, name: str, tags: Iterable[str]):
+        tags = list(tags)
+        message = json.dumps({"cache": name, "tags": tags})
+        keys = [self._version_key(name)] + [self._tag_key(name, tag) for tag in tags]
+        try:
+            await self._invalidate(keys=keys, args=[self.channel, message])
+            self.published += 1
+        except Exception as e:
+            self._failed("invalidation", e)
+
+    def invalidate_soon(self, name: str, tags: Iterable[str]):
+        """``invalidate`` from synchronous code on any thread, without waiting for Redis"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        coroutine = self.invalidate(name, list(tags))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._loop.create_task(coroutine)
+        else:
+            asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    async def lock(self, name: str, key: str, ttl: float) -> Optional[str]:
+        """Owner token if we now hold the fill lock for ``key``; None if someone else does (or Redis is down)"""
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.client.set(self._lock_key(name, key), token, nx=True, px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            self._failed("lock", e)
+            return None
+        return token if acquired else None
+
+    async def unlock(self, name: str, key: str, token: str):
+        try:
+            await self._unlock(keys=[self._lock_key(name, key)], args=[token])
+        except Exception as e:
+            self._failed("unlock", e)
+
+    async def locked(self, name: str, key: str) -> bool:
+        try:
+            return bool(await self.client.exists(self._lock_key(name, key)))
+        except Exception as e:
+            self._failed("lock check", e)
+            return False
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "errors": self.errors,
+            "invalidations_published": self.published,
+            "invalidations_received": self.received,
+        }
+
+    async def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub()
+                await pubsub.subscribe(self.channel)
+                # Invalidations published while we were not subscribed are lost; start over
+                for cache in self._caches.values():
+                    cache.local.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed("subscription", e)
+                await asyncio.sleep(1)
+
+    def _dispatch(self, data: bytes):
+        self.received += 1
+        message = json.loads(data)
+        cache = self._caches.get(message["cache"])
+        if cache is not None:
+            # Our own messages too: a stale entry refilled from Redis before the script ran goes now
+            cache.local.invalidate(message["tags"])
+
+
+class TieredCache:
+    """
+    A cache in two tiers: ``LocalTier`` in process, then (with ``REDIS_URL``)
+    the shared ``RedisTier``. Reads go L1, then L2 (filling L1), then the
+    caller's loader; values are serialized only for L2.
+
+    ``get_or_load`` is protected against stampedes: concurrent misses for a
+    key in one process share a single load, and across processes the first
+    to miss takes a short Redis lock while the others wait for its result to
+    appear in L2 (or for the lock to go, then load themselves). Entries are
+    tagged, and ``invalidate`` drops them from both tiers in every worker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int,
+        serializer=None,
+        shared: Optional[RedisTier] = None,
+        lock_timeout: float = CACHE_LOCK_TIMEOUT_SECONDS
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.serializer = serializer or PickleSerializer()
+        self.local = LocalTier(max_entries)
+        self.shared = shared
+        self.lock_timeout = lock_timeout
+        self.flights = SingleFlight()
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.lock_waits = 0
+        if shared is not None:
+            shared.register(self)
+
+    def key(self, key: Hashable) -> str:
+        """The string form of ``key`` used in both tiers"""
+        return key if isinstance(key, str) else json.dumps(key, separators=(",", ":"), default=str)
+
+    def get_local(self, key: Hashable) -> Optional[Any]:
+        """L1 only, no I/O: for hot paths that can decide quickly what to do on a miss"""
+        value = self.local.get(self.key(key))
+        if value is not None:
+            self.l1_hits += 1
+        return value
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        key = self.key(key)
+        value = self.local.get(key)
+        if value is not None:
+            self.l1_hits += 1
+            return value
+        if self.shared is not None:
+            version = self.local.version
+            data, _ = await self.shared.get(self.name, key)
+            value = self._from_shared(key, data, version) if data is not None else None
+            if value is not None:
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), ttl: Optional[float] = None):
+        """Store unconditionally; use ``get_or_load`` for anything an invalidation could make stale"""
+        await self._store(self.key(key), value, list(tags), self.ttl if ttl is None else ttl, None, None, guarded=False)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        load: Callable[[], Awaitable[Tuple[Any, Iterable[str]]]],
+        ttl: Optional[float] = None,
+        refresh: bool = False
+    ) -> Any:
+        """
+        The cached value, or the ``(value, tags)`` from ``load`` (stored in
+        both tiers). ``refresh`` skips the lookups and replaces the entry.
+        """
+        key = self.key(key)
+        ttl = self.ttl if ttl is None else ttl
+        if not refresh:
+            value = self.local.get(key)
+            if value is not None:
+                self.l1_hits += 1
+                return value
+        # Refreshing callers don't take a value loaded for someone else
+        flight = f"refresh:{key}" if refresh else key
+        return await self.flights.do(flight, lambda: self._fill(key, load, ttl, refresh))
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop entries carrying any of ``tags`` everywhere; safe from any thread. Returns local entries dropped"""
+        dropped = self.local.invalidate(tags)
+        if self.shared is not None:
+            self.shared.invalidate_soon(self.name, tags)
+        return dropped
+
+    @property
+    def version(self) -> int:
+        return self.local.version
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.l1_hits + self.l2_hits
+        lookups = hits + self.misses + self.loads
+        return {
+            "entries": len(self.local),
+            "hits": hits,
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses + self.loads,
+            "loads": self.loads,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "lock_waits": self.lock_waits,
+            "coalesced": self.flights.coalesced,
+            "expired": self.local.expired,
+            "evictions": self.local.evictions,
+            "invalidations": self.local.invalidations,
+            "ttl_seconds": self.ttl,
+            "shared": self.shared is not None,
+        }
+
+    async def _fill(self, key: str, load, ttl: float, refresh: bool) -> Any:
+        local_version = self.local.version
+        shared_version = None
+        lock = None
+        if self.shared is not None and ttl > 0:
+            data, shared_version = await self.shared.get(self.name, key)
+            value = self._from_shared(key, data, local_version) if data is not None and not refresh else None
+            if value is not None:
+                return value
+            if shared_version is not None and not refresh:
+                lock = await self.shared.lock(self.name, key, self.lock_timeout)
+                if lock is None:
+                    value = await self._wait_for_fill(key, local_version)
+                    if value is not None:
+                        return value
+                    local_version = self.local.version
+                    _, shared_version = await self.shared.get(self.name, key)
+
+        try:
+            self.loads += 1
+            value, tags = await load()
+            if value is not None:
+                await self._store(key, value, list(tags), ttl, local_version, shared_version)
+            return value
+        finally:
+            if lock is not None:
+                await self.shared.unlock(self.name, key, lock)
+
+    async def _wait_for_fill(self, key: str, local_version: int) -> Optional[Any]:
+        """Another worker is loading ``key``: its value, or None once its lock is gone or times out"""
+        self.lock_waits += 1
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(CACHE_LOCK_POLL_SECONDS)
+            data, _ = await self.shared.get(self.name, key)
+            value = self._from_shared(key, data, local_version) if data is not None else None
+            if value is not None:
+                return value
+            if not await self.shared.locked(self.name, key):
+                return None
+        return None
+
+    async def _store(self, key: str, value: Any, tags, ttl: float, local_version, shared_version, guarded: bool = True):
+        if ttl <= 0:
+            return
+        self.local.put(key, value, tags, ttl, local_version)
+        # A guarded write without a version (Redis was unreachable when the load began) can't be checked; skip it
+        if self.shared is not None and (shared_version is not None or not guarded):
+            header = json.dumps({"tags": tags, "expires_at": time.time() + ttl}).encode()
+            await self.shared.set(self.name, key, header + b"\n" + self.serializer.dumps(value), tags, ttl, shared_version)
+
+    def _from_shared(self, key: str, data: bytes, local_version: int) -> Optional[Any]:
+        header, _, payload = data.partition(b"\n")
+        header = json.loads(header)
+        # Entries may have had a shorter ttl than the cache's; never keep one locally past its own expiry
+        remaining = header["expires_at"] - time.time()
+        if remaining <= 0:
+            return None
+        value = self.serializer.loads(payload)
+        self.l2_hits += 1
+        self.local.put(key, value, header["tags"], min(self.ttl, remaining), local_version)
+        return value
+
+
+# Global instance
+redis_tier = RedisTier.from_url(REDIS_URL) if REDIS_URL else None
@@ -0,0 +1,70 @@
+import asyncio
+import os
+from typing import Dict, List
+
+from PIL import Image, features
+
+from utils.storage import image_store
+
+DERIVATIVE_WIDTHS = [int(w) for w in os.getenv("DERIVATIVE_WIDTHS", "256,512,1024").split(",") if w.strip()]
+DERIVATIVE_QUALITY = int(os.getenv("DERIVATIVE_QUALITY", "80"))
+# WebP when Pillow was built with it, JPEG otherwise
+DERIVATIVE_FORMAT = os.getenv("DERIVATIVE_FORMAT", "WEBP" if features.check("webp") else "JPEG").upper()
+
+_EXTENSIONS = {"WEBP": ".webp", "JPEG": ".jpg"}
+_SAVE_OPTIONS = {"quality": DERIVATIVE_QUALITY}
+if DERIVATIVE_FORMAT == "WEBP":
+    _SAVE_OPTIONS["method"] = 4
+else:
+    _SAVE_OPTIONS["optimize"] = True
+
+
+def derivative_widths(source_width: int, widths: List[int] = DERIVATIVE_WIDTHS) -> List[int]:
+    """Configured widths strictly smaller than the original (never upscale)"""
+    return sorted(w for w in widths if w < source_width)
+
+
+def create_derivatives(image_path: str) -> Dict[str, str]:
+    """
+    Write downscaled copies of an artwork image and return a srcset-style map
+    of ``"<width>w" -> URL``.
+
+    Derivatives sit next to the source as ``<stem>_<width><ext>``. Store
+    blobs are named by content hash, so re-running for the same image (a cache
+    hit, a backfill) reuses what is already on disk, and the image store
+    removes them together with the source.
+    """
+    stem = os.path.splitext(image_path)[0]
+    extension = _EXTENSIONS[DERIVATIVE_FORMAT]
+
+    srcset = {}
+    with Image.open(image_path) as source:
+        widths = derivative_widths(source.width)
+        image = None
+        # Largest first so each step downsamples the previous (smaller) result
+        for width in reversed(widths):
+            path = f"{stem}_{width}{extension}"
+            srcset[f"{width}w"] = image_store.url_for(image_store.filename_of(path))
+            if os.path.exists(path):
+                continue
+
+            if image is None:
+                image = source.convert("RGB")
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+            image.save(path, DERIVATIVE_FORMAT, **_SAVE_OPTIONS)
+
+    return dict(sorted(srcset.items(), key=lambda item: int(item[0][:-1])))
+
+
+async def create_derivatives_async(image_path: str) -> Dict[str, str]:
+    """
+    ``create_derivatives`` run in an executor so it never blocks the event loop.
+    Failures are logged and yield an empty map; ``manage.py backfill-derivatives``
+    can fill them in later.
+    """
+    try:
+        return await asyncio.to_thread(create_derivatives, image_path)
+    except Exception as e:
+        print(f"Derivative generation failed for {image_path}: {e}")
+        return {}
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal, GenerationCacheEntry, ImageBlob
+from utils.singleflight import SingleFlight, SyncSingleFlight
+
+from utils.storage import ImageStore, image_store as default_image_store
+
+GENERATION_CACHE_MAX_BYTES = int(os.getenv("GENERATION_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+def normalize_prompt(prompt: Optional[str]) -> str:
+    """Collapse whitespace and fold case so trivially different prompts share a key"""
+    return " ".join((prompt or "").split()).casefold()
+
+
+def generation_key(
+    model_id: str,
+    prompt: str,
+    negative_prompt: Optional[str] = None,
+    guidance_scale: float = 7.5,
+    width: int = 512,
+    height: int = 512
+) -> str:
+    params = {
+        "model": model_id,
+        "prompt": normalize_prompt(prompt),
+        "negative_prompt": normalize_prompt(negative_prompt),
+        "guidance_scale": round(float(guidance_scale), 1),
+        "width": int(width),
+        "height": int(height),
+    }
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+class GenerationCache:
+    """
+    Result cache for image generation keyed on normalized request parameters.
+
+    The index is the ``generation_cache`` table, so it survives restarts and
+    every worker sees the same entries. Each entry points at a blob in the
+    content-addressed image store and holds one store reference on it, which
+    keeps a cached result on disk after the artwork that produced it is gone.
+
+    ``max_bytes`` bounds the disk only the cache keeps alive: blobs whose
+    every reference is a cache entry. Past it, those blobs are evicted least
+    recently used first. A blob an artwork still holds costs the cache no
+    disk, so it is never evicted for space. Concurrent misses for the same
+    key are coalesced into a single provider call.
+    """
+
+    def __init__(self, max_bytes: int = GENERATION_CACHE_MAX_BYTES, store: ImageStore = default_image_store):
+        self.max_bytes = max_bytes
+        self.image_store = store
+        self._lock = threading.Lock()
+        self.flights = SingleFlight()
+        self.sync_flights = SyncSingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key: str, record: bool = True) -> Optional[Tuple[str, str]]:
+        """
+        Return (image_path, filename) for a cached result, or None. Pass
+        ``record=False`` for re-checks that should not skew hit/miss counters.
+        """
+        with self._session() as db:
+            entry = db.get(GenerationCacheEntry, key)
+            if entry is not None and not os.path.exists(self._blob_path(entry.blob)):
+                # The file went behind the cache's back; the entry is useless
+                self._evict(db, [entry])
+                entry = None
+            if entry is not None:
+                entry.last_used_at = datetime.utcnow()
+                blob = entry.blob
+            db.commit()
+
+        if record:
+            with self._lock:
+                if entry is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        return (self._blob_path(blob), blob) if entry is not None else None
+
+    async def fetch(self, key: str, record: bool = True) -> Optional[Tuple[str, str]]:
+        """``lookup`` without blocking the event loop"""
+        return await asyncio.to_thread(self.lookup, key, record)
+
+    def store(self, key: str, image_path: str, filename: str) -> Tuple[str, str]:
+        """
+        Index an image-store blob under ``key``, taking a store reference for
+        the entry, then evict if over budget. Returns (image_path, filename).
+        """
+        if self.image_store.is_placeholder(image_path):
+            # Offline placeholders are never worth caching
+            return image_path, filename
+
+        blob = self.image_store.filename_of(image_path)
+        with self._session() as db:
+            entry = db.get(GenerationCacheEntry, key)
+            if entry is None:
+                db.add(GenerationCacheEntry(key=key, blob=blob, last_used_at=datetime.utcnow()))
+                self.image_store.acquire(image_path, db)
+            else:
+                if entry.blob != blob:
+                    self.image_store.release(self._blob_path(entry.blob), db)
+                    self.image_store.acquire(image_path, db)
+                    entry.blob = blob
+                entry.last_used_at = datetime.utcnow()
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker cached this key first; its entry serves as well
+                db.rollback()
+            self._enforce_budget(db, keep=blob)
+
+        return image_path, blob
+
+    async def get_or_generate(
+        self,
+        model_id: str,
+        generate: Callable[..., Awaitable[Tuple[str, str]]],
+        prompt: str,
+        negative_prompt: Optional[str] = None,
+        guidance_scale: float = 7.5,
+        width: int = 512,
+        height: int = 512,
+        record: bool = True
+    ) -> Tuple[str, str]:
+        """
+        Serve from cache, or call ``generate`` and cache what it produces.
+        Identical misses already in flight share one ``generate`` call.
+        """
+        key = generation_key(model_id, prompt, negative_prompt, guidance_scale, width, height)
+        cached = await self.fetch(key, record=record)
+        if cached:
+            return cached
+
+        async def generate_and_store():
+            image_path, filename = await generate(
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                guidance_scale=guidance_scale,
+                width=width,
+                height=height
+            )
+            return await asyncio.to_thread(self.store, key, image_path, filename)
+
+        return await self.flights.do(key, generate_and_store)
+
+    def get_or_generate_sync(
+        self,
+        model_id: str,
+        generate: Callable[..., Tuple[str, str]],
+        prompt: str,
+        width: int = 512,
+        height: int = 512
+    ) -> Tuple[str, str]:
+        """Blocking variant for the synchronous generators"""
+        key = generation_key(model_id, prompt, width=width, height=height)
+        cached = self.lookup(key)
+        if cached:
+            return cached
+
+        def generate_and_store():
+            image_path, filename = generate(prompt=prompt, width=width, height=height)
+            return self.store(key, image_path, filename)
+
+        return self.sync_flights.do(key, generate_and_store)
+
+    def reconcile(self) -> int:
+        """
+        Drop entries whose file is gone and evict down to ``max_bytes`` (which
+        may have been lowered since the last run). Returns entries dropped.
+        """
+        with self._session() as db:
+            missing = [
+                entry for entry in db.query(GenerationCacheEntry).all()
+                if not os.path.exists(self._blob_path(entry.blob))
+            ]
+            self._evict(db, missing)
+            db.commit()
+            self._enforce_budget(db)
+        return len(missing)
+
+    def stats(self) -> Dict[str, float]:
+        with self._session() as db:
+            entries = db.query(func.count(GenerationCacheEntry.key)).scalar()
+            blobs = db.query(func.count(func.distinct(GenerationCacheEntry.blob))).scalar()
+            owned = self._owned_blobs(db)
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "blobs": blobs,
+            "owned_blobs": len(owned),
+            "total_bytes": sum(size for _, size in owned),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def _owned_blobs(self, db: Session) -> List[Tuple[str, int]]:
+        """(blob, size) of blobs only cache entries refer to, least recently used first"""
+        return db.query(GenerationCacheEntry.blob, ImageBlob.size).join(
+            ImageBlob, ImageBlob.path == GenerationCacheEntry.blob
+        ).group_by(
+            GenerationCacheEntry.blob, ImageBlob.size, ImageBlob.refcount
+        ).having(
+            ImageBlob.refcount <= func.count(GenerationCacheEntry.key)
+        ).order_by(
+            func.max(GenerationCacheEntry.last_used_at)
+        ).all()
+
+    def _enforce_budget(self, db: Session, keep: Optional[str] = None):
+        """Evict cache-only blobs, oldest first, until they fit in ``max_bytes``"""
+        owned = self._owned_blobs(db)
+        total = sum(size for _, size in owned)
+        for blob, size in owned:
+            if total <= self.max_bytes:
+                break
+            if blob == keep:
+                continue
+            entries = db.query(GenerationCacheEntry).filter(GenerationCacheEntry.blob == blob).all()
+            self._evict(db, entries)
+            total -= size
+            with self._lock:
+                self.evictions += len(entries)
+        db.commit()
+
+    def _evict(self, db: Session, entries: List[GenerationCacheEntry]):
+        """Delete entries and give back their store references, in ``db``'s transaction"""
+        for entry in entries:
+            self.image_store.release(self._blob_path(entry.blob), db)
+            db.delete(entry)
+
+    def _blob_path(self, blob: str) -> str:
+        return self.image_store.path_for(blob)
+
+    @contextmanager
+    def _session(self) -> Iterator[Session]:
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+
+# Global instance
+generation_cache = GenerationCache()
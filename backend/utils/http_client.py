@@ -0,0 +1,110 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Any, Awaitable, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+
+
+class HTTPClient:
+    """
+    Shared keep-alive HTTP client for the image providers.
+
+    One pooled ``httpx.AsyncClient`` is kept per event loop so connections
+    (and their TLS sessions) are reused across generations. Requests to a
+    single host are additionally capped by a semaphore, and connect and read
+    timeouts are configured separately. Synchronous callers can use
+    ``run_sync`` to execute provider coroutines on a shared background loop.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        max_connections_per_host: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.max_connections_per_host = max_connections_per_host
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._host_limits: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def _timeout(self, read_timeout: Optional[float] = None) -> httpx.Timeout:
+        read = read_timeout if read_timeout is not None else self.read_timeout
+        return httpx.Timeout(read, connect=self.connect_timeout)
+
+    def client(self) -> httpx.AsyncClient:
+        """Return the pooled client bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self._timeout(),
+                follow_redirects=True
+            )
+            self._clients[loop] = client
+            self._host_limits[loop] = {}
+        return client
+
+    async def request(self, method: str, url: str, read_timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        client = self.client()
+        host_limits = self._host_limits[asyncio.get_running_loop()]
+        host = urlsplit(url).netloc
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(self.max_connections_per_host)
+
+        async with host_limits[host]:
+            return await client.request(method, url, timeout=self._timeout(read_timeout), **kwargs)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self):
+        """Close the client bound to the running event loop"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        self._host_limits.pop(loop, None)
+        if client is not None:
+            await client.aclose()
+
+    def run_sync(self, coro: Awaitable[Any]) -> Any:
+        """Run a coroutine on the shared background loop and wait for the result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._background_loop()).result()
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="http-client-loop",
+                    daemon=True
+                ).start()
+            return self._loop
+
+
+# Global instance
+http_client = HTTPClient()
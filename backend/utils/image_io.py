@@ -0,0 +1,68 @@
+import asyncio
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from utils.storage import image_store
+
+# Formats browsers display natively; provider bytes in these are stored untouched
+PASSTHROUGH_FORMATS = {"PNG": ".png", "JPEG": ".jpg", "WEBP": ".webp"}
+
+
+def sniff(content: bytes) -> Tuple[str, str, Tuple[int, int]]:
+    """
+    Return (format, mode, size) from the image header without decoding pixels.
+    Raises if the bytes are not a recognisable image.
+    """
+    with Image.open(BytesIO(content)) as image:
+        return image.format, image.mode, image.size
+
+
+def write_image_bytes(content: bytes, size: Optional[Tuple[int, int]] = None) -> Tuple[str, str]:
+    """
+    Persist provider image bytes in the image store and return (image_path, filename).
+
+    Bytes that are already an RGB PNG/JPEG/WebP of the wanted size are written
+    to disk as-is; anything else (alpha, palette, exotic formats, wrong size)
+    is decoded once and transcoded to an RGB PNG.
+    """
+    image_format, mode, image_size = sniff(content)
+
+    if image_format in PASSTHROUGH_FORMATS and mode == "RGB" and (size is None or image_size == tuple(size)):
+        return image_store.put(content, PASSTHROUGH_FORMATS[image_format])
+
+    image = Image.open(BytesIO(content))
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        # Flatten transparency onto white rather than letting it go black
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    if size is not None and image.size != tuple(size):
+        image = image.resize(tuple(size), Image.Resampling.LANCZOS)
+
+    return write_pil_image(image)
+
+
+def write_pil_image(image: Image.Image, placeholder: bool = False) -> Tuple[str, str]:
+    """
+    Encode an already decoded image as PNG into the image store and return
+    (image_path, filename). ``placeholder`` marks locally drawn fallbacks so
+    they are never cached as real generations.
+    """
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return image_store.put(buffer.getvalue(), ".png", placeholder=placeholder)
+
+
+async def save_image_bytes(content: bytes, size: Optional[Tuple[int, int]] = None) -> Tuple[str, str]:
+    """``write_image_bytes`` run in an executor so it never blocks the event loop"""
+    return await asyncio.to_thread(write_image_bytes, content, size)
+
+
+async def save_pil_image(image: Image.Image) -> Tuple[str, str]:
+    """``write_pil_image`` run in an executor so it never blocks the event loop"""
+    return await asyncio.to_thread(write_pil_image, image)
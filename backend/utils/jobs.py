@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "4"))
+GENERATION_QUEUE_SIZE = int(os.getenv("GENERATION_QUEUE_SIZE", "100"))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity and cannot accept more work"""
+
+
+class Job:
+    def __init__(self, owner_id: int, func: Optional[Callable[[], Awaitable[Any]]]):
+        self.id = uuid.uuid4().hex
+        self.owner_id = owner_id
+        self.func = func
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+class GenerationJobQueue:
+    """
+    Bounded queue of generation jobs drained by a fixed pool of worker tasks.
+
+    Request handlers submit a coroutine factory and get a job id back at once;
+    the workers run the slow provider calls so the event loop stays free for
+    gallery and auth traffic.
+    """
+
+    def __init__(self, workers: int = GENERATION_WORKERS, max_queue_size: int = GENERATION_QUEUE_SIZE):
+        self.workers = max(1, workers)
+        self.max_queue_size = max(1, max_queue_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"generation-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, owner_id: int, func: Callable[[], Awaitable[Any]]) -> Job:
+        """Queue a job, raising QueueFullError when the queue is saturated"""
+        if self._queue is None:
+            raise RuntimeError("Job queue has not been started")
+
+        self._prune()
+        job = Job(owner_id, func)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._rejected += 1
+            raise QueueFullError("Generation queue is full, please retry later")
+
+        self._jobs[job.id] = job
+        return job
+
+    def record(self, owner_id: int, result: Any) -> Job:
+        """Register work that finished without queueing (e.g. a cache hit)"""
+        self._prune()
+        job = Job(owner_id, None)
+        job.status = DONE
+        job.result = result
+        job.started_at = job.finished_at = job.created_at
+        self._jobs[job.id] = job
+        self._completed += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs_for(self, owner_id: int) -> List[Job]:
+        return [job for job in reversed(self._jobs.values()) if job.owner_id == owner_id]
+
+    def retry_after(self) -> int:
+        """Rough number of seconds until a queue slot frees up"""
+        return max(1, self.queued // self.workers) * 5
+
+    @property
+    def queued(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "max_queue_size": self.max_queue_size,
+            "queued": self.queued,
+            "running": self._running,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._running += 1
+            try:
+                job.result = await job.func()
+                job.status = DONE
+                self._completed += 1
+            except asyncio.CancelledError:
+                job.status = FAILED
+                job.error = "Job cancelled"
+                raise
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+                self._failed += 1
+            finally:
+                job.func = None
+                job.finished_at = time.time()
+                self._running -= 1
+                self._queue.task_done()
+
+    def _prune(self):
+        """Forget finished jobs once their results have expired"""
+        cutoff = time.time() - JOB_RESULT_TTL_SECONDS
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            if job.finished and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+
+# Global instance
+generation_queue = GenerationJobQueue()
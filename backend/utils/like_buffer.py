@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import func, select, update
+
+from models.database import SessionLocal, Artwork, Like
+from utils.response_cache import gallery_cache
+from utils.trending import trending_scores, TRENDING_LIKE_WEIGHT
+
+logger = logging.getLogger(__name__)
+
+LIKE_FLUSH_INTERVAL_SECONDS = float(os.getenv("LIKE_FLUSH_INTERVAL_SECONDS", "2"))
+
+
+class LikeCounterBuffer:
+    """
+    Write-behind maintenance of ``Artwork.likes_count``.
+
+    Like toggles only record a +1/-1 delta here; a timer task recounts the
+    likes of every artwork with pending deltas in one transaction every
+    ``interval`` seconds, so a burst of likes on a hot artwork costs one row
+    update instead of one per click. Readers add ``pending(artwork_id)`` to
+    the stored counter. Flushes set the counter from the likes table rather
+    than adding the deltas, so they agree with ``manage.py repair-counters``
+    run against a live server and never count a like twice; a like that
+    lands between the recount and the next flush is shown one too high until
+    then. Deltas not yet flushed are lost if the process dies (the counter
+    is fixed by the artwork's next like, or by repair-counters).
+    """
+
+    def __init__(self, interval: float = LIKE_FLUSH_INTERVAL_SECONDS):
+        self.interval = interval
+        self._deltas: Dict[int, int] = {}
+        # Taken out of _deltas but not committed yet; still visible to readers
+        self._flushing: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.failures = 0
+
+    def add(self, artwork_id: int, delta: int):
+        with self._lock:
+            value = self._deltas.get(artwork_id, 0) + delta
+            if value:
+                self._deltas[artwork_id] = value
+            else:
+                self._deltas.pop(artwork_id, None)
+
+    def pending(self, artwork_id: int) -> int:
+        with self._lock:
+            return self._deltas.get(artwork_id, 0) + self._flushing.get(artwork_id, 0)
+
+    def flush(self) -> int:
+        """Recount artworks with pending deltas in one transaction; returns artworks updated"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._deltas:
+                    return 0
+                self._flushing, self._deltas = self._deltas, {}
+                batch = dict(self._flushing)
+
+            likes = select(func.count(Like.id)).where(Like.artwork_id == Artwork.id).scalar_subquery()
+            db = SessionLocal()
+            try:
+                # One UPDATE for the whole batch
+                db.execute(
+                    update(Artwork)
+                    .where(Artwork.id.in_(list(batch)))
+                    .values(likes_count=likes)
+                    .execution_options(synchronize_session=False)
+                )
+                trending_scores.bump(
+                    db.connection(),
+                    {artwork_id: delta * TRENDING_LIKE_WEIGHT for artwork_id, delta in batch.items()}
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                self.failures += 1
+                # Put the deltas back so the next flush retries them
+                with self._lock:
+                    for artwork_id, delta in self._flushing.items():
+                        self._deltas[artwork_id] = self._deltas.get(artwork_id, 0) + delta
+                    self._flushing = {}
+                raise
+            finally:
+                db.close()
+
+            with self._lock:
+                self._flushing = {}
+            self.flushes += 1
+            self.rows_flushed += len(batch)
+
+        # Pages built between commit and clearing _flushing may have counted a delta twice
+        gallery_cache.invalidate(*[f"artwork:{artwork_id}" for artwork_id in batch])
+        return len(batch)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Don't lose what is still buffered on a clean shutdown
+        await asyncio.to_thread(self.flush)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._deltas) + len(self._flushing)
+        return {
+            "pending_artworks": pending,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "failures": self.failures,
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.warning("Like counter flush failed: %s", e)
+
+
+# Global instance
+like_buffer = LikeCounterBuffer()
@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import and_, or_
+
+
+def _encode(values) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str):
+    return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque token for the position just after (created_at, id)"""
+    return _encode([created_at.isoformat(), row_id])
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of ``encode_cursor``; raises ValueError for anything malformed"""
+    try:
+        created_at, row_id = _decode(cursor)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_score_cursor(score: float, row_id: int) -> str:
+    """Opaque token for the position just after (score, id) in a ranked list"""
+    return _encode([score, row_id])
+
+
+def decode_score_cursor(cursor: str) -> Tuple[float, int]:
+    """Inverse of ``encode_score_cursor``; raises ValueError for anything malformed"""
+    try:
+        score, row_id = _decode(cursor)
+        return float(score), int(row_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def after_cursor(created_column, id_column, cursor: str):
+    """
+    Keyset filter for rows ordered by (created_at DESC, id DESC) that come
+    after ``cursor``. The leading ``created_at <=`` bound is what lets the
+    planner seek on the composite index; the OR only trims ties.
+    """
+    created_at, row_id = decode_cursor(cursor)
+    return and_(
+        created_column <= created_at,
+        or_(created_column < created_at, id_column < row_id)
+    )
+
+
+def after_score_cursor(score_column, id_column, cursor: str, descending: bool = False):
+    """
+    Keyset filter for ranked rows ordered by (score ASC, id ASC), or both
+    DESC with ``descending``, that come after ``cursor``. Scores round-trip
+    exactly through the JSON token, so ties are split on id without
+    skipping or repeating rows.
+    """
+    score, row_id = decode_score_cursor(cursor)
+    # Same shape as after_cursor: a plain bound on the score to seek on, the OR for ties
+    if descending:
+        return and_(score_column <= score, or_(score_column < score, id_column < row_id))
+    return and_(score_column >= score, or_(score_column > score, id_column > row_id))
@@ -0,0 +1,98 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+# bcrypt cost factor: each +1 doubles the time per hash (12 is a few hundred ms of CPU)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+# Hashes made with any other cost are flagged for rehash, whether it went up or down
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(matches, replacement hash if the stored one uses an outdated cost)"""
+    return pwd_context.verify_and_update(password, hashed)
+
+
+def dummy_verify() -> bool:
+    """Spend as long as a real check, so unknown usernames can't be told apart by timing"""
+    return pwd_context.dummy_verify()
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a pool of worker processes so hashing never holds the
+    event loop (or the GIL, or a DB thread). The pool is started on first
+    use with the spawn method: forking a server that already runs threads
+    and holds database connections is not safe.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS):
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.hashes = 0
+        self.verifications = 0
+        self.rehashes = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+
+    async def hash(self, password: str) -> str:
+        self.hashes += 1
+        return await self._run(hash_password, password)
+
+    async def verify_and_update(self, password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """Check ``password``; ``hashed`` None (unknown user) still costs one verification"""
+        self.verifications += 1
+        if hashed is None:
+            await self._run(dummy_verify)
+            return False, None
+        matches, new_hash = await self._run(verify_and_update, password, hashed)
+        if new_hash:
+            self.rehashes += 1
+        return matches, new_hash
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "rounds": BCRYPT_ROUNDS,
+            "hashes": self.hashes,
+            "verifications": self.verifications,
+            "rehashes": self.rehashes,
+        }
+
+
+# Global instance
+password_hasher = PasswordHasher()
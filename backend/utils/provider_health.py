@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_FAILURE_THRESHOLD = int(os.getenv("PROVIDER_FAILURE_THRESHOLD", "3"))
+PROVIDER_OPEN_SECONDS = float(os.getenv("PROVIDER_OPEN_SECONDS", "30"))
+PROVIDER_EWMA_ALPHA = float(os.getenv("PROVIDER_EWMA_ALPHA", "0.2"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+Provider = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+class ProviderHealth:
+    """
+    Live health of one provider plus its circuit breaker.
+
+    Latency and error rate are tracked as exponentially weighted moving
+    averages. After ``failure_threshold`` consecutive failures the circuit
+    opens and the provider is skipped; once ``open_seconds`` have passed a
+    single half-open probe is let through, which closes the circuit on
+    success or re-opens it on failure.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = PROVIDER_FAILURE_THRESHOLD,
+        open_seconds: float = PROVIDER_OPEN_SECONDS,
+        alpha: float = PROVIDER_EWMA_ALPHA
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.alpha = alpha
+        self.state = CLOSED
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Could this provider take a request now? (does not claim the probe)"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.open_seconds
+            return self.state == CLOSED or not self._probing
+
+    def allow(self) -> bool:
+        """Claim permission to send a request, taking the half-open probe slot if needed"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self._observe(latency, error=False)
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self, latency: float, timeout: bool = False):
+        with self._lock:
+            self._observe(latency, error=True)
+            self.failures += 1
+            self.timeouts += int(timeout)
+            self.consecutive_failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self.opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def record_abandoned(self, elapsed: float, slow_after: Optional[float] = None):
+        """
+        The call was cancelled before answering (e.g. it lost a race). It took
+        at least ``elapsed``, which is kept as a lower bound on its latency;
+        past ``slow_after`` (the hedge delay) it counts as a timeout, so a
+        provider that hangs still opens its circuit.
+        """
+        if slow_after is not None and elapsed >= slow_after:
+            self.record_failure(elapsed, timeout=True)
+            return
+        with self._lock:
+            if self.latency_ewma is None:
+                self.latency_ewma = elapsed
+            elif elapsed > self.latency_ewma:
+                self.latency_ewma += self.alpha * (elapsed - self.latency_ewma)
+            self._probing = False
+
+    def score(self) -> float:
+        """Expected cost of a call; lower is better. Unmeasured providers rank after measured ones."""
+        if self.latency_ewma is None:
+            return float("inf")
+        return self.latency_ewma * (1.0 + 4.0 * self.error_rate)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+    def _observe(self, latency: float, error: bool):
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += self.alpha * (latency - self.latency_ewma)
+        self.error_rate += self.alpha * (float(error) - self.error_rate)
+
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        log = logger.warning if state == OPEN else logger.info
+        log(
+            "Provider %s circuit %s -> %s (error_rate=%.2f, latency_ewma=%s)",
+            self.name, previous, state, self.error_rate,
+            f"{self.latency_ewma:.2f}s" if self.latency_ewma is not None else "n/a"
+        )
+
+
+class ProviderHealthRegistry:
+    def __init__(self):
+        self._providers: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> ProviderHealth:
+        with self._lock:
+            if name not in self._providers:
+                self._providers[name] = ProviderHealth(name)
+            return self._providers[name]
+
+    def arrange(self, providers: List[Provider], slow_after: Optional[float] = None) -> List[Provider]:
+        """
+        Reorder a fallback chain by live health and drop providers whose
+        circuit is open. Each returned factory records its outcome; one
+        cancelled after ``slow_after`` seconds counts as a timeout.
+        """
+        ranked = sorted(
+            enumerate(providers),
+            key=lambda item: (self.get(item[1][0]).state != CLOSED, self.get(item[1][0]).score(), item[0])
+        )
+        return [
+            (name, self._monitored(name, factory, slow_after))
+            for _, (name, factory) in ranked
+            if self.get(name).available()
+        ]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            providers = list(self._providers.values())
+        return {health.name: health.snapshot() for health in providers}
+
+    def _monitored(
+        self,
+        name: str,
+        factory: Callable[[], Awaitable[Any]],
+        slow_after: Optional[float] = None
+    ) -> Callable[[], Awaitable[Any]]:
+        health = self.get(name)
+
+        async def call():
+            if not health.allow():
+                # Another caller took the half-open probe in the meantime
+                return None
+            started = time.monotonic()
+            try:
+                result = await factory()
+            except asyncio.CancelledError:
+                health.record_abandoned(time.monotonic() - started, slow_after)
+                raise
+            except (httpx.TimeoutException, asyncio.TimeoutError):
+                health.record_failure(time.monotonic() - started, timeout=True)
+                raise
+            except Exception:
+                health.record_failure(time.monotonic() - started)
+                raise
+
+            if result is None:
+                health.record_failure(time.monotonic() - started)
+            else:
+                health.record_success(time.monotonic() - started)
+            return result
+
+        return call
+
+
+# Global instance
+provider_health = ProviderHealthRegistry()
@@ -0,0 +1,317 @@
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Unset means per-process limits in memory; set it when running several workers
+REDIS_URL = os.getenv("REDIS_URL", "")
+RATE_LIMIT_KEY_PREFIX = os.getenv("RATE_LIMIT_KEY_PREFIX", "artbuddy:rl:")
+# /artworks/generate: sustained rate and burst per user and per client IP (0 disables)
+RATE_LIMIT_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "5"))
+RATE_LIMIT_USER_BURST = int(os.getenv("RATE_LIMIT_USER_BURST", "10"))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "20"))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "40"))
+# Generation requests per user per UTC day (0 disables)
+GENERATION_DAILY_QUOTA = int(os.getenv("GENERATION_DAILY_QUOTA", "200"))
+
+
+@dataclass(frozen=True)
+class Bucket:
+    """
+    ``capacity`` tokens refilled at ``rate`` per second. With ``rate`` 0 the
+    tokens only come back when the key expires after ``ttl`` seconds, which
+    makes a fixed-window quota.
+    """
+    name: str
+    key: str
+    capacity: int
+    rate: float
+    ttl: float
+
+    @classmethod
+    def per_minute(cls, name: str, key: str, per_minute: float, burst: int) -> "Bucket":
+        rate = per_minute / 60
+        # Past the time to refill completely, a missing key and a stored one mean the same
+        return cls(name, key, burst, rate, burst / rate)
+
+    @classmethod
+    def daily(cls, name: str, key: str, quota: int, now: Optional[datetime] = None) -> "Bucket":
+        now = now or datetime.utcnow()
+        midnight = datetime(now.year, now.month, now.day) + timedelta(days=1)
+        return cls(name, f"{key}:{now:%Y-%m-%d}", quota, 0.0, (midnight - now).total_seconds())
+
+    def reset_after(self, tokens: float) -> float:
+        """Seconds until the bucket is full again"""
+        if self.rate:
+            return max(0.0, (self.capacity - tokens) / self.rate)
+        return self.ttl
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    bucket: Optional[Bucket]  # the limit reported in the headers (the one that denied, or the tightest)
+    remaining: int
+    reset: float
+    retry_after: float
+
+    def headers(self) -> Dict[str, str]:
+        """RateLimit-* fields (IETF httpapi draft) plus Retry-After when denied"""
+        if self.bucket is None:
+            return {}
+        headers = {
+            "RateLimit-Limit": str(self.bucket.capacity),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class MemoryBackend:
+    """Buckets in a dict; limits apply per process"""
+
+    name = "memory"
+
+    def __init__(self, sweep_every: int = 1000):
+        self._buckets: Dict[str, Tuple[float, float, Optional[float]]] = {}  # key -> (tokens, updated, expires_at)
+        self._lock = threading.Lock()
+        self._sweep_every = sweep_every
+        self._calls = 0
+
+    async def take(self, buckets: List[Bucket], cost: int = 1) -> Tuple[float, List[float]]:
+        """Take ``cost`` from every bucket or from none; (seconds to wait if denied, tokens left per bucket)"""
+        now = time.monotonic()
+        with self._lock:
+            self._calls += 1
+            if self._calls % self._sweep_every == 0:
+                self._sweep(now)
+
+            levels = []
+            expiries = []
+            wait = 0.0
+            for bucket in buckets:
+                tokens, updated, expires_at = self._buckets.get(bucket.key, (bucket.capacity, now, None))
+                if expires_at is not None and expires_at <= now:
+                    tokens, updated, expires_at = bucket.capacity, now, None
+                tokens = min(bucket.capacity, tokens + (now - updated) * bucket.rate)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / bucket.rate if bucket.rate else (expires_at or now + bucket.ttl) - now)
+                levels.append(tokens)
+                # A quota window ends at a fixed time; a bucket's state only matters until it is full again
+                expiries.append(now + bucket.ttl if expires_at is None or bucket.rate else expires_at)
+
+            if wait == 0:
+                for i, bucket in enumerate(buckets):
+                    levels[i] -= cost
+                    self._buckets[bucket.key] = (levels[i], now, expiries[i])
+            return wait, levels
+
+    async def give(self, buckets: List[Bucket], cost: int = 1):
+        """Put ``cost`` back into every bucket, never past its capacity"""
+        with self._lock:
+            for bucket in buckets:
+                state = self._buckets.get(bucket.key)
+                if state is not None:
+                    tokens, updated, expires_at = state
+                    self._buckets[bucket.key] = (min(bucket.capacity, tokens + cost), updated, expires_at)
+
+    async def close(self):
+        pass
+
+    def _sweep(self, now: float):
+        for key in [key for key, (_, _, expires_at) in self._buckets.items() if expires_at <= now]:
+            del self._buckets[key]
+
+
+# Same algorithm as MemoryBackend.take, atomic across workers. Clock is the
+# Redis server's, so workers with skewed clocks still agree.
+# KEYS: one per bucket; ARGV: cost, then capacity, rate, ttl_ms per bucket
+TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+  local capacity = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local state = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(state[1]) or capacity
+  local ts = tonumber(state[2]) or now
+  tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+  if tokens < cost then
+    local needed
+    if rate > 0 then
+      needed = (cost - tokens) / rate
+    else
+      needed = math.max(redis.call('PTTL', key), 0) / 1000
+    end
+    wait = math.max(wait, needed)
+  end
+  levels[i] = tokens
+end
+if wait == 0 then
+  for i, key in ipairs(KEYS) do
+    local fresh = redis.call('EXISTS', key) == 0
+    levels[i] = levels[i] - cost
+    redis.call('HSET', key, 'tokens', levels[i], 'ts', now)
+    -- A quota window ends at a fixed time; a bucket's state only matters until it is full again
+    if fresh or tonumber(ARGV[i * 3]) > 0 then
+      redis.call('PEXPIRE', key, ARGV[i * 3 + 1])
+    end
+  end
+end
+local result = {tostring(wait)}
+for i = 1, #levels do
+  result[i + 1] = tostring(levels[i])
+end
+return result
+"""
+
+
+# Undo a take; a missing key is already full. KEYS: one per bucket; ARGV: cost, then capacity per bucket
+GIVE_SCRIPT = """
+local cost = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+  local tokens = tonumber(redis.call('HGET', key, 'tokens'))
+  if tokens then
+    redis.call('HSET', key, 'tokens', math.min(tonumber(ARGV[i + 1]), tokens + cost))
+  end
+end
+return 1
+"""
+
+
+class RedisBackend:
+    """
+    Buckets in Redis hashes, updated by one Lua script per check, so every
+    worker shares the limits. Takes any ``redis.asyncio``-compatible client
+    (``fakeredis.aioredis.FakeRedis`` works as a local stand-in).
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = RATE_LIMIT_KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+        self._give = client.register_script(GIVE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        import redis.asyncio
+
+        return cls(redis.asyncio.from_url(url))
+
+    async def take(self, buckets: List[Bucket], cost: int = 1) -> Tuple[float, List[float]]:
+        args = [cost]
+        for bucket in buckets:
+            args += [bucket.capacity, bucket.rate, max(1, math.ceil(bucket.ttl * 1000))]
+        result = await self._take(keys=[self.prefix + bucket.key for bucket in buckets], args=args)
+        values = [float(value) for value in result]
+        return values[0], values[1:]
+
+    async def give(self, buckets: List[Bucket], cost: int = 1):
+        await self._give(
+            keys=[self.prefix + bucket.key for bucket in buckets],
+            args=[cost] + [bucket.capacity for bucket in buckets]
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class RateLimiter:
+    """
+    Checks a request against several token buckets at once, all or nothing:
+    a request denied by one limit consumes from none. If the backend fails
+    (Redis down) requests are let through and counted in ``errors``; a
+    limiter outage should not become an API outage. ``refund`` gives back
+    what an allowed request took when it turned out not to do the work
+    (rejected downstream, or served without it).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.allowed = 0
+        self.denied: Dict[str, int] = {}
+        self.refunds = 0
+        self.errors = 0
+
+    async def hit(self, buckets: List[Bucket], cost: int = 1) -> Decision:
+        buckets = [bucket for bucket in buckets if bucket.capacity > 0]
+        if not buckets:
+            return Decision(True, None, 0, 0.0, 0.0)
+        try:
+            wait, levels = await self.backend.take(buckets, cost)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Rate limit check failed, allowing request: %s", e)
+            return Decision(True, None, 0, 0.0, 0.0)
+
+        if wait > 0:
+            # Report the limit that is furthest from letting the request through
+            blocked = [(bucket, tokens) for bucket, tokens in zip(buckets, levels) if tokens < cost]
+            bucket, tokens = max(blocked, key=lambda item: (cost - item[1]) / item[0].rate if item[0].rate else item[0].ttl)
+            self.denied[bucket.name] = self.denied.get(bucket.name, 0) + 1
+            return Decision(False, bucket, max(0, math.floor(tokens)), bucket.reset_after(tokens), wait)
+
+        self.allowed += 1
+        bucket, tokens = min(zip(buckets, levels), key=lambda item: item[1])
+        return Decision(True, bucket, max(0, math.floor(tokens)), bucket.reset_after(tokens), 0.0)
+
+    async def refund(self, buckets: List[Bucket], cost: int = 1):
+        buckets = [bucket for bucket in buckets if bucket.capacity > 0]
+        if not buckets:
+            return
+        try:
+            await self.backend.give(buckets, cost)
+            self.refunds += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Rate limit refund failed: %s", e)
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": self.backend.name,
+            "allowed": self.allowed,
+            "denied": dict(self.denied),
+            "refunds": self.refunds,
+            "errors": self.errors,
+        }
+
+
+def generation_buckets(user_id: int, client_ip: Optional[str] = None) -> List[Bucket]:
+    """The limits on /artworks/generate for one request"""
+    buckets = []
+    if RATE_LIMIT_USER_PER_MINUTE > 0:
+        buckets.append(Bucket.per_minute("user", f"generate:user:{user_id}", RATE_LIMIT_USER_PER_MINUTE, RATE_LIMIT_USER_BURST))
+    if client_ip and RATE_LIMIT_IP_PER_MINUTE > 0:
+        buckets.append(Bucket.per_minute("ip", f"generate:ip:{client_ip}", RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_IP_BURST))
+    if GENERATION_DAILY_QUOTA > 0:
+        buckets.append(Bucket.daily("daily_quota", f"generate:quota:{user_id}", GENERATION_DAILY_QUOTA))
+    return buckets
+
+
+def daily_quota(buckets: List[Bucket]) -> List[Bucket]:
+    """The quota buckets among ``buckets`` (what a request that made no provider call should not use up)"""
+    return [bucket for bucket in buckets if bucket.rate == 0]
+
+
+def build_backend():
+    return RedisBackend.from_url(REDIS_URL) if REDIS_URL else MemoryBackend()
+
+
+# Global instance
+rate_limiter = RateLimiter(build_backend())
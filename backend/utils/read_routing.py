@@ -0,0 +1,41 @@
+import math
+import os
+import time
+
+from fastapi import Request, Response
+
+from models.database import SessionLocal, ReadSessionLocal, ThreadedSession, engine, read_engine
+
+# After a write, that client's reads stay on the primary this long (covers replica lag)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+PRIMARY_PIN_COOKIE = "artbuddy_primary_until"
+
+
+def pin_to_primary(response: Response, seconds: float = READ_YOUR_WRITES_SECONDS):
+    """Call after a write: the client's reads go to the primary for ``seconds``"""
+    until = time.time() + seconds
+    response.set_cookie(
+        PRIMARY_PIN_COOKIE, f"{until:.3f}",
+        max_age=math.ceil(seconds), httponly=True, samesite="lax"
+    )
+
+
+def pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, "")) > time.time()
+    except ValueError:
+        return False
+
+
+async def get_read_db(request: Request):
+    """
+    ThreadedSession for read-only endpoints. Goes to the read engine unless
+    the client wrote recently (see ``pin_to_primary``), so it sees its own
+    writes even while a replica lags.
+    """
+    pinned = read_engine is not engine and pinned_to_primary(request)
+    db = ThreadedSession(SessionLocal if pinned else ReadSessionLocal, pinned=pinned)
+    try:
+        yield db
+    finally:
+        await db.close()
@@ -0,0 +1,104 @@
+import hashlib
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from models.database import RefreshToken, User
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _invalid() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def issue_refresh_token(db: Session, user_id: int, family: Optional[str] = None) -> str:
+    """
+    Add a new refresh token for ``user_id`` to the session (the caller
+    commits) and return it. Without ``family`` it starts a new login.
+    """
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user_id,
+        family=family or secrets.token_hex(16),
+        token_hash=_digest(token),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token
+
+
+def rotate_refresh_token(db: Session, token: str) -> Tuple[User, str]:
+    """
+    Exchange ``token`` for a new one of the same family; 401 if it is unknown,
+    expired or revoked. Tokens are single use: a token that was already
+    rotated is presumed stolen, and its whole family (the thief's copy and the
+    owner's) is revoked, forcing a fresh login. One indexed lookup and two
+    writes, no password hashing.
+    """
+    now = datetime.utcnow()
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == _digest(token)).first()
+    if row is None or row.expires_at <= now:
+        raise _invalid()
+
+    # Claim the token atomically, so two concurrent refreshes can't both succeed
+    claimed = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == row.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    ).rowcount
+    if not claimed:
+        _revoke_family(db, row.family, now)
+        db.commit()
+        logger.warning("Refresh token reused for user %s; revoked its family", row.user_id)
+        raise _invalid()
+
+    new_token = issue_refresh_token(db, row.user_id, row.family)
+    db.commit()
+    # Loaded after the commit, which would otherwise expire it
+    user = db.get(User, row.user_id)
+    if user is None:
+        raise _invalid()
+    return user, new_token
+
+
+def revoke_refresh_token(db: Session, token: str) -> bool:
+    """Revoke the login ``token`` belongs to (every rotation of it); False if unknown"""
+    row = db.query(RefreshToken).filter(RefreshToken.token_hash == _digest(token)).first()
+    if row is None:
+        return False
+    _revoke_family(db, row.family, datetime.utcnow())
+    db.commit()
+    return True
+
+
+def prune_refresh_tokens(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete expired tokens (revoked ones stay until then, for reuse detection); returns rows deleted"""
+    deleted = db.execute(
+        delete(RefreshToken).where(RefreshToken.expires_at <= (now or datetime.utcnow()))
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+def _revoke_family(db: Session, family: str, now: datetime):
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family == family, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
@@ -0,0 +1,88 @@
+import functools
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+Color = Tuple[int, int, int]
+# (center_x, center_y, radius, colour)
+Circle = Tuple[int, int, int, Color]
+
+
+@functools.lru_cache(maxsize=1)
+def default_font() -> Optional[ImageFont.ImageFont]:
+    """PIL's built-in font, loaded once per process"""
+    try:
+        return ImageFont.load_default()
+    except Exception:
+        return None
+
+
+@functools.lru_cache(maxsize=64)
+def vertical_gradient(width: int, height: int, top: Color, bottom: Color) -> Image.Image:
+    """
+    Top-to-bottom linear gradient.
+
+    Row colours are computed in one NumPy pass as a single-pixel column which
+    PIL then stretches to full width in C. Results are cached by (size,
+    palette); the returned image is shared, so callers must copy it
+    (``render_circles`` does) before drawing on it.
+    """
+    ratio = np.arange(height, dtype=np.float32)[:, None] / height
+    rows = np.asarray(top, dtype=np.float32) * (1 - ratio) + np.asarray(bottom, dtype=np.float32) * ratio
+    column = Image.fromarray(np.ascontiguousarray(rows.astype(np.uint8)[:, None, :]), "RGB")
+    return column.resize((width, height), Image.Resampling.NEAREST)
+
+
+@functools.lru_cache(maxsize=128)
+def circle_mask(radius: int) -> Image.Image:
+    """Cached (2r+1)-square coverage mask for a filled circle"""
+    yy, xx = np.ogrid[-radius:radius + 1, -radius:radius + 1]
+    return Image.fromarray(((xx * xx + yy * yy <= radius * radius) * 255).astype(np.uint8), "L")
+
+
+def render_circles(base: Image.Image, circles: Iterable[Circle]) -> Image.Image:
+    """Return a copy of ``base`` with filled circles stamped from cached masks"""
+    image = base.copy()
+    for cx, cy, radius, color in circles:
+        image.paste(tuple(color[:3]), (cx - radius, cy - radius), circle_mask(radius))
+    return image
+
+
+def wrap_words(text: str, max_chars: int) -> List[str]:
+    """Greedy word wrap into lines of at most ``max_chars`` (long words stand alone)"""
+    lines = []
+    current_line = []
+
+    for word in text.split():
+        current_line.append(word)
+        if len(' '.join(current_line)) > max_chars:
+            if len(current_line) > 1:
+                current_line.pop()
+                lines.append(' '.join(current_line))
+                current_line = [word]
+            else:
+                lines.append(word)
+                current_line = []
+
+    if current_line:
+        lines.append(' '.join(current_line))
+
+    return lines
+
+
+def draw_centered_lines(
+    image: Image.Image,
+    lines: List[str],
+    top: int,
+    line_height: int,
+    fill=(255, 255, 255)
+) -> None:
+    """Draw each line horizontally centered, starting at ``top``"""
+    draw = ImageDraw.Draw(image)
+    font = default_font()
+    y = top
+    for line in lines:
+        bbox = draw.textbbox((0, 0), line, font=font)
+        draw.text(((image.width - (bbox[2] - bbox[0])) // 2, y), line, fill=fill, font=font)
+        y += line_height
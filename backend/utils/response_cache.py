@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from fastapi import Response
+
+from utils.cache import RedisTier, TieredCache, redis_tier
+
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, headers: Dict[str, str]):
+        self.body = body
+        self.headers = headers
+        # Strong validator: byte-identical bodies and only those share an ETag
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in candidates or self.etag in candidates
+
+    def respond(self, if_none_match: Optional[str] = None) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", **self.headers}
+        if self.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+class ResponseSerializer:
+    """A JSON line of headers followed by the body as is (it is JSON already)"""
+
+    name = "response"
+
+    def dumps(self, entry: CachedResponse) -> bytes:
+        return json.dumps(entry.headers).encode() + b"\n" + entry.body
+
+    def loads(self, data: bytes) -> CachedResponse:
+        headers, _, body = data.partition(b"\n")
+        return CachedResponse(body, json.loads(headers))
+
+
+class ResponseCache(TieredCache):
+    """
+    Cache of serialized JSON responses, in process and (with ``REDIS_URL``)
+    shared between workers.
+
+    Each entry carries a set of tags naming what it was built from (e.g.
+    ``artwork:42``); writers call ``invalidate`` with the tags they touched and
+    exactly the affected entries are dropped, in every worker. ``ttl`` is only
+    a ceiling for changes nobody announced. A page computed while an
+    invalidation was happening is served but not stored, so a stale read can
+    never be cached over a fresh write.
+    """
+
+    def __init__(
+        self,
+        name: str = "responses",
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        shared: Optional[RedisTier] = redis_tier
+    ):
+        super().__init__(name, ttl, max_entries, ResponseSerializer(), shared)
+        self.not_modified = 0
+
+    def record_not_modified(self):
+        self.not_modified += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {**super().stats(), "not_modified": self.not_modified}
+
+
+# Global instance
+gallery_cache = ResponseCache("gallery")
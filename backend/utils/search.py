@@ -0,0 +1,96 @@
+import os
+import re
+from typing import List, Optional
+
+from sqlalchemy import column, func, literal_column, select, table
+from sqlalchemy.orm import Query, Session, joinedload
+
+from models.database import Artwork, SEARCH_DOCUMENT, SEARCH_TABLE
+from utils.pagination import after_score_cursor
+
+# Longer queries are truncated; every term must match, so more rarely helps
+MAX_SEARCH_TERMS = 16
+# Only the newest N public matches of a query are ranked (and reachable by
+# paging). Scoring every match of a common word costs ~1 s on a million artworks.
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "2000"))
+
+# Title matches count ten times as much as prompt matches (FTS5 bm25 column weights)
+TITLE_WEIGHT = 10.0
+PROMPT_WEIGHT = 1.0
+
+# Words in nearly every prompt: they don't narrow a search, and ranking has to
+# walk every row containing a query word. PostgreSQL's english config drops
+# these as well, so both backends agree on what matches.
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from in into is it its of on or that the "
+    "their then there these this to was were will with".split()
+)
+
+
+def search_terms(q: str) -> List[str]:
+    """Words of a user query; punctuation, FTS/tsquery operators and stopwords are dropped"""
+    words = [word for word in re.findall(r"\w+", q.lower()) if word not in STOPWORDS]
+    return words[:MAX_SEARCH_TERMS]
+
+
+def _sqlite_matches(terms: List[str]):
+    """
+    (id, score) of the newest matching public artworks from the FTS5 table;
+    bm25 is lower-is-better. FTS5 walks matches in rowid order and stops at
+    the limit, so only the candidates are scored (bm25 still counts each
+    term's rows once per query for its IDF, hence the stopwords). Private
+    artworks are skipped during the walk so they never take a candidate slot.
+    """
+    fts = table(SEARCH_TABLE, column("rowid"))
+    # Each term quoted, so it is matched as a word and never parsed as FTS5 syntax
+    match = " ".join(f'"{term}"' for term in terms)
+    score = func.bm25(literal_column(SEARCH_TABLE), TITLE_WEIGHT, PROMPT_WEIGHT)
+    return (
+        select(fts.c.rowid.label("id"), score.label("score"))
+        .join(Artwork, Artwork.id == fts.c.rowid)
+        .where(literal_column(SEARCH_TABLE).op("MATCH")(match), Artwork.is_public == True)
+        .order_by(fts.c.rowid.desc())
+        .limit(SEARCH_CANDIDATES)
+        .subquery("matches")
+    )
+
+
+def _postgres_matches(terms: List[str]):
+    """(id, score) of the newest matching public artworks via the GIN index; ts_rank negated to sort the same way"""
+    document = literal_column(f"({SEARCH_DOCUMENT})")
+    query = func.plainto_tsquery("english", " ".join(terms))
+    return (
+        select(Artwork.id.label("id"), (-func.ts_rank(document, query)).label("score"))
+        .where(document.op("@@")(query), Artwork.is_public == True)
+        .order_by(Artwork.id.desc())
+        .limit(SEARCH_CANDIDATES)
+        .subquery("matches")
+    )
+
+
+def search_artworks(db: Session, q: str, cursor: Optional[str] = None) -> Optional[Query]:
+    """
+    Public artworks matching every word of ``q``, best first, as
+    ``(Artwork, score)`` rows ordered by (score, id), drawn from the newest
+    ``SEARCH_CANDIDATES`` public matches: older ones are not ranked and
+    cannot be reached by paging. ``cursor`` continues after a row (see
+    ``encode_score_cursor``). None if ``q`` has no searchable words.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return None
+
+    if db.get_bind().dialect.name == "postgresql":
+        matches = _postgres_matches(terms)
+    else:
+        matches = _sqlite_matches(terms)
+
+    query = (
+        db.query(Artwork, matches.c.score)
+        .join(matches, Artwork.id == matches.c.id)
+        .options(joinedload(Artwork.creator))
+        .order_by(matches.c.score, Artwork.id)
+    )
+    if cursor:
+        query = query.filter(after_score_cursor(matches.c.score, Artwork.id, cursor))
+    return query
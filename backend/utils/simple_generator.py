@@ -1,68 +1,114 @@
-import requests
-import uuid
+import asyncio
 import os
-from PIL import Image
-from io import BytesIO
+import httpx
+from utils.http_client import http_client
+from utils.image_io import save_image_bytes, sniff, write_pil_image
+from utils.provider_health import provider_health
+from utils.rendering import default_font, render_circles, vertical_gradient
+
+# Cache/model identifier for the multi-provider chain below
+MODEL_ID = "simple/multi-provider"
+
+# "hedged" races the providers, "sequential" tries them strictly one after another
+PROVIDER_RACE_MODE = os.getenv("PROVIDER_RACE_MODE", "hedged")
+# Seconds to wait on a provider before hedging with the next one (0 = start all at once)
+PROVIDER_HEDGE_DELAY = float(os.getenv("PROVIDER_HEDGE_DELAY", "3"))
 
 def generate_image_simple(prompt, width=512, height=512):
+    """Generate real AI image using multiple APIs (blocking wrapper)"""
+    return http_client.run_sync(generate_image_simple_async(prompt, width, height))
+
+async def generate_image_simple_async(prompt, width=512, height=512):
     """Generate real AI image using multiple APIs"""
     
-    # Try multiple working APIs in order
-    apis = [
+    # Providers in order of preference, reordered by live health below
+    providers = [
         # API 1: Pollinations (most reliable)
-        lambda: try_pollinations(prompt, width, height),
+        ("pollinations", lambda: try_pollinations(prompt, width, height)),
         # API 2: Replicate via web
-        lambda: try_replicate_web(prompt, width, height),
+        ("deepai", lambda: try_replicate_web(prompt, width, height)),
         # API 3: Segmind API
-        lambda: try_segmind(prompt, width, height)
+        ("segmind", lambda: try_segmind(prompt, width, height))
     ]
     
-    for api_func in apis:
-        try:
-            result = api_func()
-            if result:
-                return result
-        except Exception as e:
-            print(f"API failed: {e}")
-            continue
+    hedge_delay = None if PROVIDER_RACE_MODE == "sequential" else PROVIDER_HEDGE_DELAY
+    # A provider still running when the race is decided past the hedge delay was too slow
+    result = await race_providers(provider_health.arrange(providers, slow_after=hedge_delay or None), hedge_delay)
+    if result is not None:
+        # Only the winner is written; raw bytes go straight to disk when possible
+        content, size = result
+        return await save_image_bytes(content, size)
     
     # Only use fallback if all APIs fail
     print("All APIs failed, using fallback")
-    return create_fallback_image(prompt, width, height)
+    return await asyncio.to_thread(create_fallback_image, prompt, width, height)
 
-def try_pollinations(prompt, width, height):
-    """Try Pollinations API - most reliable"""
+async def race_providers(providers, hedge_delay=None):
+    """
+    Run providers until one returns a result and cancel the rest.
+    
+    The first provider starts immediately. If it has not answered after
+    ``hedge_delay`` seconds (or as soon as it fails) the next one is started
+    alongside it, so latency tracks the fastest healthy provider instead of
+    the sum of the failures. ``hedge_delay=0`` starts every provider at once;
+    ``None`` never hedges and tries them strictly in order.
+    """
+    waiting = list(providers)
+    running = {}
+    launch_next = True
+    
+    try:
+        while waiting or running:
+            if waiting and (launch_next or not running):
+                name, factory = waiting.pop(0)
+                running[asyncio.ensure_future(factory())] = name
+                launch_next = hedge_delay == 0
+                if launch_next:
+                    continue
+            
+            done, _ = await asyncio.wait(
+                running,
+                timeout=hedge_delay if waiting else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                # Still waiting on a slow provider: hedge with the next one
+                launch_next = True
+                continue
+            
+            for task in done:
+                name = running.pop(task)
+                if task.exception() is not None:
+                    print(f"API {name} failed: {task.exception()}")
+                elif task.result() is not None:
+                    return task.result()
+                launch_next = True
+    finally:
+        for task in running:
+            task.cancel()
+    
+    return None
+
+async def try_pollinations(prompt, width, height):
+    """Try Pollinations API - most reliable. Returns (image bytes, resize target)"""
     import urllib.parse
     
     encoded_prompt = urllib.parse.quote(prompt)
     api_url = f"https://image.pollinations.ai/prompt/{encoded_prompt}?width={width}&height={height}&model=flux&enhance=true&nologo=true"
     
-    response = requests.get(api_url, timeout=30)
+    response = await http_client.get(api_url, read_timeout=30)
     
     if response.status_code == 200 and len(response.content) > 1000:
         # Check if it's actually an image
         try:
-            image = Image.open(BytesIO(response.content))
-            
-            # Generate filename
-            image_id = str(uuid.uuid4())[:8]
-            filename = f"ai_{image_id}.png"
-            
-            os.makedirs("static/images", exist_ok=True)
-            filepath = os.path.join("static", "images", filename)
-            
-            # Convert to RGB if needed
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            image.save(filepath, "PNG")
-            return filepath, filename
+            sniff(response.content)
+            return response.content, None
         except:
             pass
     
     return None
 
-def try_replicate_web(prompt, width, height):
+async def try_replicate_web(prompt, width, height):
     """Try web-based Replicate API"""
     try:
         # Use a simple web API that doesn't require auth
@@ -70,36 +116,26 @@ def try_replicate_web(prompt, width, height):
         
         data = {'text': prompt}
         
-        response = requests.post(api_url, data=data, timeout=60)
+        response = await http_client.post(api_url, data=data, read_timeout=60)
         
         if response.status_code == 200:
             result = response.json()
             if 'output_url' in result:
                 # Download the generated image
-                img_response = requests.get(result['output_url'], timeout=30)
+                img_response = await http_client.get(result['output_url'], read_timeout=30)
                 if img_response.status_code == 200:
-                    image = Image.open(BytesIO(img_response.content))
-                    
-                    # Resize to requested size
-                    image = image.resize((width, height), Image.Resampling.LANCZOS)
-                    
-                    image_id = str(uuid.uuid4())[:8]
-                    filename = f"ai_{image_id}.png"
+                    sniff(img_response.content)
                     
-                    os.makedirs("static/images", exist_ok=True)
-                    filepath = os.path.join("static", "images", filename)
-                    
-                    if image.mode != 'RGB':
-                        image = image.convert('RGB')
-                    
-                    image.save(filepath, "PNG")
-                    return filepath, filename
+                    # Resize to requested size when saving
+                    return img_response.content, (width, height)
+    except (asyncio.CancelledError, httpx.TimeoutException):
+        raise
     except:
         pass
     
     return None
 
-def try_segmind(prompt, width, height):
+async def try_segmind(prompt, width, height):
     """Try Segmind API"""
     try:
         api_url = "https://api.segmind.com/v1/sd1.5-txt2img"
@@ -114,22 +150,13 @@ def try_segmind(prompt, width, height):
             "guidance_scale": 7.5
         }
         
-        response = requests.post(api_url, json=data, timeout=60)
+        response = await http_client.post(api_url, json=data, read_timeout=60)
         
         if response.status_code == 200 and len(response.content) > 1000:
-            image = Image.open(BytesIO(response.content))
-            
-            image_id = str(uuid.uuid4())[:8]
-            filename = f"ai_{image_id}.png"
-            
-            os.makedirs("static/images", exist_ok=True)
-            filepath = os.path.join("static", "images", filename)
-            
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            image.save(filepath, "PNG")
-            return filepath, filename
+            sniff(response.content)
+            return response.content, None
+    except (asyncio.CancelledError, httpx.TimeoutException):
+        raise
     except:
         pass
     
@@ -137,7 +164,7 @@ def try_segmind(prompt, width, height):
 
 def create_fallback_image(prompt, width, height):
     """Create a visually appealing fallback image"""
-    from PIL import ImageDraw, ImageFont
+    from PIL import ImageDraw
     import hashlib
     
     # Create hash-based colors from prompt
@@ -152,37 +179,20 @@ def create_fallback_image(prompt, width, height):
     g2 = int(hash_hex[8:10], 16)
     b2 = int(hash_hex[10:12], 16)
     
-    # Create gradient
-    img = Image.new('RGB', (width, height))
-    draw = ImageDraw.Draw(img)
-    
-    # Draw gradient
-    for y in range(height):
-        ratio = y / height
-        r = int(r1 * (1 - ratio) + r2 * ratio)
-        g = int(g1 * (1 - ratio) + g2 * ratio)
-        b = int(b1 * (1 - ratio) + b2 * ratio)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
-    
     # Add abstract shapes based on prompt
+    shapes = []
     for i in range(len(prompt) % 10 + 5):
         x = (hash(prompt + str(i)) % width)
         y = (hash(prompt + str(i*2)) % height)
         size = 20 + (hash(prompt + str(i*3)) % 40)
         
         # Random shape color
-        shape_r = (r1 + i * 30) % 255
-        shape_g = (g1 + i * 40) % 255  
-        shape_b = (b1 + i * 50) % 255
-        
-        draw.ellipse([x-size//2, y-size//2, x+size//2, y+size//2], 
-                    fill=(shape_r, shape_g, shape_b, 100))
+        shape_color = ((r1 + i * 30) % 255, (g1 + i * 40) % 255, (b1 + i * 50) % 255)
+        shapes.append((x, y, size // 2, shape_color))
     
-    # Add prompt text
-    try:
-        font = ImageFont.load_default()
-    except:
-        font = None
+    # Cached gradient base with the shapes painted in one pass
+    img = render_circles(vertical_gradient(width, height, (r1, g1, b1), (r2, g2, b2)), shapes)
+    draw = ImageDraw.Draw(img)
     
     # Wrap text
     words = prompt.split()[:6]  # First 6 words
@@ -191,22 +201,8 @@ def create_fallback_image(prompt, width, height):
     # Draw text with outline
     text_x = width // 2 - len(text) * 3
     text_y = height // 2
-    
-    # Text outline
-    for dx in [-1, 0, 1]:
-        for dy in [-1, 0, 1]:
-            if dx != 0 or dy != 0:
-                draw.text((text_x + dx, text_y + dy), text, fill=(0, 0, 0), font=font)
-    
-    # Main text
-    draw.text((text_x, text_y), text, fill=(255, 255, 255), font=font)
+    draw.text((text_x, text_y), text, fill=(255, 255, 255), font=default_font(),
+              stroke_width=1, stroke_fill=(0, 0, 0))
     
     # Save
-    image_id = str(uuid.uuid4())[:8]
-    filename = f"art_{image_id}.png"
-    
-    os.makedirs("static/images", exist_ok=True)
-    filepath = os.path.join("static", "images", filename)
-    img.save(filepath, "PNG")
-    
-    return filepath, filename
\ No newline at end of file
+    return write_pil_image(img, placeholder=True)
\ No newline at end of file
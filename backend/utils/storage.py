@@ -0,0 +1,210 @@
+import glob
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from models.database import SessionLocal, ImageBlob, upsert_insert
+
+IMAGE_STORE_ROOT = os.getenv("IMAGE_STORE_ROOT", os.path.join("static", "images"))
+IMAGE_STORE_URL = os.getenv("IMAGE_STORE_URL", "/static/images")
+IMAGE_STORE_SHARD_DEPTH = int(os.getenv("IMAGE_STORE_SHARD_DEPTH", "2"))
+IMAGE_STORE_SHARD_WIDTH = int(os.getenv("IMAGE_STORE_SHARD_WIDTH", "2"))
+# A blob released this soon after a put() is left for gc-images instead of
+# deleted at once: the put's caller may not have acquired it yet
+IMAGE_STORE_PUT_GRACE_SECONDS = float(os.getenv("IMAGE_STORE_PUT_GRACE_SECONDS", "600"))
+
+
+class ImageStore:
+    """
+    Content-addressed, sharded image storage.
+
+    Files are named by the SHA-256 of their bytes and nested under prefix
+    directories (``ab/cd/abcd....png``), so identical images are stored once
+    and no directory grows without bound. Each blob has a row in
+    ``image_blobs`` holding its reference count: holders (artworks, cache
+    entries, gallery entries) ``acquire`` a blob and ``release`` it when done,
+    and the file plus its derivatives are deleted when the count drops to zero.
+
+    Paths handed out look like the old flat ones (``static/images/<filename>``)
+    where ``filename`` now includes the shard directories.
+    """
+
+    def __init__(
+        self,
+        root: str = IMAGE_STORE_ROOT,
+        url_prefix: str = IMAGE_STORE_URL,
+        depth: int = IMAGE_STORE_SHARD_DEPTH,
+        width: int = IMAGE_STORE_SHARD_WIDTH,
+        put_grace: float = IMAGE_STORE_PUT_GRACE_SECONDS
+    ):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.depth = depth
+        self.width = width
+        self.put_grace = put_grace
+
+    def filename_for(self, digest: str, extension: str) -> str:
+        shards = [digest[i * self.width:(i + 1) * self.width] for i in range(self.depth)]
+        return "/".join(shards + [digest + extension.lower()])
+
+    def path_for(self, filename: str) -> str:
+        return os.path.join(self.root, *filename.split("/"))
+
+    def url_for(self, filename: str) -> str:
+        return f"{self.url_prefix}/{filename}"
+
+    def filename_of(self, image_path: str) -> str:
+        return os.path.relpath(image_path, self.root).replace(os.sep, "/")
+
+    def put(self, data: bytes, extension: str, placeholder: bool = False) -> Tuple[str, str]:
+        """
+        Store bytes (once per distinct content) and return (image_path, filename).
+        A newly seen blob starts with no references; callers ``acquire`` it.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        filename = self.filename_for(digest, extension)
+        path = self.path_for(filename)
+
+        # Stamp the row first: a release that commits after this leaves the
+        # blob alone for the grace period, and one that committed before it
+        # has already removed the file, which the check below then rewrites
+        with self._session() as db:
+            db.execute(
+                upsert_insert(ImageBlob)
+                .values(path=filename, digest=digest, size=len(data), refcount=0,
+                        is_placeholder=placeholder, created_at=datetime.utcnow(), stored_at=datetime.utcnow())
+                .on_conflict_do_update(index_elements=[ImageBlob.path], set_={"stored_at": datetime.utcnow()})
+            )
+            db.commit()
+
+        if not os.path.exists(path):
+            self._write(path, data)
+        return path, filename
+
+    def acquire(self, image_path: str, db: Optional[Session] = None):
+        """
+        Add a reference. With ``db`` the change joins the caller's transaction.
+        A file without a row (stored before ``image_blobs`` existed) gets one;
+        raises FileNotFoundError if the file itself is gone.
+        """
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image store has no file at {image_path}")
+        with self._session(db) as session:
+            if not self._adjust(image_path, 1, session):
+                with open(image_path, "rb") as f:
+                    data = f.read()
+                session.execute(
+                    upsert_insert(ImageBlob)
+                    .values(path=self.filename_of(image_path), digest=hashlib.sha256(data).hexdigest(),
+                            size=len(data), refcount=1, created_at=datetime.utcnow(), stored_at=datetime.utcnow())
+                    .on_conflict_do_update(index_elements=[ImageBlob.path], set_={"refcount": ImageBlob.refcount + 1})
+                )
+            if db is None:
+                session.commit()
+
+    def release(self, image_path: str, db: Optional[Session] = None) -> bool:
+        """
+        Drop a reference; deletes the blob once nothing refers to it, unless it
+        was put within the grace period (``collect_garbage`` gets it later)
+        """
+        filename = self.filename_of(image_path)
+        with self._session(db) as session:
+            self._adjust(image_path, -1, session)
+            deleted = session.query(ImageBlob).filter(
+                ImageBlob.path == filename,
+                ImageBlob.refcount <= 0,
+                self._stored_before(datetime.utcnow() - timedelta(seconds=self.put_grace))
+            ).delete(synchronize_session=False)
+            # Files go while the row delete is uncommitted, so a concurrent put
+            # waits on it and then finds the file missing
+            if deleted:
+                self._delete_files(filename)
+            if db is None:
+                session.commit()
+        return bool(deleted)
+
+    def refcount(self, image_path: str) -> Optional[int]:
+        with self._session() as db:
+            row = db.query(ImageBlob.refcount).filter(ImageBlob.path == self.filename_of(image_path)).first()
+            return row[0] if row else None
+
+    def is_placeholder(self, image_path: str) -> bool:
+        with self._session() as db:
+            row = db.query(ImageBlob.is_placeholder).filter(ImageBlob.path == self.filename_of(image_path)).first()
+            return bool(row and row[0])
+
+    def collect_garbage(self, older_than: datetime) -> int:
+        """
+        Delete blobs last stored before ``older_than`` that nothing holds
+        (e.g. the process died between writing an image and saving its artwork).
+        """
+        deleted = 0
+        with self._session() as db:
+            candidates = db.query(ImageBlob.path).filter(
+                ImageBlob.refcount <= 0,
+                self._stored_before(older_than)
+            ).all()
+            for (filename,) in candidates:
+                removed = db.query(ImageBlob).filter(
+                    ImageBlob.path == filename,
+                    ImageBlob.refcount <= 0,
+                    self._stored_before(older_than)
+                ).delete(synchronize_session=False)
+                if removed:
+                    self._delete_files(filename)
+                    deleted += 1
+                db.commit()
+        return deleted
+
+    def _adjust(self, image_path: str, delta: int, db: Session) -> bool:
+        """Change the refcount in ``db``'s transaction; False if the blob has no row"""
+        return db.execute(
+            update(ImageBlob)
+            .where(ImageBlob.path == self.filename_of(image_path))
+            .values(refcount=ImageBlob.refcount + delta)
+        ).rowcount > 0
+
+    @staticmethod
+    def _stored_before(cutoff: datetime):
+        # Rows from before stored_at existed fall back to when they were created
+        return func.coalesce(ImageBlob.stored_at, ImageBlob.created_at) < cutoff
+
+    @staticmethod
+    def _write(path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write-then-rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _delete_files(self, filename: str):
+        path = self.path_for(filename)
+        stem = os.path.splitext(path)[0]
+        for file_path in [path] + glob.glob(f"{glob.escape(stem)}_*"):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def _session(self, db: Optional[Session] = None) -> Iterator[Session]:
+        if db is not None:
+            yield db
+            return
+        session = SessionLocal()
+        try:
+            yield session
+        finally:
+            session.close()
+
+
+# Global instance
+image_store = ImageStore()
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, case, delete, select, update
+
+from models.database import SessionLocal, Comment, Like, TrendingScore, upsert_insert
+
+logger = logging.getLogger(__name__)
+
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+TRENDING_DECAY_INTERVAL_SECONDS = float(os.getenv("TRENDING_DECAY_INTERVAL_SECONDS", "300"))
+TRENDING_LIKE_WEIGHT = float(os.getenv("TRENDING_LIKE_WEIGHT", "1"))
+TRENDING_COMMENT_WEIGHT = float(os.getenv("TRENDING_COMMENT_WEIGHT", "2"))
+# Rows decayed below this are dropped, so the table only holds recently active artworks
+TRENDING_MIN_SCORE = float(os.getenv("TRENDING_MIN_SCORE", "0.05"))
+TRENDING_DECAY_BATCH_SIZE = int(os.getenv("TRENDING_DECAY_BATCH_SIZE", "5000"))
+
+
+class TrendingScores:
+    """
+    Time-decayed engagement scores in the ``trending_scores`` table.
+
+    Likes and comments add their weight to an artwork's row in the same
+    transaction that records them (likes via the like counter flush), so
+    ``/artworks/trending`` is an index scan instead of an aggregation over
+    likes. A timer multiplies every row by ``0.5 ** (elapsed / half_life)``
+    in batches and drops rows that decayed below ``min_score``.
+
+    Each row remembers the decay tick (a multiple of ``interval``) its score
+    is expressed at. A decay pass only touches rows from older ticks and
+    moves them to the current one, so it can be interrupted, resumed, or run
+    by several processes at once without decaying anything twice. Rows are
+    at most one tick apart, which bounds ordering error to one interval of
+    decay (~0.2% with the defaults).
+    """
+
+    def __init__(
+        self,
+        half_life_hours: float = TRENDING_HALF_LIFE_HOURS,
+        interval: float = TRENDING_DECAY_INTERVAL_SECONDS,
+        min_score: float = TRENDING_MIN_SCORE,
+        batch_size: int = TRENDING_DECAY_BATCH_SIZE
+    ):
+        self.half_life = half_life_hours * 3600
+        self.interval = interval
+        self.min_score = min_score
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.decays = 0
+        self.rows_decayed = 0
+        self.rows_pruned = 0
+        self.last_decay_ms = 0.0
+
+    def tick(self, now: Optional[datetime] = None) -> datetime:
+        """Start of the decay interval containing ``now``"""
+        now = now or datetime.utcnow()
+        seconds = (now - datetime(1970, 1, 1)).total_seconds()
+        return datetime(1970, 1, 1) + timedelta(seconds=seconds - seconds % self.interval)
+
+    def bump(self, connection, deltas: Dict[int, float], now: Optional[datetime] = None):
+        """Add event weights to artwork scores inside the caller's transaction"""
+        scores = TrendingScore.__table__
+        tick = self.tick(now)
+        gains = [{"artwork_id": artwork_id, "score": delta, "decayed_at": tick} for artwork_id, delta in deltas.items() if delta > 0]
+        losses = [{"target_id": artwork_id, "delta": delta} for artwork_id, delta in deltas.items() if delta < 0]
+
+        if gains:
+            insert = upsert_insert(TrendingScore)
+            connection.execute(
+                insert.on_conflict_do_update(
+                    index_elements=[scores.c.artwork_id],
+                    set_={"score": scores.c.score + insert.excluded.score}
+                ),
+                gains
+            )
+        if losses:
+            # An unlike takes back at most what is left; artworks without a row have nothing to lose
+            lowered = scores.c.score + bindparam("delta")
+            connection.execute(
+                update(scores)
+                .where(scores.c.artwork_id == bindparam("target_id"))
+                .values(score=case((lowered < 0, 0.0), else_=lowered)),
+                losses
+            )
+
+    def decay(self, now: Optional[datetime] = None) -> int:
+        """Bring every row to the current tick, in batches; returns rows decayed"""
+        started = time.perf_counter()
+        scores = TrendingScore.__table__
+        tick = self.tick(now)
+        decayed = pruned = 0
+
+        with self._lock:
+            db = SessionLocal()
+            try:
+                stale_ticks = db.execute(
+                    select(scores.c.decayed_at).where(scores.c.decayed_at < tick).distinct()
+                ).scalars().all()
+                for stale in stale_ticks:
+                    factor = 0.5 ** ((tick - stale).total_seconds() / self.half_life)
+                    while True:
+                        ids = db.execute(
+                            select(scores.c.artwork_id).where(scores.c.decayed_at == stale).limit(self.batch_size)
+                        ).scalars().all()
+                        if not ids:
+                            break
+                        # The decayed_at check makes a batch a no-op if another process got there first
+                        batch = scores.c.artwork_id.in_(ids) & (scores.c.decayed_at == stale)
+                        decayed += db.execute(
+                            update(scores).where(batch).values(score=scores.c.score * factor, decayed_at=tick)
+                        ).rowcount
+                        pruned += db.execute(
+                            delete(scores).where(scores.c.artwork_id.in_(ids), scores.c.score < self.min_score)
+                        ).rowcount
+                        db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            self.decays += 1
+            self.rows_decayed += decayed
+            self.rows_pruned += pruned
+            self.last_decay_ms = round((time.perf_counter() - started) * 1000, 1)
+        return decayed
+
+    def rebuild(self, window: timedelta, now: Optional[datetime] = None) -> int:
+        """Recompute every score from the likes and comments inside ``window``; returns rows written"""
+        now = now or datetime.utcnow()
+        tick = self.tick(now)
+        totals: Dict[int, float] = defaultdict(float)
+
+        with self._lock:
+            db = SessionLocal()
+            try:
+                for model, weight in ((Like, TRENDING_LIKE_WEIGHT), (Comment, TRENDING_COMMENT_WEIGHT)):
+                    events = db.execute(
+                        select(model.artwork_id, model.created_at).where(model.created_at >= now - window)
+                    )
+                    for artwork_id, created_at in events:
+                        totals[artwork_id] += weight * 0.5 ** ((tick - created_at).total_seconds() / self.half_life)
+
+                db.execute(delete(TrendingScore))
+                rows = [
+                    {"artwork_id": artwork_id, "score": score, "decayed_at": tick}
+                    for artwork_id, score in totals.items() if score >= self.min_score
+                ]
+                if rows:
+                    db.execute(TrendingScore.__table__.insert(), rows)
+                db.commit()
+                return len(rows)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "decays": self.decays,
+            "rows_decayed": self.rows_decayed,
+            "rows_pruned": self.rows_pruned,
+            "last_decay_ms": self.last_decay_ms,
+            "half_life_hours": self.half_life / 3600,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.decay)
+            except Exception as e:
+                logger.warning("Trending score decay failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+
+# Global instance
+trending_scores = TrendingScores()
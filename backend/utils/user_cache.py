@@ -0,0 +1,106 @@
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.database import User
+from utils.cache import JsonSerializer, RedisTier, TieredCache, redis_tier
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """The authenticated user as handlers see it: plain, immutable, safe to share"""
+    id: int
+    username: str
+    email: str
+    is_admin: bool
+
+    @classmethod
+    def of(cls, user: User) -> "UserSnapshot":
+        return cls(id=user.id, username=user.username, email=user.email, is_admin=bool(user.is_admin))
+
+
+class UserCache(TieredCache):
+    """
+    Bearer token -> ``UserSnapshot``, so authenticated requests skip both the
+    JWT decode and the users query. In process, and with ``REDIS_URL`` also
+    shared, so a token seen by one worker is known to all of them.
+
+    Keys are SHA-256 digests of the token (raw tokens are never held or sent
+    to Redis). An entry lives for ``ttl`` seconds but never past the token's
+    own ``exp``, so an expired token is always decoded again and rejected.
+    Committed changes to a ``User`` through the ORM drop that user's entries
+    in every worker (see the session hooks below).
+    """
+
+    def __init__(
+        self,
+        ttl: float = USER_CACHE_TTL_SECONDS,
+        max_entries: int = USER_CACHE_MAX_ENTRIES,
+        shared: Optional[RedisTier] = redis_tier
+    ):
+        super().__init__("users", ttl, max_entries, JsonSerializer(UserSnapshot), shared)
+
+    def key(self, token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def ttl_for(self, token_expires_at: Optional[float]) -> float:
+        """How long a user loaded for a token expiring at ``token_expires_at`` may be cached"""
+        if token_expires_at is None:
+            return self.ttl
+        return min(self.ttl, token_expires_at - time.time())
+
+    async def get_or_load_user(
+        self,
+        token: str,
+        load: Callable[[], Awaitable[UserSnapshot]],
+        token_expires_at: Optional[float] = None
+    ) -> UserSnapshot:
+        async def load_tagged():
+            user = await load()
+            return user, [f"user:{user.id}"]
+        return await self.get_or_load(token, load_tagged, ttl=self.ttl_for(token_expires_at))
+
+    def invalidate_user(self, user_id: int) -> int:
+        """Forget every token of ``user_id``; returns how many local entries went"""
+        return self.invalidate(f"user:{user_id}")
+
+    def stats(self) -> Dict[str, float]:
+        stats = super().stats()
+        lookups = stats["hits"] + stats["misses"]
+        # Each hit is one users query (and one JWT decode) not made
+        stats["db_queries_saved"] = stats["hits"]
+        stats["db_queries_saved_per_request"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        del stats["hit_ratio"]
+        return stats
+
+
+# Global instance
+user_cache = UserCache()
+
+
+# Invalidate on commit rather than flush: a request filling the cache between
+# the two would otherwise put the old row straight back
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = {obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault("changed_users", set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop("changed_users", ()):
+        user_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("changed_users", None)